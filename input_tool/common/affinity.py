@@ -0,0 +1,194 @@
+# © 2026 fezjo
+"""
+Isolation of timed runs on their own physical cores.
+
+With `--pin-cpus` every running solution holds one physical core until its
+process exits. It is pinned to one logical CPU of that core and no other solution
+gets its SMT sibling, so parallel runs don't share execution units. When we are
+allowed to, the solution also gets a higher scheduling and I/O priority. Only as
+many cores as threads are used for solutions, checkers run on the remaining ones.
+The task pool starts a timed task only when it can hand it a free core, so no
+worker waits for one.
+"""
+
+import contextlib
+import ctypes
+import os
+import platform
+import threading
+from typing import Any, Callable, Iterator, Optional
+
+from input_tool.common.messages import warning
+from input_tool.common.types import Directory
+
+CPU_SYSFS = Directory("/sys/devices/system/cpu")
+PRIORITY_NICENESS = -5
+
+# there is no `os.ioprio_set`, so we call the syscall directly
+IOPRIO_SET_SYSCALLS = {"x86_64": 251, "i686": 289, "aarch64": 30, "riscv64": 30}
+IOPRIO_WHO_PROCESS = 1
+IOPRIO_CLASS_BE = 2  # best effort class with the highest level 0
+IOPRIO_CLASS_SHIFT = 13
+
+
+def parse_cpu_list(text: str) -> set[int]:
+    """Parse the kernel cpu list format, e.g. `0-3,8,10-11`"""
+    cpus: set[int] = set()
+    for part in text.strip().split(","):
+        if not part:
+            continue
+        first, _, last = part.partition("-")
+        cpus.update(range(int(first), int(last or first) + 1))
+    return cpus
+
+
+def read_physical_cores(allowed: set[int]) -> list[list[int]]:
+    """Group the allowed logical CPUs by the physical core they belong to."""
+    cores: dict[frozenset[int], list[int]] = {}
+    for cpu in sorted(allowed):
+        path = CPU_SYSFS / f"cpu{cpu}" / "topology" / "thread_siblings_list"
+        try:
+            siblings = frozenset(parse_cpu_list(path.read_text()))
+        except (OSError, ValueError):
+            siblings = frozenset((cpu,))
+        cores.setdefault(siblings, []).append(cpu)
+    return list(cores.values())
+
+
+def find_ioprio_setter() -> Optional[Callable[[], None]]:
+    number = IOPRIO_SET_SYSCALLS.get(platform.machine())
+    if number is None or not platform.system() == "Linux":
+        return None
+    try:
+        syscall = ctypes.CDLL(None, use_errno=True).syscall
+    except (OSError, AttributeError):
+        return None
+    ioprio = IOPRIO_CLASS_BE << IOPRIO_CLASS_SHIFT
+
+    def set_ioprio() -> None:
+        syscall(number, IOPRIO_WHO_PROCESS, 0, ioprio)  # -1 without permissions
+
+    return set_ioprio
+
+
+class CpuSlot:
+    """A core held by a run, released as soon as the timed process exits"""
+
+    def __init__(self, slots: "CpuSlots", cpu: int):
+        self.slots = slots
+        self.cpu = cpu
+        self.released = False
+
+    def release(self) -> None:
+        """Return the core to the pool, only the first call does anything."""
+        with self.slots.condition:
+            if self.released:
+                return
+            self.released = True
+            self.slots.free.append(self.cpu)
+            self.slots.condition.notify()
+            listeners = list(self.slots.listeners)
+        for listener in listeners:
+            listener()
+
+
+class CpuSlots:
+    """
+    Thread safe pool of physical cores. A run holds one while its process runs.
+    The task pool takes a core before starting a timed task, see `run_tasks`,
+    other runs wait for a core to free up.
+    """
+
+    def __init__(self) -> None:
+        self.condition = threading.Condition()
+        self.free: list[int] = []
+        self.cpus: list[int] = []
+        self.spare: set[int] = set()  # CPUs of the cores not used by solutions
+        self.enabled = False
+        self.set_ioprio: Optional[Callable[[], None]] = None
+        # called whenever a core is released, e.g. to wake up the task pool
+        self.listeners: list[Callable[[], None]] = []
+        # the core handed to the task running in this thread, see `run_with`
+        self.handed = threading.local()
+
+    def setup(self, threads: int) -> None:
+        if not hasattr(os, "sched_setaffinity"):
+            warning("CPU pinning is not supported on this system.")
+            return
+        cores = read_physical_cores(os.sched_getaffinity(0))
+        # CPU 0 usually handles most of the interrupts, so we use it last
+        cores.sort(key=lambda core: (0 in core, core[0]))
+        used = max(1, min(threads, len(cores)))
+        self.cpus = [core[0] for core in cores[:used]]
+        self.spare = {cpu for core in cores[used:] for cpu in core}
+        self.free = self.cpus[::-1]
+        self.enabled = True
+        self.set_ioprio = find_ioprio_setter()
+        if threads > len(self.cpus):
+            warning(
+                f"Only {len(self.cpus)} physical cores are available for {threads} "
+                "threads, at most that many solutions will run at once."
+            )
+
+    def take(self) -> Optional[CpuSlot]:
+        """Take a free core without waiting, None if there is none."""
+        with self.condition:
+            if not self.free:
+                return None
+            return CpuSlot(self, self.free.pop())
+
+    def run_with(self, slot: CpuSlot, func: Callable[[], Any]) -> Any:
+        """Run `func` in this thread, its `acquire` gets the taken `slot`."""
+        self.handed.slot = slot
+        try:
+            return func()
+        finally:
+            self.handed.slot = None
+            slot.release()
+
+    @contextlib.contextmanager
+    def acquire(self) -> Iterator[Optional[CpuSlot]]:
+        """
+        Hold a core until the block ends or the slot is released, whichever
+        comes first. Yield None if disabled.
+        """
+        if not self.enabled:
+            yield None
+            return
+        slot: Optional[CpuSlot] = getattr(self.handed, "slot", None)
+        if slot is not None:
+            self.handed.slot = None
+        else:
+            with self.condition:
+                self.condition.wait_for(lambda: bool(self.free))
+                slot = CpuSlot(self, self.free.pop())
+        try:
+            yield slot
+        finally:
+            slot.release()
+
+    def make_isolate(self, cpu: int) -> Callable[[], None]:
+        """Return a function to call in the forked child, see `make_preexec`."""
+        cpus = {cpu}
+        set_ioprio = self.set_ioprio
+
+        def isolate() -> None:
+            os.sched_setaffinity(0, cpus)
+            try:
+                os.setpriority(os.PRIO_PROCESS, 0, PRIORITY_NICENESS)
+            except OSError:
+                pass  # needs CAP_SYS_NICE or a high enough RLIMIT_NICE
+            if set_ioprio is not None:
+                set_ioprio()
+
+        return isolate
+
+    def make_spare_isolate(self) -> Optional[Callable[[], None]]:
+        """Like `make_isolate`, for the spare cores, None if there are none."""
+        if not self.enabled or not self.spare:
+            return None
+        cpus = set(self.spare)
+        return lambda: os.sched_setaffinity(0, cpus)
+
+
+CPU_SLOTS = CpuSlots()
@@ -0,0 +1,79 @@
+# © 2026 fezjo
+"""
+Compiling several programs by a single run of their toolchain.
+
+Every `javac` starts a new JVM and warms up its JIT again, which takes longer
+than compiling a typical solution. All Java programs are instead compiled in
+one JVM by a small driver, each into its own output directory, so their
+classes can have the same names. If the driver can't run, the programs are
+compiled one by one as before.
+"""
+
+import shutil
+import subprocess
+import tempfile
+from typing import Callable, Optional, Sequence
+
+from input_tool.common.compile_cache import CompileResult
+from input_tool.common.types import Directory, Path
+
+# compiles the sources in pairs `source outdir` after the directory for results
+JAVA_DRIVER = """
+import java.io.ByteArrayOutputStream;
+import java.nio.file.Files;
+import java.nio.file.Path;
+import java.nio.file.Paths;
+import javax.tools.JavaCompiler;
+import javax.tools.ToolProvider;
+
+public class BatchJavac {
+    public static void main(String[] args) throws Exception {
+        JavaCompiler javac = ToolProvider.getSystemJavaCompiler();
+        Path results = Paths.get(args[0]);
+        for (int i = 1; i + 1 < args.length; i += 2) {
+            ByteArrayOutputStream out = new ByteArrayOutputStream();
+            ByteArrayOutputStream err = new ByteArrayOutputStream();
+            int code = javac.run(null, out, err, args[i], "-d", args[i + 1]);
+            int job = i / 2;
+            Files.write(results.resolve(job + ".out"), out.toByteArray());
+            Files.write(results.resolve(job + ".err"), err.toByteArray());
+            Files.write(results.resolve(job + ".code"), Integer.toString(code).getBytes());
+        }
+    }
+}
+"""
+
+# (source, output directory) of every program
+jobs_t = Sequence[tuple[Path, Directory]]
+
+
+def compile_java(jobs: jobs_t) -> Optional[list[CompileResult]]:
+    """Result of every job, None if the driver failed and nothing is known."""
+    if not shutil.which("java"):
+        return None
+    with tempfile.TemporaryDirectory() as tmpdir:
+        results = Path(tmpdir)
+        driver = results / "BatchJavac.java"
+        driver.write_text(JAVA_DRIVER)
+        argv = ["java", str(driver), str(results)]
+        for source, outdir in jobs:
+            argv += [str(source), str(outdir)]
+        process = subprocess.run(argv, capture_output=True)
+        if process.returncode:
+            return None
+        try:
+            return [
+                CompileResult(
+                    int((results / f"{i}.code").read_text()),
+                    (results / f"{i}.out").read_text(errors="replace"),
+                    (results / f"{i}.err").read_text(errors="replace"),
+                )
+                for i in range(len(jobs))
+            ]
+        except (OSError, ValueError):
+            return None
+
+
+BATCH_COMPILERS: dict[str, Callable[[jobs_t], Optional[list[CompileResult]]]] = {
+    "javac": compile_java,
+}
@@ -0,0 +1,87 @@
+# © 2026 fezjo
+"""
+Machine profile written by `itool calibrate`.
+
+It stores how much the probes slowed down when running in parallel, so that
+the tester and findlimits can pick a thread count with a small slowdown and
+tell how much the measured times are inflated.
+"""
+
+import json
+import os
+import time
+from dataclasses import asdict, dataclass
+from typing import Optional
+
+from input_tool.common.commands import Config
+from input_tool.common.messages import warning
+from input_tool.common.types import Path
+
+PROFILE_FILENAME = "calibration.json"
+
+
+@dataclass
+class CalibrationProfile:
+    cpu_count: int
+    tolerance: float
+    threads: int  # the highest thread count with slowdown under tolerance
+    # thread count -> probe name -> slowdown against a single thread
+    slowdowns: dict[int, dict[str, float]]
+    created: float
+
+    def slowdown(self, threads: int) -> float:
+        """Worst slowdown of the smallest measured level with at least `threads`"""
+        levels = sorted(self.slowdowns)
+        level = next((x for x in levels if x >= threads), levels[-1])
+        return max(self.slowdowns[level].values())
+
+
+def get_profile_path() -> Path:
+    config_home = os.environ.get("XDG_CONFIG_HOME") or Path.home() / ".config"
+    return Path(config_home) / "input-tool" / PROFILE_FILENAME
+
+
+def save_profile(profile: CalibrationProfile) -> Path:
+    path = get_profile_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(asdict(profile), f, indent=2)
+    return path
+
+
+def load_profile() -> Optional[CalibrationProfile]:
+    """Return the profile of this machine, None if there is no usable one."""
+    path = get_profile_path()
+    if not path.exists():
+        return None
+    try:
+        with open(path) as f:
+            data = json.load(f)
+        profile = CalibrationProfile(
+            cpu_count=data["cpu_count"],
+            tolerance=data["tolerance"],
+            threads=data["threads"],
+            slowdowns={int(k): v for k, v in data["slowdowns"].items()},
+            created=data.get("created", time.time()),
+        )
+    except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+        warning(f"Failed to load calibration profile {path}: {e!r}")
+        return None
+    if profile.cpu_count != os.cpu_count() or not profile.slowdowns:
+        warning(f"Calibration profile {path} is for a different machine, ignoring.")
+        return None
+    return profile
+
+
+def get_default_threads(profile: Optional[CalibrationProfile]) -> int:
+    if profile is not None:
+        return profile.threads
+    return Config.get_cpu_corecount(0.25)
+
+
+def describe_inflation(profile: CalibrationProfile, threads: int) -> str:
+    inflation = (profile.slowdown(threads) - 1) * 100
+    return (
+        f"Calibration: running with {threads} threads is expected to inflate "
+        f"the times by about {max(0.0, inflation):.0f}%."
+    )
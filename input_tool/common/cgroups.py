@@ -0,0 +1,199 @@
+# © 2026 fezjo
+"""
+cgroup v2 resource backend.
+
+Every run gets its own transient cgroup with `memory.max` and `pids.max`, so the
+limits and the accounting (`memory.peak`, `cpu.stat`) cover the whole process
+tree and a TLE kills everything in it at once. It needs a delegated subtree we
+can write to, e.g. `systemd-run --user --scope -p Delegate=yes itool t ...`.
+"""
+
+import errno
+import itertools
+import os
+import threading
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Optional
+
+from input_tool.common.messages import warning
+from input_tool.common.types import Directory, Path
+
+CONTROLLERS = ("memory", "pids")
+PIDS_MAX = 1024
+# shared by all the testers, a leaf per run would be left behind at every exit
+SUPERVISOR_NAME = "itool-supervisor"
+
+
+@dataclass
+class CgroupUsage:
+    user_time: timedelta
+    system_time: timedelta
+    peak_memory: Optional[int]  # bytes
+    oom_killed: bool
+
+
+def find_cgroup2_mount() -> Optional[Directory]:
+    try:
+        with open("/proc/self/mountinfo") as f:
+            for line in f:
+                fields = line.split()
+                separator = fields.index("-")
+                if fields[separator + 1] == "cgroup2":
+                    return Directory(fields[4])
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def find_own_cgroup() -> Optional[Directory]:
+    mount = find_cgroup2_mount()
+    if mount is None:
+        return None
+    try:
+        with open("/proc/self/cgroup") as f:
+            for line in f:
+                hierarchy, _controllers, path = line.rstrip("\n").split(":", 2)
+                if hierarchy == "0":
+                    return mount / path.lstrip("/")
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def read_keyed_file(path: Path) -> dict[str, int]:
+    """Parse files like `cpu.stat` or `memory.events`"""
+    result: dict[str, int] = {}
+    try:
+        with open(path) as f:
+            for line in f:
+                key, value = line.split()
+                result[key] = int(value)
+    except (OSError, ValueError):
+        pass
+    return result
+
+
+class RunCgroup:
+    """Cgroup for a single run of a program."""
+
+    def __init__(self, path: Directory, memorylimit: float):
+        self.path = path
+        self.path.mkdir()
+        if memorylimit:
+            self.write("memory.max", str(int(memorylimit * 1024 * 1024)))
+            self.write("memory.swap.max", "0", missing_ok=True)
+        self.write("pids.max", str(PIDS_MAX))
+        # opened by the parent, the child only writes to it before exec
+        self.procs_fd = os.open(self.path / "cgroup.procs", os.O_WRONLY)
+
+    def write(self, name: str, value: str, missing_ok: bool = False) -> None:
+        try:
+            with open(self.path / name, "w") as f:
+                f.write(value)
+        except FileNotFoundError:
+            if not missing_ok:
+                raise
+
+    def join_from_child(self) -> None:
+        """Called in the forked child, moves it into this cgroup."""
+        os.write(self.procs_fd, b"0")
+
+    def kill(self) -> bool:
+        """Kill everything in the cgroup, return False if not supported."""
+        try:
+            self.write("cgroup.kill", "1")
+        except OSError:
+            return False
+        return True
+
+    def usage(self) -> CgroupUsage:
+        cpu = read_keyed_file(self.path / "cpu.stat")
+        events = read_keyed_file(self.path / "memory.events")
+        peak: Optional[int] = None
+        try:
+            peak = int((self.path / "memory.peak").read_text())
+        except (OSError, ValueError):
+            pass
+        return CgroupUsage(
+            user_time=timedelta(microseconds=cpu.get("user_usec", 0)),
+            system_time=timedelta(microseconds=cpu.get("system_usec", 0)),
+            peak_memory=peak,
+            oom_killed=events.get("oom_kill", 0) > 0,
+        )
+
+    def remove(self) -> None:
+        os.close(self.procs_fd)
+        # processes can take a moment to leave after being killed
+        for _ in range(100):
+            try:
+                self.path.rmdir()
+                return
+            except FileNotFoundError:
+                return
+            except OSError as e:
+                if e.errno != errno.EBUSY:
+                    break
+                self.kill()
+                time.sleep(0.01)
+        warning(f"Could not remove cgroup {self.path}")
+
+
+class CgroupManager:
+    """Owns the delegated subtree in which the run cgroups are created."""
+
+    def __init__(self, root: Directory):
+        self.root = root
+        self.counter = itertools.count()
+
+    def setup(self) -> None:
+        """Enable the controllers for children, raises OSError if not possible."""
+        available = (self.root / "cgroup.controllers").read_text().split()
+        missing = [c for c in CONTROLLERS if c not in available]
+        if missing:
+            raise OSError(errno.ENOTSUP, f"controllers {missing} not delegated")
+        subtree = " ".join(f"+{c}" for c in CONTROLLERS)
+        try:
+            (self.root / "cgroup.subtree_control").write_text(subtree)
+        except OSError as e:
+            if e.errno != errno.EBUSY:
+                raise
+            # a cgroup with processes can not have controllers for children,
+            # so we move ourselves into a leaf next to the run cgroups
+            supervisor = self.root / SUPERVISOR_NAME
+            supervisor.mkdir(exist_ok=True)
+            (supervisor / "cgroup.procs").write_text(str(os.getpid()))
+            (self.root / "cgroup.subtree_control").write_text(subtree)
+
+    def create(self, memorylimit: float) -> RunCgroup:
+        name = f"itool-run-{os.getpid()}-{next(self.counter)}"
+        return RunCgroup(self.root / name, memorylimit)
+
+
+_manager_lock = threading.Lock()
+_manager: Optional[CgroupManager] = None
+_manager_checked = False
+
+
+def get_manager(root: Optional[Directory] = None) -> Optional[CgroupManager]:
+    """Return the manager, or None (with a warning once) if cgroups are unusable."""
+    global _manager, _manager_checked
+    with _manager_lock:
+        if _manager_checked:
+            return _manager
+        _manager_checked = True
+        root = root or find_own_cgroup()
+        if root is None:
+            warning("cgroup v2 not found, using the native backend instead.")
+            return None
+        manager = CgroupManager(root)
+        try:
+            manager.setup()
+        except OSError as e:
+            warning(
+                f"cgroup {root} is not usable ({e}), using the native backend instead."
+            )
+            return None
+        _manager = manager
+        return _manager
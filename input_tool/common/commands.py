@@ -124,11 +124,20 @@ class Config:
     execute: bool
     quiet: bool
     rus_time: bool
+    backend: str = "native"
+    pin_cpus: bool = False
     timelimits: Timelimit = {Langs.Lang.unknown: timedelta(seconds=3)}
     warn_timelimits: Timelimit = {Langs.Lang.unknown: timedelta(0)}
     memorylimit: float
     fail_skip: bool
     threads: int
+    checker_threads: int = 1
+    checker_timeout: float = 60
+    checker_memorylimit: float = 0
+    checker_persistent: bool = False
+    checker_cache: bool = True
+    compile_cache: bool = True
+    forkserver: bool = False
 
     inside_oneline: bool
     inside_inputmaxlen: int
@@ -161,14 +170,30 @@ class Config:
         return max(1, int(available * ratio))
 
 
-def get_statistics_header(input_paths: Iterable[RelativePath]) -> str:
+def get_statistics_header(
+    input_paths: Iterable[RelativePath], net: bool = False
+) -> str:
+    """Header of the summary table, with the net times if `net`"""
     inputs: list[str] = [str(i) for i in input_paths]
     has_samples = any("sample" in x for x in inputs)
     batches = set([x.rsplit(".", 2)[0] for x in inputs if "sample" not in x])
     pts = len(batches)
-    widths = [Config.cmd_maxlen, 8, 9, 6, 6, max(7, pts + has_samples)]
-    colnames = ["Solution", "Max time", "Times sum", f"Pt {pts:3}", "Status", "Batches"]
-    return table_header(colnames, widths, "<>>>><")
+    widths = [Config.cmd_maxlen, 8, 9, 7, 6, 6, max(7, pts + has_samples)]
+    colnames = [
+        "Solution",
+        "Max time",
+        "Times sum",
+        "Max mem",
+        f"Pt {pts:3}",
+        "Status",
+        "Batches",
+    ]
+    alignment = "<>>>>><"
+    if net:
+        widths[3:3] = (8, 9)
+        colnames[3:3] = ("Net max", "Net sum")
+        alignment = "<>>>>>>><"
+    return table_header(colnames, widths, alignment)
 
 
 """
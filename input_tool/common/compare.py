@@ -0,0 +1,155 @@
+# © 2026 fezjo
+"""
+Built-in comparison of output files, used by the `diff` and `tokens` checkers
+instead of running a program for every test.
+
+Modes of `diff`:
+- `exact` - the files are the same byte by byte, like `diff -q`
+- `cr` - also ignore a CR before the end of line, like `--strip-trailing-cr`
+- `ws` - compare only the whitespace separated words of non-empty lines
+
+`tokens` compares the whitespace separated tokens, numbers with a tolerance.
+"""
+
+from __future__ import annotations
+
+import itertools
+from dataclasses import dataclass
+from typing import BinaryIO, Callable, Iterator, Optional
+
+from input_tool.common.types import Path
+
+CHUNK_SIZE = 1 << 20
+COMPARE_MODES = ("exact", "cr", "ws")
+
+
+def _same_bytes(f1: BinaryIO, f2: BinaryIO) -> bool:
+    while True:
+        chunk1, chunk2 = f1.read(CHUNK_SIZE), f2.read(CHUNK_SIZE)
+        if chunk1 != chunk2:
+            return False
+        if not chunk1:
+            return True
+
+
+def _strip_cr(lines: BinaryIO) -> Iterator[bytes]:
+    for line in lines:
+        if line.endswith(b"\r\n"):
+            yield line[:-2] + b"\n"
+        elif line.endswith(b"\r"):
+            yield line[:-1]
+        else:
+            yield line
+
+
+def _split_words(lines: BinaryIO) -> Iterator[list[bytes]]:
+    for line in lines:
+        words = line.split()
+        if words:
+            yield words
+
+
+LINE_NORMALIZERS: dict[str, Callable[[BinaryIO], Iterator]] = {
+    "cr": _strip_cr,
+    "ws": _split_words,
+}
+
+
+def files_equal(ofile: Path, tfile: Path, mode: str = "exact") -> bool:
+    """Compare the reference output with the tested one, see the modes above."""
+    if mode == "exact" and ofile.stat().st_size != tfile.stat().st_size:
+        return False
+    with open(ofile, "rb") as f1, open(tfile, "rb") as f2:
+        if mode == "exact":
+            return _same_bytes(f1, f2)
+        normalize = LINE_NORMALIZERS[mode]
+        missing = object()
+        return all(
+            a == b
+            for a, b in itertools.zip_longest(
+                normalize(f1), normalize(f2), fillvalue=missing
+            )
+        )
+
+
+@dataclass
+class TokenOptions:
+    """Options of the `tokens` checker, e.g. `tokens:eps=1e-6,icase`"""
+
+    abs_eps: float = 0.0
+    rel_eps: float = 0.0
+    ignore_case: bool = False
+
+    @staticmethod
+    def parse(spec: str) -> TokenOptions:
+        options = TokenOptions()
+        for item in filter(None, spec.split(",")):
+            key, _, value = item.partition("=")
+            if key == "icase" and not value:
+                options.ignore_case = True
+            elif key in ("eps", "abs", "rel") and value:
+                eps = float(value)
+                if key != "rel":
+                    options.abs_eps = eps
+                if key != "abs":
+                    options.rel_eps = eps
+            else:
+                raise ValueError(f"unknown option {item!r}")
+        return options
+
+    def numbers_close(self, expected: bytes, got: bytes) -> bool:
+        if not self.abs_eps and not self.rel_eps:
+            return False
+        try:
+            x, y = float(expected), float(got)
+        except ValueError:
+            return False
+        diff = abs(x - y)
+        return diff <= self.abs_eps or diff <= self.rel_eps * abs(x)
+
+
+def _read_tokens(f: BinaryIO, lower: bool) -> Iterator[list[bytes]]:
+    """Tokens of the file in batches, split in bulk from large chunks."""
+    rest = b""
+    while chunk := f.read(CHUNK_SIZE):
+        chunk = rest + (chunk.lower() if lower else chunk)
+        tokens = chunk.split()
+        # the last token may continue in the next chunk
+        rest = tokens.pop() if not chunk[-1:].isspace() else b""
+        if tokens:
+            yield tokens
+    if rest:
+        yield [rest]
+
+
+def find_token_mismatch(
+    ofile: Path, tfile: Path, options: TokenOptions
+) -> Optional[str]:
+    """Describe the first token that differs, None if the outputs match."""
+    with open(ofile, "rb") as f1, open(tfile, "rb") as f2:
+        ours = _read_tokens(f1, options.ignore_case)
+        theirs = _read_tokens(f2, options.ignore_case)
+        expected: list[bytes] = []
+        got: list[bytes] = []
+        position = 0
+        while True:
+            expected = expected or next(ours, [])
+            got = got or next(theirs, [])
+            if not expected or not got:
+                if expected:
+                    return f"Output ended at token {position + 1}"
+                if got:
+                    return f"Output has extra tokens from token {position + 1}"
+                return None
+            n = min(len(expected), len(got))
+            if expected[:n] != got[:n]:
+                for i, (x, y) in enumerate(zip(expected[:n], got[:n])):
+                    if x != y and not options.numbers_close(x, y):
+                        x_str, y_str = x.decode(errors="replace"), y.decode(
+                            errors="replace"
+                        )
+                        return (
+                            f"Token {position + i + 1}: expected {x_str}, got {y_str}"
+                        )
+            expected, got = expected[n:], got[n:]
+            position += n
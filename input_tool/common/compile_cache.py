@@ -0,0 +1,150 @@
+# © 2026 fezjo
+"""
+Programs compiled before, shared by all tasks of the user.
+
+A build is looked up by a hash of everything it depends on: the source, the
+headers it includes by a relative path, the compiler and the flags. On a hit
+the executable is only linked or copied, so touching the sources, a fresh
+checkout or another --progdir doesn't mean compiling again. Failed builds are
+remembered too, so an unchanged broken source fails at once.
+
+Only C and C++ are cached, other languages can use local modules which we
+would not notice.
+"""
+
+import json
+import os
+import re
+import shlex
+import shutil
+import stat
+import tempfile
+from dataclasses import asdict, dataclass
+from typing import Optional
+
+from input_tool.common.commands import Config
+from input_tool.common.hashing import hash_bytes, hash_file
+from input_tool.common.messages import warning
+from input_tool.common.types import Path
+
+INCLUDE_RE = re.compile(rb'^\s*#\s*include\s*"([^"]+)"', re.MULTILINE)
+RESULT_FILENAME = "result.json"
+EXECUTABLE_FILENAME = "executable"
+
+
+@dataclass
+class CompileResult:
+    returncode: int
+    stdout: str
+    stderr: str
+
+
+def get_cache_dir(kind: str = "compile") -> Path:
+    cache_home = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(cache_home).absolute() / "input-tool" / kind
+
+
+def get_cache_file(kind: str, directory: Path) -> Path:
+    """File of `kind` about the data in `directory`, kept out of the directory"""
+    key = hash_bytes(str(directory.resolve()).encode())
+    return get_cache_dir(kind) / f"{key}.json"
+
+
+def find_includes(source: Path) -> list[Path]:
+    """Headers included with quotes by the source and by them, if they exist"""
+    found: dict[Path, Path] = {}
+    todo = [source]
+    while todo:
+        path = todo.pop()
+        try:
+            text = path.read_bytes()
+        except OSError:
+            continue
+        for name in INCLUDE_RE.findall(text):
+            header = path.parent / name.decode(errors="replace")
+            if header.is_file() and header.resolve() not in found:
+                found[header.resolve()] = header
+                todo.append(header)
+    return sorted(found.values())
+
+
+def get_tool_identity(cmd: str) -> str:
+    """The program the command runs, changes when the program is updated"""
+    words = shlex.split(cmd)
+    path = shutil.which(words[0]) if words else None
+    if path is None:
+        return cmd
+    st = os.stat(path)
+    return f"{cmd} {path} {st.st_size} {st.st_mtime_ns}"
+
+
+class CompileCache:
+    """Safe to use from multiple threads and processes"""
+
+    def make_key(self, source: Path, recipe: Optional[str]) -> Optional[str]:
+        """None if the cache is disabled or the build can't be cached"""
+        if not Config.compile_cache or recipe is None:
+            return None
+        try:
+            hashes = [hash_file(source).encode()] + [
+                f"{os.path.relpath(path, source.parent)} {hash_file(path)}".encode()
+                for path in find_includes(source)
+            ]
+        except OSError:
+            return None
+        return hash_bytes(recipe.encode(), *hashes)
+
+    def get(self, key: Optional[str]) -> Optional[tuple[CompileResult, Path]]:
+        if key is None:
+            return None
+        entry = get_cache_dir() / key
+        try:
+            with open(entry / RESULT_FILENAME) as f:
+                result = CompileResult(**json.load(f))
+        except (OSError, ValueError, TypeError):
+            return None
+        executable = entry / EXECUTABLE_FILENAME
+        if result.returncode == 0 and not executable.is_file():
+            return None
+        return result, executable
+
+    def put(
+        self, key: Optional[str], result: CompileResult, executable: Optional[Path]
+    ) -> None:
+        if key is None:
+            return
+        if result.returncode == 0 and (executable is None or not executable.is_file()):
+            return
+        cache_dir = get_cache_dir()
+        try:
+            cache_dir.mkdir(parents=True, exist_ok=True)
+            tmpdir = Path(tempfile.mkdtemp(dir=cache_dir, prefix=".tmp-"))
+            if result.returncode == 0:
+                assert executable is not None
+                cached = tmpdir / EXECUTABLE_FILENAME
+                shutil.copy2(executable, cached)
+                # hardlinks of it are handed out, nobody should write into it
+                cached.chmod(stat.S_IRUSR | stat.S_IXUSR | stat.S_IRGRP | stat.S_IXGRP)
+            with open(tmpdir / RESULT_FILENAME, "w") as f:
+                json.dump(asdict(result), f)
+        except OSError as e:
+            warning(f"Failed to store the build in the compile cache: {e!r}")
+            return
+        try:
+            os.rename(tmpdir, cache_dir / key)
+        except OSError:
+            # somebody else has stored the same build meanwhile
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+    @staticmethod
+    def materialize(cached: Path, target: Path) -> None:
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.unlink(missing_ok=True)
+        try:
+            os.link(cached, target)
+        except OSError:
+            shutil.copy2(cached, target)
+            target.chmod(target.stat().st_mode | stat.S_IWUSR)
+
+
+COMPILE_CACHE = CompileCache()
@@ -0,0 +1,457 @@
+# © 2026 fezjo
+"""
+Execution backends for solutions.
+
+The `shell` backend builds a `sh -c` command line with `ulimit`, `date`, `time`
+and `timeout` around the program. The `native` backend forks and execs the
+program directly: limits are set with `setrlimit` in the child, redirections are
+opened by us, stderr is drained while the program runs, the timeout is enforced
+from here and times come from the monotonic clock and `wait4` rusage. All running
+programs are watched by a single `ProcessSupervisor` thread. The
+`cgroup` backend is the `native` one with each run placed in its own cgroup, see
+`cgroups.py`. Commands which need a shell (pipes, redirections, variables, ...)
+always use the `shell` backend.
+"""
+
+import heapq
+import os
+import resource
+import select
+import shlex
+import signal
+import subprocess
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Callable, Optional, Sequence
+
+from input_tool.common.cgroups import RunCgroup
+from input_tool.common.types import Path
+
+BACKENDS = ("native", "shell", "cgroup")  # the first one is the default
+
+# exit codes with the same meaning as when running through `sh` and `timeout`
+EXIT_TIMEOUT = 124
+EXIT_NOT_EXECUTABLE = 126
+EXIT_NOT_FOUND = 127
+EXIT_SIGNAL_BASE = 128
+
+SHELL_SPECIAL_CHARACTERS = frozenset("|&;<>()$`*?[]{}~!\n")
+
+# `ru_maxrss` is in kilobytes on Linux but in bytes on macOS
+MAXRSS_UNIT = 1 if sys.platform == "darwin" else 1024
+
+
+@dataclass
+class ExecutionResult:
+    returncode: int
+    wall_time: timedelta
+    user_time: timedelta
+    system_time: timedelta
+    stderr: bytes = b""
+    timed_out: bool = False
+    peak_memory: Optional[int] = None  # bytes
+    oom_killed: bool = False
+
+    def get_times(self, rus_time: bool) -> list[timedelta]:
+        """Same layout as the shell backend: wall [elapsed user system]"""
+        if not rus_time:
+            return [self.wall_time]
+        return [self.wall_time, self.wall_time, self.user_time, self.system_time]
+
+
+def split_command(cmd: str) -> Optional[list[str]]:
+    """Return argv for `cmd` if it can be executed without a shell, else None."""
+    if any(c in SHELL_SPECIAL_CHARACTERS for c in cmd):
+        return None
+    try:
+        argv = shlex.split(cmd)
+    except ValueError:
+        return None
+    if not argv or "=" in argv[0]:  # empty command or variable assignment
+        return None
+    return argv
+
+
+RlimitSettings = list[tuple[int, tuple[int, int]]]
+
+
+def get_memory_rlimits(memorylimit: float, stack_only: bool = False) -> RlimitSettings:
+    """Equivalent of `ulimit -d -m -s -v`, computed in the parent."""
+    limit_names: tuple[str, ...] = (
+        "RLIMIT_DATA",
+        "RLIMIT_RSS",
+        "RLIMIT_STACK",
+        "RLIMIT_AS",
+    )
+    if stack_only:  # memory is limited by the cgroup
+        limit_names = ("RLIMIT_STACK",)
+    result: RlimitSettings = []
+    for name in limit_names:
+        if not hasattr(resource, name):
+            continue
+        rlimit = getattr(resource, name)
+        _soft, hard = resource.getrlimit(rlimit)
+        limit = hard
+        if memorylimit:
+            limit = int(memorylimit * 1024 * 1024)
+            if hard != resource.RLIM_INFINITY:
+                limit = min(limit, hard)
+        result.append((rlimit, (limit, limit)))
+    return result
+
+
+def make_preexec(
+    rlimits: RlimitSettings,
+    cgroup: Optional[RunCgroup] = None,
+    isolate: Optional[Callable[[], None]] = None,
+) -> Callable[[], None]:
+    """
+    Popen has no option for rlimits and `process_group=0` needs Python 3.11, so we
+    need `preexec_fn`. It runs in the forked child while other tester threads may
+    hold locks, so it only does syscalls with values precomputed by the parent.
+    """
+
+    def preexec() -> None:
+        os.setpgid(0, 0)  # so that timeout kills also the children of the program
+        for rlimit, values in rlimits:
+            try:
+                resource.setrlimit(rlimit, values)
+            except (ValueError, OSError):
+                pass  # the shell would complain and continue as well
+        if cgroup is not None:
+            cgroup.join_from_child()
+        if isolate is not None:
+            isolate()  # pin to a core, see `affinity.py`
+
+    return preexec
+
+
+def kill_process_group(process: subprocess.Popen) -> None:
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+class StderrCollector:
+    """Keep reading stderr of a running process so it never blocks on a full pipe."""
+
+    def __init__(self, process: subprocess.Popen):
+        self.chunks: list[bytes] = []
+        self.fd: Optional[int] = None
+        self.thread: Optional[threading.Thread] = None
+        if process.stderr is not None:
+            self.fd = process.stderr.fileno()
+            os.set_blocking(self.fd, False)
+
+    def read_available(self) -> bool:
+        """Read what is in the pipe now, return False once it is closed."""
+        if self.fd is None:
+            return False
+        while True:
+            try:
+                chunk = os.read(self.fd, 1 << 16)
+            except BlockingIOError:
+                return True
+            if not chunk:
+                self.fd = None
+                return False
+            self.chunks.append(chunk)
+
+    def start_thread(self) -> None:
+        """Used when we can not poll on the pipe together with the process."""
+        if self.fd is None:
+            return
+        os.set_blocking(self.fd, True)
+
+        def read_all(fd: int) -> None:
+            while chunk := os.read(fd, 1 << 16):
+                self.chunks.append(chunk)
+
+        self.thread = threading.Thread(target=read_all, args=(self.fd,), daemon=True)
+        self.thread.start()
+        self.fd = None
+
+    def finish(self) -> bytes:
+        if self.thread is not None:
+            # children of the program could keep the pipe open, don't wait forever
+            self.thread.join(1)
+        else:
+            self.read_available()
+        return b"".join(self.chunks)
+
+
+def reap(process: subprocess.Popen) -> tuple[int, Optional[resource.struct_rusage]]:
+    """Collect the exit status together with resource usage of the process."""
+    try:
+        _pid, status, rusage = os.wait4(process.pid, 0)
+    except ChildProcessError:
+        # somebody else (e.g. `Popen.kill` from another thread) already reaped it
+        process.wait()
+        return process.returncode, None
+    process.returncode = os.waitstatus_to_exitcode(status)
+    return process.returncode, rusage
+
+
+WaitResult = tuple[int, Optional[resource.struct_rusage], bool]
+
+
+class Watch:
+    """A program watched by the supervisor."""
+
+    def __init__(
+        self,
+        process: subprocess.Popen,
+        pidfd: int,
+        stderr: StderrCollector,
+        kill: Callable[[], None],
+    ):
+        self.process = process
+        self.pidfd = pidfd
+        self.stderr = stderr
+        self.kill = kill
+        self.timed_out = False
+        self.finished = threading.Event()
+        self.result: Optional[WaitResult] = None
+
+    def wait(self) -> WaitResult:
+        self.finished.wait()
+        assert self.result is not None
+        return self.result
+
+
+class ProcessSupervisor:
+    """
+    Watch all running programs from one thread: their pidfds and stderr pipes are
+    in a single epoll set and the deadlines in a heap, so a timeout kills the
+    program right away and the workers just wait until their program is reaped.
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.epoll = select.epoll()
+        self.fds: dict[int, Watch] = {}
+        self.deadlines: list[tuple[float, int, Watch]] = []
+        self.counter = 0  # breaks ties in the heap
+        # writing to the pipe wakes the thread up when a deadline is added
+        self.wakeup_read, self.wakeup_write = os.pipe()
+        os.set_blocking(self.wakeup_read, False)
+        os.set_blocking(self.wakeup_write, False)
+        self.epoll.register(self.wakeup_read, select.EPOLLIN)
+        self.thread = threading.Thread(target=self.loop, daemon=True)
+        self.thread.start()
+
+    def watch(
+        self,
+        process: subprocess.Popen,
+        timeout: Optional[float],
+        stderr: StderrCollector,
+        kill: Callable[[], None],
+    ) -> Watch:
+        watch = Watch(process, os.pidfd_open(process.pid), stderr, kill)
+        with self.lock:
+            self.fds[watch.pidfd] = watch
+            self.epoll.register(watch.pidfd, select.EPOLLIN)
+            if stderr.fd is not None:
+                self.fds[stderr.fd] = watch
+                self.epoll.register(stderr.fd, select.EPOLLIN)
+            if timeout is not None:
+                self.counter += 1
+                deadline = time.monotonic() + timeout
+                heapq.heappush(self.deadlines, (deadline, self.counter, watch))
+        try:
+            os.write(self.wakeup_write, b"\0")
+        except BlockingIOError:
+            pass  # the thread will wake up anyway
+        return watch
+
+    def unregister(self, fd: int) -> None:
+        self.epoll.unregister(fd)
+        del self.fds[fd]
+
+    def finish(self, watch: Watch) -> None:
+        self.unregister(watch.pidfd)
+        if watch.stderr.fd is not None and watch.stderr.fd in self.fds:
+            self.unregister(watch.stderr.fd)
+        os.close(watch.pidfd)
+        returncode, rusage = reap(watch.process)
+        watch.result = returncode, rusage, watch.timed_out
+        watch.finished.set()
+
+    def next_timeout(self) -> float:
+        while self.deadlines and self.deadlines[0][2].finished.is_set():
+            heapq.heappop(self.deadlines)
+        if not self.deadlines:
+            return -1
+        return max(0.0, self.deadlines[0][0] - time.monotonic())
+
+    def kill_expired(self) -> None:
+        now = time.monotonic()
+        while self.deadlines and self.deadlines[0][0] <= now:
+            _deadline, _counter, watch = heapq.heappop(self.deadlines)
+            if not watch.finished.is_set() and not watch.timed_out:
+                watch.timed_out = True
+                watch.kill()  # the pidfd becomes readable once it is dead
+
+    def loop(self) -> None:
+        while True:
+            with self.lock:
+                timeout = self.next_timeout()
+            events = self.epoll.poll(timeout)
+            with self.lock:
+                for fd, _event in events:
+                    if fd == self.wakeup_read:
+                        while True:
+                            try:
+                                os.read(self.wakeup_read, 1 << 10)
+                            except BlockingIOError:
+                                break
+                        continue
+                    watch = self.fds.get(fd)
+                    if watch is None:
+                        continue
+                    if fd == watch.pidfd:
+                        self.finish(watch)
+                    elif not watch.stderr.read_available():
+                        self.unregister(fd)
+                self.kill_expired()
+
+
+_supervisor_lock = threading.Lock()
+_supervisor: Optional[ProcessSupervisor] = None
+_supervisor_checked = False
+
+
+def get_supervisor() -> Optional[ProcessSupervisor]:
+    """Return the supervisor, or None if there is no pidfd/epoll (not Linux)."""
+    global _supervisor, _supervisor_checked
+    with _supervisor_lock:
+        if not _supervisor_checked:
+            _supervisor_checked = True
+            if hasattr(os, "pidfd_open") and hasattr(select, "epoll"):
+                try:
+                    os.close(os.pidfd_open(os.getpid()))
+                    _supervisor = ProcessSupervisor()
+                except OSError:
+                    pass  # kernel older than 5.3
+        return _supervisor
+
+
+def wait_with_timeout(
+    process: subprocess.Popen,
+    timeout: Optional[float],
+    stderr: StderrCollector,
+    kill: Callable[[], None],
+) -> WaitResult:
+    """Wait for `process`, kill it after `timeout`, return (code, rusage, timed out)"""
+    supervisor = get_supervisor()
+    if supervisor is not None:
+        try:
+            watch = supervisor.watch(process, timeout, stderr, kill)
+        except OSError:
+            pass
+        else:
+            return watch.wait()
+
+    # no pidfd (old kernel or not Linux), let a timer kill the process instead
+    stderr.start_thread()
+    fired = threading.Event()
+
+    def on_timeout() -> None:
+        fired.set()
+        kill()
+
+    timer = threading.Timer(timeout, on_timeout) if timeout is not None else None
+    if timer is not None:
+        timer.start()
+    returncode, rusage = reap(process)
+    if timer is not None:
+        timer.cancel()
+    return returncode, rusage, fired.is_set()
+
+
+def normalize_returncode(returncode: int) -> int:
+    """Map killed by signal to `128 + signal`, same as `sh` would report it."""
+    return EXIT_SIGNAL_BASE - returncode if returncode < 0 else returncode
+
+
+def run_native(
+    argv: Sequence[str],
+    stdin: Path,
+    stdout: Path,
+    timelimit: timedelta = timedelta(0),
+    memorylimit: float = 0.0,
+    capture_stderr: bool = True,
+    cb_set_kill: Callable[[Callable[[], None]], None] = lambda _: None,
+    cgroup: Optional[RunCgroup] = None,
+    isolate: Optional[Callable[[], None]] = None,
+) -> ExecutionResult:
+    rlimits = get_memory_rlimits(memorylimit, stack_only=cgroup is not None)
+    preexec = make_preexec(rlimits, cgroup, isolate)
+    timeout = timelimit.total_seconds() if timelimit else None
+    stderr = subprocess.PIPE if capture_stderr else subprocess.DEVNULL
+    with open(stdin, "rb") as f_in, open(stdout, "wb") as f_out:
+        start = time.monotonic()
+        try:
+            # preexec_fn is kept minimal, see `make_preexec`
+            process = subprocess.Popen(
+                argv,
+                stdin=f_in,
+                stdout=f_out,
+                stderr=stderr,
+                preexec_fn=preexec,  # noqa: PLW1509
+            )
+        except OSError as e:
+            elapsed = timedelta(seconds=time.monotonic() - start)
+            returncode = (
+                EXIT_NOT_FOUND
+                if isinstance(e, FileNotFoundError)
+                else EXIT_NOT_EXECUTABLE
+            )
+            message = f"{argv[0]}: {e.strerror}\n".encode()
+            return ExecutionResult(
+                returncode, elapsed, timedelta(), timedelta(), message
+            )
+    # the child counts our resident memory from the fork in its `ru_maxrss`
+    # (exec keeps the high-water mark), so only a peak above ours is its own
+    inherited = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    def kill() -> None:
+        if cgroup is None or not cgroup.kill():
+            kill_process_group(process)
+
+    with process:
+        cb_set_kill(kill)
+        stderr_collector = StderrCollector(process)
+        returncode, rusage, timed_out = wait_with_timeout(
+            process, timeout, stderr_collector, kill
+        )
+        wall_time = timedelta(seconds=time.monotonic() - start)
+        err = stderr_collector.finish()
+
+    user_time = timedelta(seconds=rusage.ru_utime if rusage else 0)
+    system_time = timedelta(seconds=rusage.ru_stime if rusage else 0)
+    peak_memory: Optional[int] = None
+    if rusage is not None and rusage.ru_maxrss > inherited:
+        peak_memory = rusage.ru_maxrss * MAXRSS_UNIT
+    oom_killed = False
+    if cgroup is not None:
+        # covers also the children and grandchildren of the program
+        usage = cgroup.usage()
+        user_time, system_time = usage.user_time, usage.system_time
+        peak_memory = usage.peak_memory or peak_memory
+        oom_killed = usage.oom_killed
+    returncode = EXIT_TIMEOUT if timed_out else normalize_returncode(returncode)
+    return ExecutionResult(
+        returncode,
+        wall_time,
+        user_time,
+        system_time,
+        err,
+        timed_out,
+        peak_memory,
+        oom_killed,
+    )
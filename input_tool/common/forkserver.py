@@ -0,0 +1,255 @@
+# © 2026 fezjo
+"""
+Python helpers forked from a warm interpreter instead of started anew.
+
+Generators, validators and checkers run once per input and their time is not
+graded, yet every run pays for starting the interpreter and importing the
+modules. A server process compiles the script and imports what it imports at
+the top level once. For every run it forks a waiter, which forks the child
+running the script as `__main__` with the given argv, stdin, stdout, stderr,
+limits and working directory, and reports its exit code. The child is the
+leader of its process group, so it can be killed like the other programs.
+
+The descriptors are passed over a Unix socket. The server exits once its stdin
+is closed, that is when we exit.
+"""
+
+import atexit
+import json
+import os
+import select
+import shlex
+import shutil
+import signal
+import socket
+import subprocess
+import tempfile
+import threading
+from typing import Iterable, Optional, Sequence
+
+from input_tool.common import execution
+from input_tool.common.messages import Logger
+from input_tool.common.types import Path
+
+STARTUP_TIMEOUT = 10  # seconds
+
+SERVER = r"""
+import ast, atexit, json, os, resource, select, signal, socket, sys, traceback, types
+
+address, script = sys.argv[1], sys.argv[2]
+with open(script, "rb") as f:
+    source = f.read()
+code = compile(source, script, "exec")
+sys.path[0] = os.path.dirname(os.path.abspath(script))
+# import what the script imports at the top level, once for all the runs
+for node in ast.parse(source).body:
+    if isinstance(node, ast.ImportFrom) and node.module == "__future__":
+        continue
+    if isinstance(node, (ast.Import, ast.ImportFrom)):
+        try:
+            exec(compile(ast.Module([node], []), script, "exec"), {})
+        except Exception:
+            pass  # the run fails the same way, if it does
+
+
+def run(request, fds):
+    os.setpgid(0, 0)
+    for target, fd in enumerate(fds):
+        os.dup2(fd, target)
+    for fd in fds:
+        if fd > 2:
+            os.close(fd)
+    for limit, values in request["rlimits"]:
+        try:
+            resource.setrlimit(limit, tuple(values))
+        except (ValueError, OSError):
+            pass
+    if request["cpus"]:
+        os.sched_setaffinity(0, request["cpus"])
+    os.chdir(request["cwd"])
+    sys.stdin = sys.__stdin__ = open(0, "r", closefd=False)
+    sys.stdout = sys.__stdout__ = open(1, "w", closefd=False)
+    sys.stderr = sys.__stderr__ = open(
+        2, "w", buffering=1, errors="backslashreplace", closefd=False
+    )
+    sys.argv = request["argv"]
+    module = types.ModuleType("__main__")
+    module.__file__ = os.path.abspath(script)
+    module.__builtins__ = __builtins__
+    sys.modules["__main__"] = module
+    status = 0
+    try:
+        exec(code, module.__dict__)
+    except SystemExit as e:
+        if isinstance(e.code, int):
+            status = e.code
+        elif e.code is not None:
+            print(e.code, file=sys.stderr)
+            status = 1
+    except BaseException as e:
+        # without the frame of this function, as if the script was run
+        traceback.print_exception(type(e), e, e.__traceback__.tb_next)
+        status = 1
+    try:
+        atexit._run_exitfuncs()
+        sys.stdout.flush()
+        sys.stderr.flush()
+    except BaseException:
+        status = status or 1
+    os._exit(status)
+
+
+def wait(conn, request, fds):
+    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+    pid = os.fork()
+    if pid == 0:
+        conn.close()
+        run(request, fds)
+    try:
+        os.setpgid(pid, pid)  # before we report the pid to be killed
+    except OSError:
+        pass
+    for fd in fds:
+        os.close(fd)
+    try:
+        conn.sendall(b"%d\n" % pid)
+        _, status = os.waitpid(pid, 0)
+        conn.sendall(b"%d\n" % os.waitstatus_to_exitcode(status))
+    finally:
+        os._exit(0)
+
+
+listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+listener.bind(address)
+listener.listen(64)
+signal.signal(signal.SIGCHLD, signal.SIG_IGN)  # the waiters are reaped for us
+sys.stdout.write("ready\n")
+sys.stdout.flush()
+while True:
+    readable, _, _ = select.select([listener, sys.stdin], [], [])
+    if sys.stdin in readable:
+        break  # closed, nobody writes to it
+    conn, _ = listener.accept()
+    message, fds, _, _ = socket.recv_fds(conn, 1 << 16, 3)
+    while message and not message.endswith(b"\n"):
+        chunk = conn.recv(1 << 16)
+        if not chunk:
+            break
+        message += chunk
+    if len(fds) == 3 and message.endswith(b"\n") and os.fork() == 0:
+        listener.close()
+        wait(conn, json.loads(message), fds)
+    conn.close()
+    for fd in fds:
+        os.close(fd)
+"""
+
+
+class ForkServer:
+    """Warm interpreter of a Python script, thread safe"""
+
+    def __init__(self, python: str, script: Path):
+        self.directory = Path(tempfile.mkdtemp(prefix="input-tool-fork-"))
+        self.address = str(self.directory / "socket")
+        self.process = subprocess.Popen(
+            [*shlex.split(python), "-c", SERVER, self.address, str(script)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+        )
+        assert self.process.stdout is not None
+        ready, _, _ = select.select([self.process.stdout], [], [], STARTUP_TIMEOUT)
+        if not ready or self.process.stdout.readline() != b"ready\n":
+            self.close()
+            raise OSError(f"the server of {script} did not start")
+
+    def is_alive(self) -> bool:
+        return self.process.poll() is None
+
+    def run(
+        self,
+        argv: Sequence[str],
+        stdin: int,
+        stdout: int,
+        stderr: int,
+        rlimits: execution.RlimitSettings,
+        timeout: Optional[float] = None,
+        cpus: Iterable[int] = (),
+    ) -> int:
+        """
+        Exit code of the script run with `argv` on the descriptors, `128 + signal`
+        if it was killed. Raise TimeoutExpired if it runs over `timeout` seconds.
+        """
+        request = json.dumps(
+            {
+                "argv": list(argv),
+                "cwd": os.getcwd(),
+                "rlimits": rlimits,
+                "cpus": sorted(cpus),
+            }
+        ).encode()
+        request += b"\n"
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(self.address)
+            sent = socket.send_fds(sock, [request], [stdin, stdout, stderr])
+            sock.sendall(request[sent:])
+            replies = sock.makefile("rb")
+            pid = self.parse_reply(replies.readline())
+            sock.settimeout(timeout)
+            try:
+                returncode = self.parse_reply(replies.readline())
+            except TimeoutError:
+                try:
+                    os.killpg(pid, signal.SIGKILL)
+                except (ProcessLookupError, PermissionError):
+                    pass
+                raise subprocess.TimeoutExpired(list(argv), timeout or 0)
+        return execution.normalize_returncode(returncode)
+
+    @staticmethod
+    def parse_reply(line: bytes) -> int:
+        try:
+            return int(line)
+        except ValueError:
+            raise OSError(f"the fork server replied {line!r}") from None
+
+    def close(self) -> None:
+        assert self.process.stdin is not None
+        try:
+            self.process.stdin.close()
+            self.process.wait(timeout=1)
+        except (OSError, subprocess.TimeoutExpired):
+            self.process.kill()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+class ForkServers:
+    """The servers of the scripts, started on the first run, thread safe"""
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.servers: dict[tuple[str, str], Optional[ForkServer]] = {}
+
+    def get(self, python: str, script: Path, logger: Logger) -> Optional[ForkServer]:
+        """The running server of the script, None if it can't run"""
+        key = (python, str(script))
+        with self.lock:
+            if key not in self.servers:
+                try:
+                    self.servers[key] = ForkServer(python, script)
+                    logger.infob(f"Forking the runs of {script} from a warm {python}.")
+                except OSError as e:
+                    logger.warning(f"Failed to start a fork server of {script}: {e}")
+                    self.servers[key] = None
+            server = self.servers[key]
+        return server if server is not None and server.is_alive() else None
+
+    def close(self) -> None:
+        with self.lock:
+            servers, self.servers = self.servers, {}
+        for server in servers.values():
+            if server is not None:
+                server.close()
+
+
+FORK_SERVERS = ForkServers()
+atexit.register(FORK_SERVERS.close)
@@ -0,0 +1,52 @@
+# © 2026 fezjo
+"""
+Content hashes of files, used to recognize results that we already know.
+
+Hashes are remembered by path, size and modification time, so a file is read
+only once unless it changes.
+"""
+
+import hashlib
+import os
+import threading
+from typing import Iterable
+
+from input_tool.common.types import Path
+
+CHUNK_SIZE = 1 << 20
+
+_lock = threading.Lock()
+_known: dict[tuple[str, int, int], str] = {}
+
+
+def hash_bytes(*parts: bytes) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        h.update(len(part).to_bytes(8, "little"))
+        h.update(part)
+    return h.hexdigest()
+
+
+def hash_file(path: Path, remember: bool = True) -> str:
+    """
+    Raise OSError if the file can't be read. Files rewritten in quick succession,
+    like outputs of the tested programs, should not be remembered.
+    """
+    st = os.stat(path)
+    key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    with _lock:
+        if key in _known:
+            return _known[key]
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        while chunk := f.read(CHUNK_SIZE):
+            h.update(chunk)
+    digest = h.hexdigest()
+    if remember:
+        with _lock:
+            _known[key] = digest
+    return digest
+
+
+def hash_files(paths: Iterable[Path]) -> str:
+    return hash_bytes(*(hash_file(p).encode() for p in paths))
@@ -0,0 +1,187 @@
+# © 2026 fezjo
+"""
+Class data sharing archives of Java solutions.
+
+Starting the JVM and loading the classes of a solution often takes longer than
+the test itself. A training run dumps the loaded classes into an archive
+(`-XX:ArchiveClassesAtExit`, JDK 13+), which the later runs map instead of
+loading and verifying the classes again. The archive is used only if the
+solution then behaves the same and starts faster, by the median of a few runs.
+
+The archive and the decision are kept in the user cache, keyed by the hash of
+the class files, so the training happens once per build. CDS archives only the
+classes from jars and checks that the class path didn't change, so the classes
+are packed into a jar in the cache and run from there.
+"""
+
+import json
+import os
+import shlex
+import subprocess
+import threading
+import time
+import zipfile
+from dataclasses import asdict, dataclass
+from typing import Callable, Optional
+
+from input_tool.common.compile_cache import get_cache_dir, get_tool_identity
+from input_tool.common.hashing import hash_bytes, hash_file
+from input_tool.common.types import Directory, Path, ShellCommand
+
+JAR_FILENAME = "classes.jar"
+ARCHIVE_FILENAME = "classes.jsa"
+RESULT_FILENAME = "result.json"
+RUNS = 3  # the startups are compared by the median of this many runs
+TRAINING_TIMEOUT = 10  # seconds
+# JVM warnings go to stdout by default, where they would break the output
+LOGGING = "-Xlog:disable -Xlog:all=warning:stderr"
+
+
+@dataclass
+class Archive:
+    run_cmd: ShellCommand
+    startup_before: float
+    startup_after: float
+
+
+@dataclass
+class StoredResult:
+    faster: bool
+    startup_before: float
+    startup_after: float
+
+
+Run = tuple[float, int, bytes]
+
+
+def run_timed(cmd: str, stdin: Path) -> Optional[Run]:
+    """Seconds, return code and output of the command, None if it timed out"""
+    with open(stdin, "rb") as f:
+        start = time.perf_counter()
+        try:
+            process = subprocess.run(
+                cmd,
+                shell=True,
+                stdin=f,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                timeout=TRAINING_TIMEOUT,
+            )
+        except subprocess.TimeoutExpired:
+            return None
+    return time.perf_counter() - start, process.returncode, process.stdout
+
+
+def run_timed_median(cmd: str, stdin: Path) -> Optional[Run]:
+    """`run_timed` with the median of `RUNS` runs, None if they don't agree"""
+    runs: list[Run] = []
+    for _ in range(RUNS):
+        run = run_timed(cmd, stdin)
+        if run is None or (runs and run[1:] != runs[0][1:]):
+            return None
+        runs.append(run)
+    seconds = sorted(run[0] for run in runs)
+    return seconds[len(seconds) // 2], runs[0][1], runs[0][2]
+
+
+def get_tmp_path(path: Path) -> Path:
+    """Unique for this thread, so the others see either the whole file or none"""
+    return path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}")
+
+
+def write_atomic(path: Path, write: Callable[[Path], object]) -> None:
+    tmp = get_tmp_path(path)
+    try:
+        write(tmp)
+        os.replace(tmp, path)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+
+def write_jar(classes: Directory, files: list[Path], jar: Path) -> None:
+    def write(tmp: Path) -> None:
+        with zipfile.ZipFile(tmp, "w") as f:
+            for path in files:
+                f.write(path, path.relative_to(classes).as_posix())
+
+    write_atomic(jar, write)
+
+
+def load_result(path: Path) -> Optional[StoredResult]:
+    try:
+        with open(path) as f:
+            return StoredResult(**json.load(f))
+    except (OSError, ValueError, TypeError):
+        return None
+
+
+def train(
+    java: str, args: str, archive: Path, shared_cmd: ShellCommand, stdin: Path
+) -> StoredResult:
+    """Make the archive by a training run, compare the startups with and without"""
+    before = run_timed_median(f"{java} {LOGGING} {args}", stdin)
+    if before is None:
+        return StoredResult(False, 0, 0)
+    tmp = get_tmp_path(archive)
+    dump = f"{java} {LOGGING} -XX:ArchiveClassesAtExit={shlex.quote(str(tmp))} {args}"
+    training = run_timed(dump, stdin)
+    if training is None or not tmp.is_file():
+        tmp.unlink(missing_ok=True)
+        return StoredResult(False, before[0], 0)
+    os.replace(tmp, archive)
+    after = run_timed_median(shared_cmd, stdin)
+    faster = after is not None and after[1:] == before[1:] and after[0] < before[0]
+    if not faster:
+        archive.unlink(missing_ok=True)
+    return StoredResult(faster, before[0], 0 if after is None else after[0])
+
+
+def get_archive(
+    run_cmd: ShellCommand, classes: Directory, stdin: Optional[Path]
+) -> Optional[Archive]:
+    """
+    The command that runs `java ... -cp <classes> ...` with the archive of its
+    classes, made by training runs on `stdin` the first time. None if the
+    archive doesn't help.
+    """
+    words = shlex.split(run_cmd)
+    if "-cp" not in words[:-1]:
+        return None
+    classpath = words.index("-cp") + 1
+    try:
+        files = sorted(classes.rglob("*.class"))
+        key = hash_bytes(
+            get_tool_identity(words[0]).encode(),
+            shlex.join(words[1:classpath] + words[classpath + 1 :]).encode(),
+            *(
+                f"{path.relative_to(classes)} {hash_file(path, False)}".encode()
+                for path in files
+            ),
+        )
+    except OSError:
+        return None
+    entry = get_cache_dir("cds") / key
+    jar = entry / JAR_FILENAME
+    archive = entry / ARCHIVE_FILENAME
+    words[classpath] = str(jar)
+    java, args = shlex.quote(words[0]), shlex.join(words[1:])
+    shared_cmd = ShellCommand(
+        f"{java} {LOGGING} -XX:SharedArchiveFile={shlex.quote(str(archive))} {args}"
+    )
+
+    result = load_result(entry / RESULT_FILENAME)
+    if result is None:
+        try:
+            entry.mkdir(parents=True, exist_ok=True)
+            # the archive remembers the jar, which must not change under it
+            if not jar.is_file():
+                write_jar(classes, files, jar)
+            stdin = Path(os.devnull) if stdin is None else stdin
+            result = train(java, args, archive, shared_cmd, stdin)
+            content = json.dumps(asdict(result))
+            write_atomic(entry / RESULT_FILENAME, lambda tmp: tmp.write_text(content))
+        except OSError:
+            return None
+    if not result.faster or not archive.is_file():
+        return None
+    return Archive(shared_cmd, result.startup_before, result.startup_after)
@@ -33,6 +33,7 @@ class Status(Enum):
     ce = 5, None  # not used yet
     err = 6, None
     valid = 7, None
+    mle = 8, None
 
     @property
     def id(self) -> int:
@@ -69,6 +70,7 @@ status_reprs = {
     Status.ce: "CE",
     Status.err: "ERR",
     Status.valid: "VALID",
+    Status.mle: "MLE",
 }
 
 
@@ -143,6 +145,7 @@ _codemap: dict[str, Union[str, int]] = {
     "CE": "ERR",
     "ERR": 41,
     "VALID": "OK",
+    "MLE": "cyan",
     "bad": "yellow",
     "good": "green",
     "ok": "yellow",
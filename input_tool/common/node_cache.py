@@ -0,0 +1,114 @@
+# © 2026 fezjo
+"""
+V8 code cache of JavaScript programs, kept in the progdir.
+
+`node sol.js` parses and compiles the script again on every test. A launcher
+compiles the script with the code cache V8 produced on a training run, so the
+functions that ran are not compiled again. It wraps the script like CommonJS
+does, so `require`, `module`, `__filename` and `require.main === module` work
+as if the script was run directly. The cache is used only if the training run
+produced one.
+"""
+
+import json
+import os
+import shlex
+import subprocess
+import threading
+from typing import Optional
+
+from input_tool.common.compile_cache import get_tool_identity
+from input_tool.common.hashing import hash_bytes, hash_file
+from input_tool.common.types import Directory, Path, ShellCommand
+
+CACHE_DIRNAME = ".node-cache"
+LAUNCHER_FILENAME = "launcher.js"
+CODE_CACHE_FILENAME = "code.cache"
+TRAINING_TIMEOUT = 10  # seconds
+# the launcher writes the code cache at exit, when this is set
+WRITE_VARIABLE = "INPUT_TOOL_WRITE_CODE_CACHE"
+
+LAUNCHER = """"use strict";
+const fs = require("fs");
+const path = require("path");
+const vm = require("vm");
+const Module = require("module");
+const filename = %(source)s;
+const cacheFile = %(cache)s;
+let cachedData;
+try {
+    cachedData = fs.readFileSync(cacheFile);
+} catch (e) {}
+const script = new vm.Script(Module.wrap(fs.readFileSync(filename, "utf8")), {
+    filename,
+    cachedData,
+});
+if (process.env.%(variable)s) {
+    process.on("exit", () => {
+        const tmp = cacheFile + "." + process.pid;
+        fs.writeFileSync(tmp, script.createCachedData());
+        fs.renameSync(tmp, cacheFile);
+    });
+}
+const main = new Module(filename, null);
+main.filename = filename;
+main.paths = Module._nodeModulePaths(path.dirname(filename));
+Module._cache[filename] = main;
+process.mainModule = main;
+process.argv[1] = filename;
+const mainRequire = Module.createRequire(filename);
+mainRequire.main = main;
+script.runInThisContext()(
+    main.exports, mainRequire, main, filename, path.dirname(filename)
+);
+main.loaded = true;
+"""
+
+
+def get_launcher(
+    node: str, source: Path, cache_dir: Directory, stdin: Optional[Path]
+) -> Optional[ShellCommand]:
+    """
+    The command that runs the source with its code cache, made by a training
+    run on `stdin` the first time. None if V8 didn't produce any.
+    """
+    absolute = source.absolute()
+    try:
+        key = hash_bytes(
+            get_tool_identity(node).encode(),
+            hash_file(source).encode(),
+            str(absolute).encode(),
+        )
+    except OSError:
+        return None
+    entry = (cache_dir / CACHE_DIRNAME / key).absolute()
+    launcher = entry / LAUNCHER_FILENAME
+    code_cache = entry / CODE_CACHE_FILENAME
+    run_cmd = ShellCommand(f"{node} {shlex.quote(str(launcher))}")
+    if code_cache.is_file():
+        return run_cmd
+    try:
+        entry.mkdir(parents=True, exist_ok=True)
+        tmp = entry / f"{LAUNCHER_FILENAME}.{os.getpid()}.{threading.get_ident()}"
+        tmp.write_text(
+            LAUNCHER
+            % {
+                "source": json.dumps(str(absolute)),
+                "cache": json.dumps(str(code_cache)),
+                "variable": WRITE_VARIABLE,
+            }
+        )
+        os.replace(tmp, launcher)
+        with open(os.devnull if stdin is None else stdin, "rb") as f:
+            subprocess.run(
+                run_cmd,
+                shell=True,
+                stdin=f,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                env={**os.environ, WRITE_VARIABLE: "1"},
+                timeout=TRAINING_TIMEOUT,
+            )
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    return run_cmd if code_cache.is_file() else None
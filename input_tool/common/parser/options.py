@@ -1,9 +1,12 @@
 # © 2024 fezjo
-from typing import Any, Optional, Type, TypedDict
+from typing import Any, Optional, Sequence, Type, TypedDict
+
+from input_tool.common.execution import BACKENDS
 
 
 class ParserOptions(TypedDict, total=False):
     action: str
+    choices: Sequence[str]
     const: Any
     dest: str
     default: Any
@@ -141,6 +144,26 @@ argument_options: dict[str, tuple[tuple[str, ...], ParserOptions, Optional[str]]
         },
         "preparing",
     ),
+    "compile_cache": (
+        ("--no-compile-cache",),
+        {
+            "dest": "compile_cache",
+            "action": "store_false",
+            "help": "[?] don't reuse executables and errors of identical "
+            + "C/C++ builds from the user cache",
+        },
+        "preparing",
+    ),
+    "forkserver": (
+        ("--forkserver",),
+        {
+            "dest": "forkserver",
+            "action": "store_true",
+            "help": "[?] fork the runs of Python generators, validators and checkers "
+            + "from a warm interpreter with their modules already imported",
+        },
+        "preparing",
+    ),
     "nosort": (
         ("-S", "--no-sort"),
         {
@@ -282,6 +305,16 @@ argument_options: dict[str, tuple[tuple[str, ...], ParserOptions, Optional[str]]
         },
         "testing",
     ),
+    "nettimes": (
+        ("--net-times",),
+        {
+            "dest": "nettimes",
+            "action": "store_true",
+            "help": "[?] measure the startup of an empty program of every language "
+            + "and show the times without it in the statistics",
+        },
+        "testing",
+    ),
     "timelimit": (
         ("-t", "--time"),
         {
@@ -315,6 +348,79 @@ argument_options: dict[str, tuple[tuple[str, ...], ParserOptions, Optional[str]]
         },
         "testing",
     ),
+    "checker_threads": (
+        ("--checker-threads",),
+        {
+            "dest": "checker_threads",
+            "default": 0,
+            "type": int,
+            "metavar": "N",
+            "help": "[?] how many checkers can run at once, separately from "
+            + "the solutions, 0 means half of --threads (default: {})",
+        },
+        "testing",
+    ),
+    "checker_timeout": (
+        ("--checker-timeout",),
+        {
+            "dest": "checker_timeout",
+            "default": 60,
+            "type": float,
+            "metavar": "SECONDS",
+            "help": "[?] kill a checker running longer, the output is then "
+            + "wrong, 0 means unlimited (default: {})",
+        },
+        "testing",
+    ),
+    "checker_memorylimit": (
+        ("--checker-memory",),
+        {
+            "dest": "checker_memorylimit",
+            "default": 0,
+            "type": float,
+            "metavar": "MB",
+            "help": "[?] memorylimit of a checker, 0 means unlimited (default: {})",
+        },
+        "testing",
+    ),
+    "checker_persistent": (
+        ("--persistent-checker",),
+        {
+            "dest": "checker_persistent",
+            "action": "store_true",
+            "help": "[?] start the checker once and send it the tests over stdin, "
+            + "one `input reference result` line each, see TESTER.md",
+        },
+        "testing",
+    ),
+    "incremental": (
+        ("--incremental",),
+        {
+            "dest": "incremental",
+            "action": "store_true",
+            "help": "[?] reuse results from previous runs where the program, the input, "
+            + "the output, the limits and the checker did not change",
+        },
+        "testing",
+    ),
+    "fresh": (
+        ("--fresh",),
+        {
+            "dest": "fresh",
+            "action": "store_true",
+            "help": "[?] run all tests again, but remember the results for --incremental",
+        },
+        "testing",
+    ),
+    "checker_cache": (
+        ("--no-checker-cache",),
+        {
+            "dest": "checker_cache",
+            "action": "store_false",
+            "help": "[?] run the checker even on outputs it has already checked",
+        },
+        "testing",
+    ),
     "diffcmd": (
         ("-d", "--diff"),
         {
@@ -364,6 +470,28 @@ argument_options: dict[str, tuple[tuple[str, ...], ParserOptions, Optional[str]]
         "testing",
     ),
     # running
+    "backend": (
+        ("--backend",),
+        {
+            "dest": "backend",
+            "default": BACKENDS[0],
+            "choices": BACKENDS,
+            "help": "[?] how to run solutions, `native` runs them directly and "
+            + "falls back to `shell` for commands that need it, `cgroup` also "
+            + "limits and measures the whole process tree (default: {})",
+        },
+        "running",
+    ),
+    "pin_cpus": (
+        ("--pin-cpus",),
+        {
+            "dest": "pin_cpus",
+            "action": "store_true",
+            "help": "[?] run each solution on its own physical core without "
+            + "using its SMT sibling, with higher priority if allowed",
+        },
+        "running",
+    ),
     "pythoncmd_gen": (
         ("--pythoncmd",),
         {
@@ -404,7 +532,20 @@ argument_options: dict[str, tuple[tuple[str, ...], ParserOptions, Optional[str]]
             "default": 0,
             "type": int,
             "metavar": "NUM",
-            "help": "how many threads to use (default: 1/4 of threads)",
+            "help": "how many threads to use "
+            + "(default: from `itool calibrate`, otherwise 1/4 of threads)",
+        },
+        "running",
+    ),
+    "threads_calibrate": (
+        ("-j", "--threads"),
+        {
+            "dest": "threads",
+            "default": 0,
+            "type": int,
+            "metavar": "NUM",
+            "help": "the highest number of parallel runs to measure "
+            + "(default: all threads)",
         },
         "running",
     ),
@@ -432,6 +573,30 @@ argument_options: dict[str, tuple[tuple[str, ...], ParserOptions, Optional[str]]
         },
         "testing",
     ),
+    # calibrate
+    "tolerance": (
+        ("--tolerance",),
+        {
+            "dest": "tolerance",
+            "default": 0.1,
+            "type": float,
+            "metavar": "RATIO",
+            "help": "highest acceptable slowdown against a single thread, "
+            + "e.g. 0.1 = 10%% (default: {})",
+        },
+        "testing",
+    ),
+    "repeats": (
+        ("--repeats",),
+        {
+            "dest": "repeats",
+            "default": 3,
+            "type": int,
+            "metavar": "NUM",
+            "help": "[?] how many times to run each probe on every level (default: {})",
+        },
+        "testing",
+    ),
     # target
     "description": (
         ("description",),
@@ -165,6 +165,13 @@ class UnifiedParser:
             specs.short_description_findlimits,
             specs.options_findlimits,
         )
+        self.calibrate_parser, self.calibrate_fh_parser = self.add_subparser(
+            "calibrate",
+            (),
+            specs.description_calibrate,
+            specs.short_description_calibrate,
+            specs.options_calibrate,
+        )
         self.colortest_parser, self.colortest_fh_parser = self.add_subparser(
             "colortest",
             (),
@@ -193,6 +200,7 @@ class UnifiedParser:
             "ag": "autogenerate",
             "findlimits": "findlimits",
             "fl": "findlimits",
+            "calibrate": "calibrate",
             "colortest": "colortest",
             "checkupdates": "checkupdates",
         }
@@ -227,6 +235,11 @@ class UnifiedParser:
                 self.findlimits_fh_parser,
                 specs.ArgsFindlimits,
             ),
+            "calibrate": (
+                self.calibrate_parser,
+                self.calibrate_fh_parser,
+                specs.ArgsCalibrate,
+            ),
             "colortest": (
                 self.colortest_parser,
                 self.colortest_fh_parser,
@@ -59,6 +59,8 @@ options_generator = [
     "progdir",
     "inext",
     "compile",
+    "compile_cache",
+    "forkserver",
     "execute",
     "colorful",
     "quiet",
@@ -80,6 +82,8 @@ class ArgsGenerator:
     progdir: Directory
     inext: str
     compile: bool
+    compile_cache: bool
+    forkserver: bool
     execute: bool
     colorful: bool
     quiet: bool
@@ -115,6 +119,8 @@ options_tester = [
     "outext",
     "tempext",
     "compile",
+    "compile_cache",
+    "forkserver",
     "nosort",
     "dupprog",
     "bestonly",
@@ -127,14 +133,24 @@ options_tester = [
     "clearbin",
     "reset",
     "rustime",
+    "nettimes",
     "timelimit",
     "warntimelimit",
     "memorylimit",
     "diffcmd",
     "showdiff",
+    "checker_threads",
+    "checker_timeout",
+    "checker_memorylimit",
+    "checker_persistent",
+    "checker_cache",
+    "incremental",
+    "fresh",
     "keepwa",
     "fail_skip",
     "ioram",
+    "backend",
+    "pin_cpus",
     "pythoncmd_test",
     "threads_test",
     "programs",
@@ -151,6 +167,8 @@ class ArgsTester:
     outext: str
     tempext: str
     compile: bool
+    compile_cache: bool
+    forkserver: bool
     sort: bool
     dupprog: bool
     bestonly: bool
@@ -163,14 +181,24 @@ class ArgsTester:
     clearbin: bool
     reset: bool
     rustime: bool
+    nettimes: bool
     timelimit: str
     warntimelimit: str
     memorylimit: float
     diffcmd: str
     showdiff: bool
+    checker_threads: int
+    checker_timeout: float
+    checker_memorylimit: float
+    checker_persistent: bool
+    checker_cache: bool
+    incremental: bool
+    fresh: bool
     keepwa: bool
     fail_skip: bool
     ioram: bool
+    backend: str
+    pin_cpus: bool
     pythoncmd: str
     threads: int
     programs: list[str]
@@ -192,6 +220,7 @@ options_compile = [
     "help",
     "full_help",
     "progdir",
+    "compile_cache",
     "colorful",
     "quiet",
     "pythoncmd_test",
@@ -204,6 +233,7 @@ options_compile = [
 class ArgsCompile:
     full_help: bool
     progdir: Directory
+    compile_cache: bool
     colorful: bool
     quiet: bool
     pythoncmd: str
@@ -232,6 +262,8 @@ options_autogenerate = [
     "outext",
     "tempext",
     "compile",
+    "compile_cache",
+    "forkserver",
     "execute",
     "colorful",
     "quiet",
@@ -260,6 +292,8 @@ class ArgsAutogenerate:
     outext: str
     tempext: str
     compile: bool
+    compile_cache: bool
+    forkserver: bool
     execute: bool
     colorful: bool
     quiet: bool
@@ -304,6 +338,7 @@ options_findlimits = [
     "outext",
     "tempext",
     "compile",
+    "compile_cache",
     "execute",
     "colorful",
     "quiet",
@@ -311,8 +346,14 @@ options_findlimits = [
     "clearbin",
     "memorylimit",
     "diffcmd",
+    "checker_timeout",
+    "checker_memorylimit",
+    "checker_persistent",
+    "checker_cache",
     "baseline_multiplier",
     "max_timelimit",
+    "backend",
+    "pin_cpus",
     "pythoncmd_test",
     "threads_test",
     "programs",
@@ -329,6 +370,7 @@ class ArgsFindlimits:
     outext: str
     tempext: str
     compile: bool
+    compile_cache: bool
     execute: bool
     colorful: bool
     quiet: bool
@@ -336,8 +378,14 @@ class ArgsFindlimits:
     clearbin: bool
     memorylimit: float
     diffcmd: str
+    checker_timeout: float
+    checker_memorylimit: float
+    checker_persistent: bool
+    checker_cache: bool
     baseline_multiplier: float
     max_timelimit: float
+    backend: str
+    pin_cpus: bool
     pythoncmd: str
     threads: int
     programs: list[str]
@@ -349,6 +397,34 @@ class ArgsFindlimits:
         self.progdir = Path(self.progdir)
 
 
+description_calibrate = """
+Calibrate parallel testing.
+Run CPU-bound and memory-bandwidth-bound probes with increasing number of threads
+and measure how much they slow each other down. The highest number of threads
+with slowdown under tolerance is saved to a local profile and used by the tester
+and findlimits by default.
+"""
+short_description_calibrate = "Measure how parallel runs slow each other down."
+options_calibrate = [
+    "help",
+    "full_help",
+    "colorful",
+    "tolerance",
+    "repeats",
+    "threads_calibrate",
+]
+
+
+@dataclass
+class ArgsCalibrate:
+    full_help: bool
+    colorful: bool
+    tolerance: float
+    repeats: int
+    threads: int
+    deprecated: list[Any] = field(default_factory=list)
+
+
 description_colortest = """
 Test colors.
 Test color support of terminal by printing all of them and exit.
@@ -371,6 +447,7 @@ Args = Union[
     ArgsCompile,
     ArgsAutogenerate,
     ArgsFindlimits,
+    ArgsCalibrate,
 ]
 
 ArgsT = TypeVar(
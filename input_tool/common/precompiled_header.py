@@ -0,0 +1,111 @@
+# © 2026 fezjo
+"""
+Precompiled `<bits/stdc++.h>` for C++ programs, shared by all tasks of the user.
+
+Parsing the whole standard library takes most of the time of compiling a
+typical solution. For every compiler and flags we build a directory with a
+header `bits/stdc++.h` that only includes the real one by `#include_next` and
+its precompiled `bits/stdc++.h.gch`. The directory is added to the include
+path of the solutions that include the header. GCC looks for the `.gch` before
+the header, if it doesn't fit the compilation, the header is used as usual.
+"""
+
+import os
+import re
+import shlex
+import shutil
+import subprocess
+import tempfile
+import threading
+from typing import Optional
+
+from input_tool.common.compile_cache import (
+    find_includes,
+    get_cache_dir,
+    get_tool_identity,
+)
+from input_tool.common.hashing import hash_bytes
+from input_tool.common.messages import Logger
+from input_tool.common.types import Directory, Path
+
+HEADER = "bits/stdc++.h"
+HEADER_RE = re.compile(rb"^\s*#\s*include\s*<bits/stdc\+\+\.h>", re.MULTILINE)
+FAILED_FILENAME = "failed"
+
+
+def includes_header(source: Path) -> bool:
+    """If the source or the headers it includes by quotes include <bits/stdc++.h>"""
+    for path in (source, *find_includes(source)):
+        try:
+            if HEADER_RE.search(path.read_bytes()):
+                return True
+        except OSError:
+            pass
+    return False
+
+
+class PrecompiledHeaders:
+    """Safe to use from multiple threads and processes"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._building: dict[str, threading.Lock] = {}
+
+    def get_include_dir(
+        self, compiler: str, flags: str, logger: Logger
+    ) -> Optional[Directory]:
+        """
+        Directory with the precompiled header to add to the include path,
+        built the first time. None if it can't be built.
+        """
+        key = hash_bytes(get_tool_identity(compiler).encode(), flags.encode())
+        directory = get_cache_dir("pch") / key
+        with self._lock:
+            lock = self._building.setdefault(key, threading.Lock())
+        # the other programs with the same flags wait for the first one
+        with lock:
+            if (directory / FAILED_FILENAME).exists():
+                return None
+            if not (directory / f"{HEADER}.gch").is_file():
+                self.build(compiler, flags, directory, logger)
+            if not (directory / f"{HEADER}.gch").is_file():
+                return None
+        return directory
+
+    @staticmethod
+    def build(compiler: str, flags: str, directory: Directory, logger: Logger) -> None:
+        logger.infob(f"Precompiling <{HEADER}> for the compiler and its flags.")
+        try:
+            directory.parent.mkdir(parents=True, exist_ok=True)
+            tmpdir = Path(tempfile.mkdtemp(dir=directory.parent, prefix=".tmp-"))
+            header = tmpdir / HEADER
+            header.parent.mkdir()
+            header.write_text(f"#include_next <{HEADER}>\n")
+            process = subprocess.run(
+                [
+                    *shlex.split(compiler),
+                    *shlex.split(flags),
+                    "-x",
+                    "c++-header",
+                    str(header),
+                    "-o",
+                    f"{header}.gch",
+                ],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+            )
+        except (OSError, ValueError) as e:
+            logger.warning(f"Failed to precompile <{HEADER}>: {e!r}")
+            return
+        if process.returncode:
+            # remember it, so that we don't try again with every compilation
+            logger.warning(f"Failed to precompile <{HEADER}>, compiling without it.")
+            (tmpdir / FAILED_FILENAME).write_bytes(process.stderr)
+        try:
+            os.rename(tmpdir, directory)
+        except OSError:
+            # somebody else has built it meanwhile
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+PRECOMPILED_HEADERS = PrecompiledHeaders()
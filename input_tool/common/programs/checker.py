@@ -1,20 +1,43 @@
 # © 2014 jano <janoh@ksp.sk>
 # © 2022 fezjo
+import os
+import select
 import subprocess
+import tempfile
+import threading
+import time
 from collections import defaultdict
 from enum import Enum
-from threading import Event
-from typing import Optional
+from typing import Optional, Union
 
-from input_tool.common.commands import to_base_alnum
-from input_tool.common.messages import Logger, default_logger, fit_text_into_screen
+from input_tool.common import execution
+from input_tool.common.affinity import CPU_SLOTS
+from input_tool.common.commands import Config, to_base_alnum
+from input_tool.common.compare import (
+    COMPARE_MODES,
+    TokenOptions,
+    files_equal,
+    find_token_mismatch,
+)
+from input_tool.common.forkserver import ForkServer
+from input_tool.common.hashing import hash_bytes
+from input_tool.common.messages import (
+    Logger,
+    default_logger,
+    fatal,
+    fit_text_into_screen,
+)
 from input_tool.common.programs.program import Program
+from input_tool.common.task_queue import Dependency
 from input_tool.common.types import Path, ShellCommand, TempFile
+from input_tool.common.verdict_cache import VERDICT_CACHE
 
 
 class CheckerType(Enum):
     # just a simple byte comparator
     diff = "diff"
+    # built-in comparator of tokens
+    tokens = "tokens"
     # custom checker
     check = "check"
     chito = "chito"
@@ -29,21 +52,154 @@ class CheckerType(Enum):
         return self in (CheckerType.interactive_pipe, CheckerType.interactive_kspjudge)
 
 
+# custom checkers which can be kept running with --persistent-checker
+PERSISTENT_TYPES = (
+    CheckerType.check,
+    CheckerType.chito,
+    CheckerType.test,
+    CheckerType.tester,
+)
+
+
+class PersistentProcess:
+    """One long-lived checker, answering a line for every line of paths."""
+
+    def __init__(self, cmd: str, quiet: bool):
+        rlimits = execution.get_memory_rlimits(Config.checker_memorylimit)
+        isolate = CPU_SLOTS.make_spare_isolate()
+        self.process = subprocess.Popen(
+            cmd,
+            shell=True,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL if quiet else None,
+            preexec_fn=execution.make_preexec(
+                rlimits, isolate=isolate
+            ),  # noqa: PLW1509
+        )
+        self.buffer = b""
+
+    def request(self, line: str, timeout: Optional[float]) -> Optional[str]:
+        """Return the reply, None if the checker exited. Can raise TimeoutError."""
+        assert self.process.stdin is not None and self.process.stdout is not None
+        try:
+            self.process.stdin.write(line.encode() + b"\n")
+            self.process.stdin.flush()
+        except BrokenPipeError:
+            return None
+        fd = self.process.stdout.fileno()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while b"\n" not in self.buffer:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                raise TimeoutError
+            ready, _, _ = select.select([fd], [], [], remaining)
+            if not ready:
+                raise TimeoutError
+            chunk = os.read(fd, 1 << 16)
+            if not chunk:
+                return None
+            self.buffer += chunk
+        reply, _, self.buffer = self.buffer.partition(b"\n")
+        return reply.decode("utf-8", errors="replace")
+
+    def kill(self) -> int:
+        execution.kill_process_group(self.process)
+        return self.process.wait()
+
+    def close(self) -> None:
+        assert self.process.stdin is not None
+        try:
+            self.process.stdin.close()
+            self.process.wait(timeout=1)
+        except (OSError, subprocess.TimeoutExpired):
+            pass
+        self.kill()
+
+
+class PersistentCheckerPool:
+    """
+    Checkers started once and reused, so that we don't pay for starting an
+    interpreter for every test. Every process checks one test at a time, so there
+    are at most as many of them as checks running at once. A process that crashes,
+    replies nonsense or times out is killed and a new one is started next time.
+    Thread safe
+    """
+
+    def __init__(self, cmd: str, quiet: bool):
+        self.cmd = cmd
+        self.quiet = quiet
+        self.lock = threading.Lock()
+        self.idle: list[PersistentProcess] = []
+
+    def check(
+        self, ifile: Path, ofile: Path, tfile: TempFile, logger: Logger
+    ) -> tuple[int, str]:
+        """Return the verdict and the message of the checker."""
+        with self.lock:
+            process = self.idle.pop() if self.idle else None
+        if process is None:
+            process = PersistentProcess(self.cmd, self.quiet)
+        try:
+            reply = process.request(
+                f"{ifile} {ofile} {tfile}", Config.checker_timeout or None
+            )
+        except TimeoutError:
+            process.kill()
+            logger.warning(
+                f"Checker timed out after {Config.checker_timeout}s on {tfile}"
+            )
+            return execution.EXIT_TIMEOUT, ""
+        verdict, _, message = (reply or "").strip().partition(" ")
+        if reply is None or not verdict.lstrip("-").isdigit():
+            status = process.kill()
+            logger.warning(
+                f"Persistent checker exited with status {status} on {tfile}"
+                if reply is None
+                else f"Persistent checker replied {reply!r} on {tfile}"
+            )
+            return 2, ""
+        with self.lock:
+            self.idle.append(process)
+        return int(verdict), message
+
+    def close(self) -> None:
+        with self.lock:
+            idle, self.idle = self.idle, []
+        for process in idle:
+            process.close()
+
+
 class Checker(Program):
     def __init__(self, name: str, show_output: bool = False):
         super().__init__(name)
-        self.output_ready: defaultdict[Path, Event] = defaultdict(Event)
+        self.output_ready: defaultdict[Path, Dependency] = defaultdict(Dependency)
         self.show_output = show_output
         checker_type = self.determine_checker_type(name)
         if checker_type is None:
             assert False, f"Unsupported checker {self.name}"
         self.type = checker_type
-        if name == "diff":
-            self.run_cmd = ShellCommand(
-                "diff " + ("-y -W 120 --strip-trailing-cr" if show_output else "-q")
-            )
+        # built-in comparison for `diff` and `diff:<mode>`, None for commands
+        self.compare_mode: Optional[str] = None
+        base, _, mode = name.partition(":")
+        if base == "diff" and (not mode or mode in COMPARE_MODES):
+            self.compare_mode = mode or ("cr" if show_output else "exact")
+            # only used to show the differences
+            self.run_cmd = ShellCommand("diff -y -W 120 --strip-trailing-cr")
             self.compilecmd = None
             self.force_execute = True
+        self.token_options: Optional[TokenOptions] = None
+        if checker_type == CheckerType.tokens:
+            try:
+                self.token_options = TokenOptions.parse(mode)
+            except ValueError as e:
+                fatal(f"Invalid checker {name}: {e}")
+            self.compile_cmd = None
+            self.force_execute = True
+        self.persistent: Optional[PersistentCheckerPool] = None
+        if Config.checker_persistent and checker_type in PERSISTENT_TYPES:
+            assert self.run_cmd is not None
+            self.persistent = PersistentCheckerPool(self.run_cmd, self.quiet)
 
     @staticmethod
     def filename_befits(filename: str) -> bool:
@@ -51,6 +207,8 @@ class Checker(Program):
 
     @staticmethod
     def determine_checker_type(filename: str) -> Optional[CheckerType]:
+        if filename.partition(":")[0] == "tokens":
+            return CheckerType.tokens
         basename = to_base_alnum(filename)
         prefixes: tuple[tuple[str, CheckerType], ...] = (
             ("diff", CheckerType.diff),
@@ -72,23 +230,39 @@ class Checker(Program):
     def compare_mask(self) -> tuple[int, int, str]:
         return (3, 0, self.name)
 
+    def diff_args(
+        self,
+        ifile: Path,
+        ofile: Path,
+        tfile: TempFile,
+    ) -> Optional[list[str]]:
+        diff_map: dict[CheckerType, list[Union[str, Path]]] = {
+            CheckerType.diff: [ofile, tfile],
+            CheckerType.check: [ifile, ofile, tfile],
+            CheckerType.chito: [ifile, tfile, ofile],
+            CheckerType.test: ["./", "./", ifile, ofile, tfile],
+            CheckerType.tester: ["./", "./", ifile, ofile, tfile],
+        }
+        if self.type in diff_map:
+            return [str(arg) for arg in diff_map[self.type]]
+        return None
+
     def diff_cmd(
         self,
         ifile: Path,
         ofile: Path,
         tfile: TempFile,
     ) -> Optional[str]:
-        diff_map = {
-            CheckerType.diff: f" {ofile} {tfile}",
-            CheckerType.check: f" {ifile} {ofile} {tfile}",
-            CheckerType.chito: f" {ifile} {tfile} {ofile}",
-            CheckerType.test: f" ./ ./ {ifile} {ofile} {tfile}",
-            CheckerType.tester: f" ./ ./ {ifile} {ofile} {tfile}",
-        }
-        if self.run_cmd is not None and self.type in diff_map:
-            return self.run_cmd + diff_map[self.type]
+        args = self.diff_args(ifile, ofile, tfile)
+        if self.run_cmd is not None and args is not None:
+            return " ".join((self.run_cmd, *args))
         return None
 
+    def get_content_hash(self) -> Optional[str]:
+        if self.compare_mode is not None or self.token_options is not None:
+            return hash_bytes(self.name.encode(), str(self.compare_mode).encode())
+        return super().get_content_hash()
+
     def check(
         self,
         ifile: Path,
@@ -97,17 +271,141 @@ class Checker(Program):
         logger: Optional[Logger] = None,
     ) -> int:
         logger = default_logger if logger is None else logger
+        if self.compare_mode is not None or self.token_options is not None:
+            return self.compare(ofile, tfile, logger)
+        checker_hash = self.get_content_hash()
+        key = None
+        if checker_hash is not None:
+            key = VERDICT_CACHE.make_key(checker_hash, ifile, ofile, tfile)
+        # rerun the checker on wrong outputs if we are supposed to show its output
+        verdict = VERDICT_CACHE.get(key, accept_wrong=not self.show_output)
+        if verdict is not None:
+            return verdict
+        if self.persistent is not None:
+            verdict = self.check_persistent(ifile, ofile, tfile, logger)
+        else:
+            verdict = self.check_command(ifile, ofile, tfile, logger)
+        VERDICT_CACHE.put(key, verdict)
+        return verdict
+
+    def check_command(
+        self, ifile: Path, ofile: Path, tfile: TempFile, logger: Logger
+    ) -> int:
         cmd = self.diff_cmd(ifile, ofile, tfile)
         if cmd is None:
             logger.fatal(f"Unsupported checker {self.name}")
             return -1
-        result = subprocess.run(
-            cmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE
-        )
+        rlimits = execution.get_memory_rlimits(Config.checker_memorylimit)
+        result = None
+        try:
+            forkserver = self.get_forkserver(logger)
+            if forkserver is not None:
+                try:
+                    args = self.diff_args(ifile, ofile, tfile)
+                    assert args is not None
+                    result = self.run_forked(forkserver, args, rlimits)
+                except OSError as e:
+                    logger.warning(
+                        f"Fork server of {self.name} failed, running it anew: {e}"
+                    )
+            if result is None:
+                result = self.run_command(cmd, rlimits)
+        except subprocess.TimeoutExpired:
+            logger.warning(
+                f"Checker timed out after {Config.checker_timeout}s on {tfile}"
+            )
+            return execution.EXIT_TIMEOUT
+        returncode, stdout, stderr = result
         if not self.quiet:
-            logger.plain(result.stderr.decode("utf-8"))
-        if result.returncode not in (0, 1):
-            logger.warning(f"Checker exited with status {result}")
-        if self.show_output and result.returncode:
+            logger.plain(stderr.decode("utf-8"))
+        if returncode not in (0, 1):
+            logger.warning(f"Checker exited with status {returncode}")
+        if self.show_output and returncode:
+            logger.infod(fit_text_into_screen(stdout.decode("utf-8"), 5, 80))
+        return returncode
+
+    @staticmethod
+    def run_command(
+        cmd: str, rlimits: execution.RlimitSettings
+    ) -> tuple[int, bytes, bytes]:
+        """Return code, stdout and stderr, raise TimeoutExpired after the timeout"""
+        isolate = CPU_SLOTS.make_spare_isolate()
+        with subprocess.Popen(
+            cmd,
+            shell=True,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            preexec_fn=execution.make_preexec(
+                rlimits, isolate=isolate
+            ),  # noqa: PLW1509
+        ) as process:
+            try:
+                stdout, stderr = process.communicate(
+                    timeout=Config.checker_timeout or None
+                )
+            except subprocess.TimeoutExpired:
+                execution.kill_process_group(process)
+                process.communicate()
+                raise
+        return process.returncode, stdout, stderr
+
+    def run_forked(
+        self,
+        forkserver: ForkServer,
+        args: list[str],
+        rlimits: execution.RlimitSettings,
+    ) -> tuple[int, bytes, bytes]:
+        """Like `run_command`, forked from the warm interpreter"""
+        assert self.fork_script is not None
+        spare = CPU_SLOTS.spare if CPU_SLOTS.enabled else set()
+        with open(os.devnull, "rb") as stdin, tempfile.TemporaryFile() as stdout:
+            with tempfile.TemporaryFile() as stderr:
+                returncode = forkserver.run(
+                    [str(self.fork_script), *args],
+                    stdin.fileno(),
+                    stdout.fileno(),
+                    stderr.fileno(),
+                    rlimits,
+                    Config.checker_timeout or None,
+                    spare,
+                )
+                stdout.seek(0)
+                stderr.seek(0)
+                return returncode, stdout.read(), stderr.read()
+
+    def check_persistent(
+        self, ifile: Path, ofile: Path, tfile: TempFile, logger: Logger
+    ) -> int:
+        assert self.persistent is not None
+        verdict, message = self.persistent.check(ifile, ofile, tfile, logger)
+        if verdict not in (0, 1):
+            logger.warning(f"Checker replied with verdict {verdict}")
+        if self.show_output and verdict and message:
+            logger.infod(fit_text_into_screen(message, 5, 80))
+        return verdict
+
+    def close(self) -> None:
+        """Stop the persistent checkers, if any were started."""
+        if self.persistent is not None:
+            self.persistent.close()
+
+    def compare(self, ofile: Path, tfile: TempFile, logger: Logger) -> int:
+        try:
+            if self.token_options is not None:
+                mismatch = find_token_mismatch(ofile, tfile, self.token_options)
+                if mismatch is not None and self.show_output:
+                    logger.infod(mismatch)
+                return int(mismatch is not None)
+            assert self.compare_mode is not None
+            equal = files_equal(ofile, tfile, self.compare_mode)
+        except OSError as e:
+            logger.warning(f"Checker failed to compare {ofile} and {tfile}: {e!r}")
+            return 2
+        if equal:
+            return 0
+        if self.show_output:
+            result = subprocess.run(
+                f"{self.run_cmd} {ofile} {tfile}", shell=True, capture_output=True
+            )
             logger.infod(fit_text_into_screen(result.stdout.decode("utf-8"), 5, 80))
-        return result.returncode
+        return 1
@@ -1,9 +1,13 @@
 # © 2014 jano <janoh@ksp.sk>
 # © 2022 fezjo
 import subprocess
+import sys
+import tempfile
 
+from input_tool.common import execution
 from input_tool.common.commands import Config
-from input_tool.common.messages import Status, warning
+from input_tool.common.forkserver import ForkServer
+from input_tool.common.messages import Status, default_logger, warning
 from input_tool.common.programs.program import Program
 from input_tool.common.types import Path
 
@@ -13,6 +17,14 @@ class Generator(Program):
         return (4, 0, self.name)
 
     def generate(self, ifile: Path, text: str) -> Status:
+        forkserver = self.get_forkserver(default_logger)
+        if forkserver is not None:
+            try:
+                returncode = self.generate_forked(forkserver, ifile, text)
+                return Status.exc if returncode else Status.ok
+            except OSError as e:
+                warning(f"Fork server of {self.name} failed, running it anew: {e}")
+
         osc = Config.os_config
         ulimit_cmd = (
             f"{osc.cmd_ulimit} -m {osc.mem_unlimited}; "
@@ -26,3 +38,17 @@ class Generator(Program):
                 "Generator ran successfully, but output file was not created. What?"
             )
         return Status.exc if p.returncode else Status.ok
+
+    def generate_forked(self, forkserver: ForkServer, ifile: Path, text: str) -> int:
+        assert self.fork_script is not None
+        with tempfile.TemporaryFile() as stdin, open(ifile, "wb") as stdout:
+            stdin.write(str.encode(text))
+            stdin.seek(0)
+            return forkserver.run(
+                [str(self.fork_script)],
+                stdin.fileno(),
+                stdout.fileno(),
+                sys.stderr.fileno(),
+                # the memory is not limited, like by the `ulimit` above
+                execution.get_memory_rlimits(0),
+            )
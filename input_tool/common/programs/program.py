@@ -3,14 +3,27 @@
 from __future__ import annotations
 
 import os
+import shlex
 import shutil
 import subprocess
 import time
 from typing import Optional
 
 from input_tool.common.commands import Config, Langs, is_file_newer, to_base_alnum
+from input_tool.common.compile_cache import (
+    COMPILE_CACHE,
+    CompileResult,
+    get_tool_identity,
+)
+from input_tool.common.forkserver import FORK_SERVERS, ForkServer
+from input_tool.common.hashing import hash_bytes, hash_file, hash_files
+from input_tool.common.java_cds import get_archive
 from input_tool.common.messages import Logger, default_logger, fatal
-from input_tool.common.types import ExecutableFile, Path, ShellCommand
+from input_tool.common.node_cache import get_launcher
+from input_tool.common.precompiled_header import PRECOMPILED_HEADERS, includes_header
+from input_tool.common.python_bytecode import BYTECODE_CACHE
+from input_tool.common.task_queue import Dependency
+from input_tool.common.types import Directory, ExecutableFile, Path, ShellCommand
 
 
 class Program:
@@ -20,7 +33,8 @@ class Program:
         self.quiet: bool = Config.quiet
         self.can_compile: bool = Config.compile
         self.force_execute: bool = Config.execute
-        self.ready = False
+        # set once prepared, tasks can wait for it, see `TaskItem.after`
+        self.ready = Dependency()
 
         # `extensions` is either easily extracted from `name`
         # or if it's missing, we try to guess it.
@@ -34,6 +48,29 @@ class Program:
         self.compile_cmd: Optional[ShellCommand] = None
         self.run_cmd: Optional[ShellCommand] = None
         self.files_to_clear: list[Path] = []
+        self._content_hash: Optional[str] = None
+        self._toolchain_identity: Optional[str] = None
+        # everything except the sources that the build depends on, None if it
+        # should not be cached, see COMPILE_CACHE
+        self.compile_recipe: Optional[str] = None
+        # programs of the same toolchain can be compiled by a single run of it
+        # into their output directories, see `compile_batch`
+        self.batch_toolchain: Optional[str] = None
+        self.batch_outdir: Optional[Directory] = None
+        self.batch_result: Optional[CompileResult] = None
+        # compiler and flags to precompile <bits/stdc++.h> with, if it is used
+        self.pch_recipe: Optional[tuple[str, str]] = None
+        # run a Python script from its cached bytecode, see BYTECODE_CACHE
+        self.run_from_bytecode = False
+        # run a JavaScript program with the V8 code cache, see `get_launcher`
+        self.use_code_cache = False
+        # classes of a Java program, run with their archive, see `get_archive`
+        self.cds_classes: Optional[Directory] = None
+        # input of training runs, the smallest one if the tester knows them
+        self.training_input: Optional[Path] = None
+        # a Python script that can be forked from a warm interpreter, see
+        # `get_forkserver`
+        self.fork_script: Optional[Path] = None
 
         # compute run_cmd, compile_cmd and files_to_clear
         self._transform()
@@ -113,6 +150,28 @@ class Program:
                 )
                 self.executable_path = Config.progdir / exe
 
+        def setup_compile_recipe(
+            compiler: str, options: list[str], flags_variable: str
+        ) -> None:
+            # the paths in the compile command don't change the executable
+            self.compile_recipe = " ".join(
+                (
+                    self.lang.name,
+                    get_tool_identity(compiler),
+                    *options,
+                    # make passes them to the compiler too
+                    *(
+                        os.environ.get(variable, "")
+                        for variable in (
+                            flags_variable,
+                            "CPPFLAGS",
+                            "LDFLAGS",
+                            "LDLIBS",
+                        )
+                    ),
+                )
+            )
+
         def setup_with_compiled_executable() -> None:
             assert self.executable_path is not None
             self.files_to_clear.append(self.executable_path)
@@ -131,14 +190,32 @@ class Program:
                 ]
                 setup_compile_by_make(option_list)
                 setup_with_compiled_executable()
+                setup_compile_recipe(
+                    compiler or os.environ.get("CC", "cc"), option_list, "CFLAGS"
+                )
             elif self.lang is Langs.Lang.cpp:
                 compiler = Config.os_config.cmd_cpp_compiler
+                cxxflags = "-O2 -g -std=c++20"
                 option_list = [
                     f'CXX="{compiler}"' if compiler else "",
-                    'CXXFLAGS="-O2 -g -std=c++20 $CXXFLAGS"',
+                    f'CXXFLAGS="{cxxflags} $CXXFLAGS"',
                 ]
                 setup_compile_by_make(option_list)
                 setup_with_compiled_executable()
+                setup_compile_recipe(
+                    compiler or os.environ.get("CXX", "g++"), option_list, "CXXFLAGS"
+                )
+                # the flags make passes to the compiler, in its order
+                self.pch_recipe = (
+                    compiler or os.environ.get("CXX", "g++"),
+                    " ".join(
+                        (
+                            cxxflags,
+                            os.environ.get("CXXFLAGS", ""),
+                            os.environ.get("CPPFLAGS", ""),
+                        )
+                    ),
+                )
             elif self.lang is Langs.Lang.haskell:
                 outdir = get_tmpdir(progdir)
                 self.executable_path = Path(progdir) / basename
@@ -153,7 +230,10 @@ class Program:
             elif self.lang is Langs.Lang.java:
                 outdir = get_tmpdir(progdir)
                 self.compile_cmd = ShellCommand(f"javac {self.source_path} -d {outdir}")
+                self.batch_toolchain = "javac"
+                self.batch_outdir = outdir
                 self.run_cmd = ShellCommand(f"java -Xss256m -cp {outdir} {basename}")
+                self.cds_classes = outdir
             elif self.lang is Langs.Lang.pascal:
                 outdir = get_tmpdir(progdir)
                 options = f"-O1 -Sg -FU{outdir} -o{outdir}/{basename}"
@@ -196,10 +276,13 @@ class Program:
                 self.run_cmd = ShellCommand(
                     f"{Config.os_config.cmd_python} {self.source_path}"
                 )
+                self.run_from_bytecode = self.can_compile
+                self.fork_script = self.source_path
             elif self.lang is Langs.Lang.javascript:
                 self.run_cmd = ShellCommand(
                     f"{Config.os_config.cmd_node} {self.source_path}"
                 )
+                self.use_code_cache = self.can_compile
             else:
                 assert False, "unreachable"
 
@@ -230,31 +313,76 @@ class Program:
                 return ExecutableFile(cmd)
         return None
 
-    def prepare(self, logger: Optional[Logger] = None) -> None:
-        assert self.run_cmd is not None
-        logger = default_logger if logger is None else logger
-        fresh_compiled = False
-        if self.compile_cmd is not None:
+    def compile(self, logger: Logger) -> bool:
+        """Build the executable or take it from the cache, return if it is new."""
+        assert self.compile_cmd is not None
+        key = None
+        if self.source_path is not None:
+            key = COMPILE_CACHE.make_key(self.source_path, self.compile_recipe)
+        cached = COMPILE_CACHE.get(key)
+        if cached is not None:
+            result, executable = cached
+            if result.returncode:
+                logger.infob(f"Compilation of {self.name} failed before, not retrying.")
+            else:
+                assert self.executable_path is not None
+                COMPILE_CACHE.materialize(executable, self.executable_path)
+                logger.infob(f"Restored {self.executable_path} from compile cache.")
+            self.report_compilation(result, logger)
+            return True
+
+        if self.batch_result is not None:
+            result = self.batch_result
+            logger.infob(f"Compiled together with others: {self.compile_cmd}")
+        else:
             logger.infob(f"Compiling: {self.compile_cmd}")
-            fresh_compiled = True
-            result = subprocess.run(
+            process = subprocess.run(
                 self.compile_cmd,
                 shell=True,
+                env=self.get_compile_env(logger),
                 stdout=subprocess.PIPE,
                 # TODO if stderr=subprocess.STDOUT, it would stream during compilation
                 stderr=subprocess.PIPE,
             )
-            stderr = result.stderr.decode("utf-8")
-            if stderr:
-                logger.infod(stderr)
-                logger.statistics.compilation_warnings += stderr.count("warning:")
-            if not self.quiet:
-                stdout = result.stdout.decode("utf-8")
-                if "up to date" in stdout:  # TODO: find more robust way
-                    fresh_compiled = False
-                logger.plain(stdout)
-            if result.returncode:
-                logger.fatal("Compilation failed.")
+            result = CompileResult(
+                process.returncode,
+                process.stdout.decode("utf-8"),
+                process.stderr.decode("utf-8"),
+            )
+        COMPILE_CACHE.put(key, result, self.executable_path)
+        self.report_compilation(result, logger)
+        return "up to date" not in result.stdout  # TODO: find more robust way
+
+    def get_compile_env(self, logger: Logger) -> Optional[dict[str, str]]:
+        """Environment of make with the precompiled header, None to keep ours."""
+        if (
+            self.pch_recipe is None
+            or not Config.compile_cache
+            or self.source_path is None
+            or not includes_header(self.source_path)
+        ):
+            return None
+        include_dir = PRECOMPILED_HEADERS.get_include_dir(*self.pch_recipe, logger)
+        if include_dir is None:
+            return None
+        cppflags = f"-I{include_dir} {os.environ.get('CPPFLAGS', '')}"
+        return {**os.environ, "CPPFLAGS": cppflags}
+
+    def report_compilation(self, result: CompileResult, logger: Logger) -> None:
+        if result.stderr:
+            logger.infod(result.stderr)
+            logger.statistics.compilation_warnings += result.stderr.count("warning:")
+        if not self.quiet:
+            logger.plain(result.stdout)
+        if result.returncode:
+            logger.fatal("Compilation failed.")
+
+    def prepare(self, logger: Optional[Logger] = None) -> None:
+        assert self.run_cmd is not None
+        logger = default_logger if logger is None else logger
+        fresh_compiled = False
+        if self.compile_cmd is not None:
+            fresh_compiled = self.compile(logger)
 
             if self.lang is not Langs.Lang.java:
                 possible_cmds = self.get_possible_locations_of_executable(
@@ -284,7 +412,114 @@ class Program:
             subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
             time.sleep(1)
 
-        self.ready = True
+        if self.run_from_bytecode and Config.compile_cache:
+            self.setup_bytecode(logger)
+        if self.use_code_cache and Config.compile_cache:
+            self.setup_code_cache(logger)
+        if self.cds_classes is not None and Config.compile_cache:
+            self.setup_class_data_sharing(logger)
+
+        self.ready.set()
+
+    def setup_bytecode(self, logger: Logger) -> None:
+        assert self.source_path is not None
+        python = Config.os_config.cmd_python
+        launcher = BYTECODE_CACHE.get_launcher(python, self.source_path, logger)
+        if launcher is None:
+            return
+        path, saving = launcher
+        self.run_cmd = ShellCommand(f"{python} {shlex.quote(str(path))}")
+        logger.infob(
+            f"Running {self.name} from bytecode, "
+            f"which saves {saving * 1000:.1f}ms of compiling per run."
+        )
+
+    def setup_code_cache(self, logger: Logger) -> None:
+        assert self.source_path is not None
+        run_cmd = get_launcher(
+            Config.os_config.cmd_node,
+            self.source_path,
+            Path(Config.progdir or "."),
+            self.training_input,
+        )
+        if run_cmd is None:
+            logger.infob(f"V8 produced no code cache of {self.name}.")
+            return
+        self.run_cmd = run_cmd
+        logger.infob(f"Running {self.name} with its V8 code cache.")
+
+    def setup_class_data_sharing(self, logger: Logger) -> None:
+        assert self.run_cmd is not None and self.cds_classes is not None
+        archive = get_archive(self.run_cmd, self.cds_classes, self.training_input)
+        if archive is None:
+            logger.infob(f"Class data sharing doesn't speed up {self.name}.")
+            return
+        self.run_cmd = archive.run_cmd
+        logger.infob(
+            f"Startup of {self.name} with class data sharing takes "
+            f"{archive.startup_after * 1000:.0f}ms "
+            f"instead of {archive.startup_before * 1000:.0f}ms."
+        )
+
+    def get_forkserver(self, logger: Logger) -> Optional[ForkServer]:
+        """
+        Server to fork the runs from, if enabled and possible. Only for the
+        programs whose time is not graded.
+        """
+        if not Config.forkserver or self.fork_script is None:
+            return None
+        return FORK_SERVERS.get(Config.os_config.cmd_python, self.fork_script, logger)
+
+    def get_content_hash(self) -> Optional[str]:
+        """Hash of the command and the files it runs, None if we don't know them."""
+        if self._content_hash is None and self.run_cmd is not None:
+            files = [
+                p
+                for p in (self.source_path, self.executable_path)
+                if p is not None and p.is_file()
+            ]
+            if not files:
+                return None
+            try:
+                files_hash = hash_files(files)
+            except OSError:
+                return None
+            self._content_hash = hash_bytes(self.run_cmd.encode(), files_hash.encode())
+        return self._content_hash
+
+    def get_toolchain_identity(self) -> str:
+        """
+        The compiler and the interpreter the program runs with, which change the
+        results but not the files hashed by `get_content_hash`.
+        """
+        if self._toolchain_identity is None:
+            tools = [self.compile_recipe or ""]
+            for cmd in (self.compile_cmd, self.run_cmd):
+                program = cmd.split(maxsplit=1)[0] if cmd else ""
+                # paths are the files of the program, those are hashed already
+                if program and "/" not in program:
+                    tools.append(get_tool_identity(program))
+            self._toolchain_identity = "\n".join(tools)
+        return self._toolchain_identity
+
+    def get_copy_key(self) -> Optional[str]:
+        """
+        Same for the copies of a program under different names, which behave
+        the same, None if we can't tell.
+        """
+        if self.force_execute:
+            return None
+        path = self.source_path if self.source_path is not None else Path(self.name)
+        try:
+            content_hash = hash_file(path)
+        except OSError:
+            return None
+        parts = [type(self).__name__, self.lang.name, content_hash]
+        # executable scripts are run by their shebang
+        parts.append(str(os.access(path, os.X_OK)))
+        if self.lang is Langs.Lang.java:
+            parts.append(path.stem)  # the class is run by the name of the file
+        return hash_bytes(*(part.encode() for part in parts))
 
     def clear_files(self) -> None:
         for f in self.files_to_clear:
@@ -2,17 +2,23 @@
 # © 2022 fezjo
 import os
 import shlex
+import shutil
 import subprocess
 import tempfile
+import time
 from collections import defaultdict
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import timedelta
-from typing import Any, Iterable, Optional, Union
+from typing import Any, Callable, Iterable, Optional, Union
 
+from input_tool.common import cgroups, execution
+from input_tool.common.affinity import CPU_SLOTS, CpuSlot
 from input_tool.common.commands import Config, Langs, natural_sort_key, to_base_alnum
 from input_tool.common.messages import Color, Logger, Status, default_logger, table_row
 from input_tool.common.programs.checker import Checker, CheckerType
 from input_tool.common.programs.program import Program
+from input_tool.common.result_store import StoredResult
+from input_tool.common.runtime_history import RUNTIME_HISTORY
 from input_tool.common.task_history import TASK_HISTORY, TaskHistory
 from input_tool.common.types import Path, ShellCommand, TempFile
 
@@ -29,6 +35,18 @@ def create_temp_fifo() -> TempFile:
     return fifo
 
 
+# what runtimes print when an allocation fails because of the memory limit
+MEMORY_ERROR_MARKERS = (
+    b"MemoryError",
+    b"std::bad_alloc",
+    b"OutOfMemoryError",
+    b"out of memory",
+    b"memory allocation of",
+)
+# the limit counts virtual memory, so a failing program rarely reaches it in RSS
+MLE_PEAK_RATIO = 0.9
+
+
 def parse_interactive_verdict(
     result_file: TempFile,
     logger: Logger,
@@ -55,6 +73,7 @@ def parse_interactive_verdict(
         "TO": Status.tle,
         "EXC": Status.exc,
         "RE": Status.exc,
+        "MLE": Status.mle,
         "ERR": Status.err,
     }
     if verdict in mapping:
@@ -72,6 +91,24 @@ class Solution(Program):
         result: Status
         times: defaultdict[str, list[Optional[tuple[timedelta, ...]]]]
         failedbatches: set[str]
+        maxmemory: Optional[int] = None  # bytes
+        memory: defaultdict[str, list[Optional[int]]] = field(
+            default_factory=lambda: defaultdict(list)
+        )
+        cpus: defaultdict[str, list[Optional[int]]] = field(
+            default_factory=lambda: defaultdict(list)
+        )
+        # wall time of the checker, not included in the times above
+        checktimes: defaultdict[str, list[timedelta]] = field(
+            default_factory=lambda: defaultdict(list)
+        )
+        # how many results were reused from previous runs, see --incremental
+        reused: int = 0
+        # startup of an empty program of the language, see --net-times
+        startup: Optional[timedelta] = None
+        # the times above without the startup, if it is known
+        netmaxtime: Optional[timedelta] = None
+        netsumtime: Optional[timedelta] = None
 
     def __init__(self, name: str):
         super().__init__(name)
@@ -118,13 +155,27 @@ class Solution(Program):
         return (1, score, ranked_name)
 
     def compute_time_statistics(self) -> None:
+        startup = self.statistics.startup
         self.statistics.sumtime = timedelta()
+        if startup is not None:
+            self.statistics.netmaxtime = timedelta(milliseconds=-1)
+            self.statistics.netsumtime = timedelta()
         for batch, result in self.statistics.batchresults.items():
             if result != Status.ok:
                 continue
             times = [ts[0] for ts in self.statistics.times[batch] if ts]
             self.statistics.maxtime = max(self.statistics.maxtime, max(times))
             self.statistics.sumtime += sum(times, timedelta())
+            if startup is not None:
+                assert self.statistics.netmaxtime is not None
+                assert self.statistics.netsumtime is not None
+                net = [max(t - startup, timedelta()) for t in times]
+                self.statistics.netmaxtime = max(self.statistics.netmaxtime, max(net))
+                self.statistics.netsumtime += sum(net, timedelta())
+
+    def compute_memory_statistics(self) -> None:
+        peaks = [m for ms in self.statistics.memory.values() for m in ms if m]
+        self.statistics.maxmemory = max(peaks, default=None)
 
     def grade_results(self) -> tuple[int, int]:
         points, maxpoints = 0, 0
@@ -140,11 +191,17 @@ class Solution(Program):
         color = Color.score_color(points, maxpoints)
         return color, str(points)
 
-    def get_statistics(self) -> str:
-        def to_miliseconds(t: timedelta) -> int:
-            return round(t.total_seconds() * 1000)
+    def get_statistics(self, net: bool = False) -> str:
+        """Row of the summary table, with the net times if `net`"""
+
+        def to_miliseconds(t: Optional[timedelta]) -> Union[str, int]:
+            return "-" if t is None else round(t.total_seconds() * 1000)
+
+        def to_megabytes(m: Optional[int]) -> Union[str, int]:
+            return "-" if m is None else round(m / 1024 / 1024)
 
         self.compute_time_statistics()
+        self.compute_memory_statistics()
         color, points = self.get_statistics_color_and_points()
         batchresults = sorted(
             self.statistics.batchresults.items(), key=lambda x: natural_sort_key(x[0])
@@ -156,28 +213,45 @@ class Solution(Program):
                 letter = letter.lower()
             batch_letters.append(Color.colorize(letter, Color.status[status]))
         batch_col_len = max(7, len(batchresults))
-        widths = (Config.cmd_maxlen, 8, 9, 6, 6, batch_col_len)
+        widths = [Config.cmd_maxlen, 8, 9, 7, 6, 6, batch_col_len]
         values: list[Union[str, int, Status]] = [
             self.name,
             to_miliseconds(self.statistics.maxtime),
             to_miliseconds(self.statistics.sumtime),
+            to_megabytes(self.statistics.maxmemory),
             points,
             self.statistics.result,
             "".join(batch_letters),
         ]
-        return table_row(color, values, widths, "<>>>><")
+        alignment = "<>>>>><"
+        if net:
+            widths[3:3] = (8, 9)
+            values[3:3] = (
+                to_miliseconds(self.statistics.netmaxtime),
+                to_miliseconds(self.statistics.netsumtime),
+            )
+            alignment = "<>>>>>>><"
+        return table_row(color, values, widths, alignment)
 
     def get_json(self) -> dict[str, Any]:
         self.compute_time_statistics()
+        self.compute_memory_statistics()
         _color, points = self.get_statistics_color_and_points()
         return {
             "name": self.name,
             "maxtime": self.statistics.maxtime,
             "sumtime": self.statistics.sumtime,
+            "startup": self.statistics.startup,
+            "netmaxtime": self.statistics.netmaxtime,
+            "netsumtime": self.statistics.netsumtime,
+            "maxmemory": self.statistics.maxmemory,
             "points": points,
             "result": self.statistics.result,
             "batchresults": self.statistics.batchresults,
             "times": self.statistics.times,
+            "memory": self.statistics.memory,
+            "cpus": self.statistics.cpus,
+            "checktimes": self.statistics.checktimes,
             "failedbatches": self.statistics.failedbatches,
         }
 
@@ -191,13 +265,20 @@ class Solution(Program):
         ifile: Path,
         status: Status,
         times: Optional[Iterable[timedelta]],
+        peak_memory: Optional[int] = None,
+        cpu: Optional[int] = None,
     ) -> None:
         batch = self.parse_batch(ifile)
         batchresults = self.statistics.batchresults
         batchresults[batch] = self.updated_status(
             batchresults.get(batch, Status.ok), status
         )
-        self.statistics.times[batch].append(None if times is None else tuple(times))
+        run_times = None if times is None else tuple(times)
+        self.statistics.times[batch].append(run_times)
+        if run_times:
+            RUNTIME_HISTORY.record(self.name, ifile, run_times[0].total_seconds())
+        self.statistics.memory[batch].append(peak_memory)
+        self.statistics.cpus[batch].append(cpu)
 
         old_status = self.statistics.result
         new_status = self.updated_status(old_status, status)
@@ -227,8 +308,8 @@ class Solution(Program):
             f"{osc.cmd_ulimit} -v {memorylimit_kb}",
         )
         time_prefix = (
-            f'{osc.cmd_time} -f "%e %U %S" -a -o {timefile} -q'
-            if Config.rus_time
+            f'{osc.cmd_time} -f "%e %U %S %M" -a -o {timefile} -q'
+            if Config.rus_time and shutil.which(osc.cmd_time)
             else ""
         )
         date_cmd = f"{osc.cmd_date} +%s%N >> {timefile}"
@@ -365,19 +446,37 @@ class Solution(Program):
             return Status.exc
         return Status.err
 
+    @staticmethod
+    def is_memory_exceeded(
+        stderr: bytes, peak_memory: Optional[int], oom_killed: bool
+    ) -> bool:
+        """Guess whether a crash was caused by the memory limit."""
+        if oom_killed:
+            return True
+        if not Config.memorylimit:
+            return False
+        limit = float(Config.memorylimit) * 1024 * 1024
+        if peak_memory is not None and peak_memory >= limit * MLE_PEAK_RATIO:
+            return True
+        return any(marker in stderr for marker in MEMORY_ERROR_MARKERS)
+
     def get_times(
         self, timefile: TempFile, logger: Logger = default_logger
-    ) -> Optional[list[timedelta]]:
+    ) -> tuple[Optional[list[timedelta]], Optional[int]]:
+        """Parse the timefile, return (times, peak memory in bytes)"""
         try:
             with open(timefile, "r") as tf:
-                ptime_start, *rus_times, ptime_end = map(float, tf.read().split())
+                ptime_start, *rus_values, ptime_end = map(float, tf.read().split())
+                peak_memory = None
+                if rus_values:  # elapsed user system maxrss[KB]
+                    peak_memory = int(rus_values.pop()) * 1024
                 run_times = [timedelta(seconds=(ptime_end - ptime_start) / 1e9)] + [
-                    timedelta(seconds=t) for t in rus_times
+                    timedelta(seconds=t) for t in rus_values
                 ]
-                return run_times
+                return run_times, peak_memory
         except (OSError, ValueError) as e:
             logger.warning(repr(e))
-        return None
+        return None, None
 
     def generate_execution_parameters(
         self, ifile: Path, tfile: TempFile, checker: Optional[Checker]
@@ -409,6 +508,62 @@ class Solution(Program):
             timefile, cmd = self.get_exec_cmd(ifile, tfile, timelimit, memorylimit)
             return None, (), None, timefile, cmd
 
+    def get_native_argv(
+        self, ifile: Path, checker: Optional[Checker]
+    ) -> Optional[list[str]]:
+        """Return argv if the run can bypass the shell wrapper, None otherwise."""
+        if Config.backend not in ("native", "cgroup"):
+            return None
+        if checker is not None and checker.type.is_interactive():
+            return None
+        return execution.split_command(f"{self.run_cmd} {self.run_args(ifile)}")
+
+    def execute_native(
+        self,
+        argv: list[str],
+        ifile: Path,
+        tfile: TempFile,
+        cb_set_kill: Callable[[Callable[[], None]], None],
+        isolate: Optional[Callable[[], None]] = None,
+    ) -> execution.ExecutionResult:
+        memorylimit = float(Config.memorylimit)
+        manager = cgroups.get_manager() if Config.backend == "cgroup" else None
+        cgroup = manager.create(memorylimit) if manager is not None else None
+        try:
+            result = execution.run_native(
+                argv,
+                ifile,
+                tfile,
+                self.get_timelimit(Config.timelimits),
+                memorylimit,
+                True,  # needed for MLE detection even when not shown
+                cb_set_kill,
+                cgroup,
+                isolate,
+            )
+        finally:
+            if cgroup is not None:
+                cgroup.remove()
+        return result
+
+    def execute_shell(
+        self,
+        cmd: ShellCommand,
+        cb_set_kill: Callable[[Callable[[], None]], None],
+        isolate: Optional[Callable[[], None]] = None,
+    ) -> tuple[int, bytes]:
+        with subprocess.Popen(
+            cmd,
+            shell=True,
+            stdout=subprocess.PIPE,  # stdout goes to file anyway
+            stderr=subprocess.PIPE,
+            preexec_fn=isolate,  # noqa: PLW1509
+        ) as process:
+            cb_set_kill(process.kill)
+            process.wait()
+            stderr = process.stderr.read() if process.stderr else b""
+        return process.returncode, stderr
+
     def _run(
         self,
         ifile: Path,
@@ -418,51 +573,63 @@ class Solution(Program):
         is_output_generator: bool,
         logger: Logger,
         callbacks: TaskHistory.callbacks_t,
-    ) -> tuple[Optional[list[timedelta]], Status]:
-        if not self.ready:
+        slot: Optional[CpuSlot] = None,
+        check: bool = True,
+    ) -> tuple[Optional[list[timedelta]], Optional[int], Status]:
+        if not self.ready.is_set():
             logger.fatal(f"{self.name} not prepared for execution")
-        cb_set_process, cb_was_killed, cb_kill_siblings = callbacks
-
-        checker_type, fifo_paths, result_file, timefile, cmd = (
-            self.generate_execution_parameters(ifile, tfile, checker)
-        )
+        cb_set_kill, cb_was_killed, cb_kill_siblings = callbacks
+        isolate = None if slot is None else CPU_SLOTS.make_isolate(slot.cpu)
+
+        argv = self.get_native_argv(ifile, checker)
+        checker_type: Optional[CheckerType] = None
+        fifo_paths: Iterable[TempFile] = ()
+        result_file: Optional[TempFile] = None
+        timefile: Optional[TempFile] = None
+        if argv is None:
+            checker_type, fifo_paths, result_file, timefile, cmd = (
+                self.generate_execution_parameters(ifile, tfile, checker)
+            )
 
         run_times: Optional[list[timedelta]] = None
+        peak_memory: Optional[int] = None
+        oom_killed = False
         try:
             if cb_was_killed():
-                return None, Status.tle
-            with subprocess.Popen(
-                cmd,
-                shell=True,
-                stdout=subprocess.PIPE,  # stdout goes to file anyway
-                stderr=subprocess.PIPE,
-            ) as process:
-                cb_set_process(process)
-                process.wait()
-                if cb_was_killed():
-                    return None, Status.tle
-                TASK_HISTORY.end(self.name, self.parse_batch(ifile), str(ifile))
-                if not self.quiet and process.stderr:
-                    logger.infod(process.stderr.read().decode("utf-8"))
-                status = self.translate_exit_code_to_status(process.returncode)
-                status = self.apply_additional_interactive_status_policy(
-                    status, checker_type, result_file, logger
-                )
+                return None, None, Status.tle
+            if argv is not None:
+                result = self.execute_native(argv, ifile, tfile, cb_set_kill, isolate)
+                returncode, stderr = result.returncode, result.stderr
+                run_times = result.get_times(Config.rus_time)
+                peak_memory, oom_killed = result.peak_memory, result.oom_killed
+            else:
+                returncode, stderr = self.execute_shell(cmd, cb_set_kill, isolate)
+            if slot is not None:
+                slot.release()  # the check doesn't need the core
+            if cb_was_killed():
+                return None, None, Status.tle
+            TASK_HISTORY.end(self.name, self.parse_batch(ifile), str(ifile))
+            if not self.quiet and stderr:
+                logger.infod(stderr.decode("utf-8", errors="replace"))
+            if timefile is not None:
+                run_times, peak_memory = self.get_times(timefile, logger)
+            status = self.translate_exit_code_to_status(returncode)
+            if status == Status.exc and self.is_memory_exceeded(
+                stderr, peak_memory, oom_killed
+            ):
+                status = Status.mle
+            status = self.apply_additional_interactive_status_policy(
+                status, checker_type, result_file, logger
+            )
             if status == Status.tle:
                 cb_kill_siblings()
 
-            run_times = self.get_times(timefile, logger)
             if not run_times and status == Status.ok:
                 status = Status.exc
-            if (
-                checker is not None
-                and not checker.type.is_interactive()
-                and status == Status.ok
-            ):
-                if not is_output_generator:
+            if check:
+                if checker is not None and not is_output_generator:
                     checker.output_ready[ifile].wait()
-                if checker.check(ifile, ofile, tfile, logger):
-                    status = Status.wa
+                status = self.check_output(ifile, ofile, tfile, checker, status, logger)
         except Exception as e:
             status = Status.err
             logger.warning(repr(e))
@@ -470,12 +637,35 @@ class Solution(Program):
             for fifo_path in fifo_paths:
                 if fifo_path.exists():
                     fifo_path.unlink()
-            if timefile.exists():
+            if timefile is not None and timefile.exists():
                 timefile.unlink()
             if result_file is not None and result_file.exists():
                 result_file.unlink()
 
-        return run_times, status
+        return run_times, peak_memory, status
+
+    def check_output(
+        self,
+        ifile: Path,
+        ofile: Path,
+        tfile: TempFile,
+        checker: Optional[Checker],
+        status: Status,
+        logger: Logger,
+    ) -> Status:
+        """Compare the output of a successful run with the reference output."""
+        if checker is None or checker.type.is_interactive() or status != Status.ok:
+            return status
+        start = time.monotonic()
+        try:
+            if checker.check(ifile, ofile, tfile, logger):
+                status = Status.wa
+        except Exception as e:
+            logger.warning(repr(e))
+            status = Status.err
+        elapsed = timedelta(seconds=time.monotonic() - start)
+        self.statistics.checktimes[self.parse_batch(ifile)].append(elapsed)
+        return status
 
     def output_testcase_summary(
         self,
@@ -483,13 +673,17 @@ class Solution(Program):
         status: Status,
         run_times: Optional[Iterable[timedelta]],
         logger: Logger,
+        reused: bool = False,
     ) -> None:
         run_cmd = ("{:<" + str(Config.cmd_maxlen) + "s}").format(self.name)
-        time_format = ["{:6d}ms", "{:6d}ms [{:6.2f}={:6.2f}+{:6.2f}]"][Config.rus_time]
+        time_formats = ["{:6d}ms", "{:6d}ms [{:6.2f}={:6.2f}+{:6.2f}]"]
         if run_times is None:
+            time_format = time_formats[Config.rus_time]
             time = " NO DATA".ljust(len(time_format.format(0, 0, 0, 0)))
         else:
             seconds = [round(t.total_seconds(), 3) for t in run_times]
+            # shell fallback without `time` measures only the wall time
+            time_format = time_formats[len(seconds) > 1]
             time = time_format.format(int(seconds[0] * 1000), *seconds[1:])
 
         if Config.inside_oneline:
@@ -499,21 +693,37 @@ class Solution(Program):
             summary = "    {}  {}".format(run_cmd, time)
 
         logger.plain(
-            "{} {}\n".format(Color.status_colorize(status, summary), status.colored())
+            "{} {}{}\n".format(
+                Color.status_colorize(status, summary),
+                status.colored(),
+                " (reused)" if reused else "",
+            )
         )
 
         if status == Status.err:
             logger.fatal("Internal error. Testing will not continue")
 
-    def run(
+    @dataclass
+    class Execution:
+        run_times: Optional[list[timedelta]]
+        peak_memory: Optional[int]
+        status: Status
+        cpu: Optional[int]
+
+    def execute(
         self,
         ifile: Path,
         ofile: Path,
         tfile: TempFile,
-        checker: Checker,
+        checker: Optional[Checker],
         is_output_generator: bool = False,
         logger: Optional[Logger] = None,
-    ) -> Optional[Status]:
+        check: bool = True,
+    ) -> Optional[Execution]:
+        """
+        Run the solution on the input, None if skipped. Without `check` the
+        output is not checked, call `check_output` and `finish` later.
+        """
         batch = self.parse_batch(ifile)
         task = str(ifile)
         TASK_HISTORY.start(self.name, batch, task)
@@ -523,12 +733,38 @@ class Solution(Program):
 
         callbacks = TASK_HISTORY.get_callbacks(self.name, batch, task)
         logger = default_logger if logger is None else logger
-        run_times, status = self._run(
-            ifile, ofile, tfile, checker, is_output_generator, logger, callbacks
-        )
-
+        with CPU_SLOTS.acquire() as slot:
+            run_times, peak_memory, status = self._run(
+                ifile,
+                ofile,
+                tfile,
+                checker,
+                is_output_generator,
+                logger,
+                callbacks,
+                slot,
+                check,
+            )
+        cpu = None if slot is None else slot.cpu
         if status is not Status.ok:
+            # known before the check, so that fail-skip can skip the next ones
             self.statistics.failedbatches.add(batch)
+        return Solution.Execution(run_times, peak_memory, status, cpu)
+
+    def finish(
+        self,
+        ifile: Path,
+        result: Execution,
+        logger: Optional[Logger] = None,
+        reused: bool = False,
+    ) -> Status:
+        """Record the result of a checked execution and print the summary."""
+        logger = default_logger if logger is None else logger
+        if reused:
+            self.statistics.reused += 1
+        status, run_times = result.status, result.run_times
+        if status is not Status.ok:
+            self.statistics.failedbatches.add(self.parse_batch(ifile))
 
         warntle = self.get_timelimit(Config.warn_timelimits)
         status = status.set_warntle(
@@ -537,6 +773,34 @@ class Solution(Program):
             and run_times[0] >= warntle
         )
 
-        self.record(ifile, status, run_times)
-        self.output_testcase_summary(ifile, status, run_times, logger)
+        self.record(ifile, status, run_times, result.peak_memory, result.cpu)
+        self.output_testcase_summary(ifile, status, run_times, logger, reused)
         return status
+
+    def reuse(
+        self, ifile: Path, stored: StoredResult, logger: Optional[Logger] = None
+    ) -> Optional[Status]:
+        """Record a result from a previous run instead of running, None if skipped."""
+        if (
+            Config.fail_skip
+            and self.parse_batch(ifile) in self.statistics.failedbatches
+        ):
+            return None
+        result = Solution.Execution(
+            stored.run_times, stored.peak_memory, stored.status, None
+        )
+        return self.finish(ifile, result, logger, reused=True)
+
+    def run(
+        self,
+        ifile: Path,
+        ofile: Path,
+        tfile: TempFile,
+        checker: Checker,
+        is_output_generator: bool = False,
+        logger: Optional[Logger] = None,
+    ) -> Optional[Status]:
+        result = self.execute(ifile, ofile, tfile, checker, is_output_generator, logger)
+        if result is None:
+            return None
+        return self.finish(ifile, result, logger)
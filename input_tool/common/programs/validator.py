@@ -1,8 +1,14 @@
 # © 2014 jano <janoh@ksp.sk>
 # © 2022 fezjo
+import subprocess
+import tempfile
+import time
+from datetime import timedelta
 from typing import Optional
 
-from input_tool.common.commands import to_base_alnum
+from input_tool.common import execution
+from input_tool.common.commands import Config, to_base_alnum
+from input_tool.common.forkserver import ForkServer
 from input_tool.common.messages import Color, Logger, Status, default_logger
 from input_tool.common.programs.checker import Checker
 from input_tool.common.programs.solution import Solution
@@ -46,16 +52,60 @@ class Validator(Solution):
         logger: Optional[Logger] = None,
     ) -> Status:
         logger = default_logger if logger is None else logger
-        callbacks = (lambda _: None, lambda: False, lambda: None)
-        run_times, status = self._run(
-            ifile, ofile, tfile, None, is_output_generator, logger, callbacks
-        )
+        result: Optional[tuple[Optional[list[timedelta]], Optional[int], Status]]
+        result = None
+        forkserver = self.get_forkserver(logger)
+        if forkserver is not None:
+            try:
+                result = self.run_forked(forkserver, ifile, tfile, logger)
+            except OSError as e:
+                logger.warning(
+                    f"Fork server of {self.name} failed, running it anew: {e}"
+                )
+        if result is None:
+            callbacks = (lambda _: None, lambda: False, lambda: None)
+            result = self._run(
+                ifile, ofile, tfile, None, is_output_generator, logger, callbacks
+            )
+        run_times, peak_memory, status = result
 
         if status is not Status.ok:
             self.statistics.failedbatches.add(self.parse_batch(ifile))
         if status in (Status.ok, Status.wa):
             status = Status.valid
 
-        self.record(ifile, status, run_times)
+        self.record(ifile, status, run_times, peak_memory)
         self.output_testcase_summary(ifile, status, run_times, logger)
         return status
+
+    def run_forked(
+        self, forkserver: ForkServer, ifile: Path, tfile: TempFile, logger: Logger
+    ) -> tuple[Optional[list[timedelta]], Optional[int], Status]:
+        """Like `_run`, without the peak memory"""
+        assert self.fork_script is not None
+        argv = [str(self.fork_script), *self.run_args(ifile).split()]
+        timelimit = self.get_timelimit(Config.timelimits).total_seconds()
+        rlimits = execution.get_memory_rlimits(float(Config.memorylimit))
+        with open(ifile, "rb") as stdin, open(tfile, "wb") as stdout:
+            with tempfile.TemporaryFile() as stderr_file:
+                start = time.monotonic()
+                try:
+                    returncode = forkserver.run(
+                        argv,
+                        stdin.fileno(),
+                        stdout.fileno(),
+                        stderr_file.fileno(),
+                        rlimits,
+                        timelimit or None,
+                    )
+                except subprocess.TimeoutExpired:
+                    returncode = execution.EXIT_TIMEOUT
+                run_times = [timedelta(seconds=time.monotonic() - start)]
+                stderr_file.seek(0)
+                stderr = stderr_file.read()
+        if not self.quiet and stderr:
+            logger.infod(stderr.decode("utf-8", errors="replace"))
+        status = self.translate_exit_code_to_status(returncode)
+        if status == Status.exc and self.is_memory_exceeded(stderr, None, False):
+            status = Status.mle
+        return run_times, None, status
@@ -0,0 +1,121 @@
+# © 2026 fezjo
+"""
+Python programs precompiled to bytecode, shared by all tasks of the user.
+
+CPython caches the bytecode of the modules it imports, but never of the script
+it runs, so `python3 sol.py` compiles the whole solution again on every test.
+We compile it once, by the interpreter that runs it, and run it by a tiny
+launcher that loads the bytecode and runs it as `__main__`, with the same
+`sys.argv[0]`, `sys.path[0]` and `__file__` as the script would have.
+"""
+
+import os
+import shlex
+import shutil
+import subprocess
+import tempfile
+from typing import Optional
+
+from input_tool.common.compile_cache import get_cache_dir, get_tool_identity
+from input_tool.common.hashing import hash_bytes, hash_file
+from input_tool.common.messages import Logger
+from input_tool.common.types import Path
+
+LAUNCHER_FILENAME = "launcher.py"
+BYTECODE_FILENAME = "main.pyc"
+SAVING_FILENAME = "saving"
+
+# prints how long compiling took, which every run from the bytecode saves
+COMPILER = """
+import py_compile, sys, time
+start = time.perf_counter()
+py_compile.compile(sys.argv[1], sys.argv[2], sys.argv[3], doraise=True)
+print(time.perf_counter() - start)
+"""
+
+LAUNCHER = """import marshal, sys, types
+sys.argv[0] = {argv0!r}
+sys.path[0] = {directory!r}
+with open({bytecode!r}, "rb") as f:
+    f.read(16)  # header of the .pyc
+    code = marshal.load(f)
+module = types.ModuleType("__main__")
+module.__file__ = {source!r}
+module.__builtins__ = __builtins__
+sys.modules["__main__"] = module
+del f, marshal, sys, types
+exec(code, module.__dict__)
+"""
+
+
+class BytecodeCache:
+    """Safe to use from multiple threads and processes"""
+
+    def get_launcher(
+        self, interpreter: str, source: Path, logger: Logger
+    ) -> Optional[tuple[Path, float]]:
+        """
+        The launcher of the source and how many seconds it saves per run,
+        compiled the first time. None if the source can't be compiled.
+        """
+        absolute = source.absolute()
+        try:
+            key = hash_bytes(
+                get_tool_identity(interpreter).encode(),
+                hash_file(source).encode(),
+                str(absolute).encode(),
+            )
+        except OSError:
+            return None
+        entry = get_cache_dir("python") / key
+        if not (entry / LAUNCHER_FILENAME).is_file():
+            self.build(interpreter, source, entry, logger)
+        try:
+            saving = float((entry / SAVING_FILENAME).read_text())
+        except (OSError, ValueError):
+            return None
+        return entry / LAUNCHER_FILENAME, saving
+
+    @staticmethod
+    def build(interpreter: str, source: Path, entry: Path, logger: Logger) -> None:
+        absolute = source.absolute()
+        try:
+            entry.parent.mkdir(parents=True, exist_ok=True)
+            tmpdir = Path(tempfile.mkdtemp(dir=entry.parent, prefix=".tmp-"))
+            bytecode = entry / BYTECODE_FILENAME
+            process = subprocess.run(
+                [
+                    *shlex.split(interpreter),
+                    "-c",
+                    COMPILER,
+                    str(source),
+                    str(tmpdir / BYTECODE_FILENAME),
+                    str(absolute),
+                ],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+            )
+            if process.returncode:
+                # a syntax error shows up when the program runs, as usual
+                shutil.rmtree(tmpdir, ignore_errors=True)
+                return
+            (tmpdir / SAVING_FILENAME).write_text(process.stdout.decode().strip())
+            (tmpdir / LAUNCHER_FILENAME).write_text(
+                LAUNCHER.format(
+                    argv0=str(source),
+                    directory=str(absolute.parent),
+                    bytecode=str(bytecode),
+                    source=str(absolute),
+                )
+            )
+        except (OSError, ValueError) as e:
+            logger.warning(f"Failed to precompile {source}: {e!r}")
+            return
+        try:
+            os.rename(tmpdir, entry)
+        except OSError:
+            # somebody else has built it meanwhile
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+BYTECODE_CACHE = BytecodeCache()
@@ -0,0 +1,138 @@
+# © 2026 fezjo
+"""
+Results of solutions from previous runs, for `itool test --incremental`.
+
+A result is reused when nothing it depends on has changed: the program, the
+input, the reference output, the limits, the checker and how they are run (the
+backend, CPU pinning, the compilers and interpreters). Only the pairs where
+something changed are executed again.
+"""
+
+from __future__ import annotations
+
+import json
+import threading
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Any, Optional
+
+from input_tool.common.commands import Config
+from input_tool.common.hashing import hash_bytes, hash_file
+from input_tool.common.messages import Status, warning
+from input_tool.common.types import Path
+
+RESULTS_FILENAME = ".result_cache.json"
+MAX_ENTRIES = 100_000
+
+
+@dataclass
+class StoredResult:
+    status: Status
+    run_times: list[timedelta]
+    peak_memory: Optional[int]
+
+    def to_json(self) -> dict[str, Any]:
+        return {
+            "status": self.status.name,
+            "times": [t.total_seconds() for t in self.run_times],
+            "memory": self.peak_memory,
+        }
+
+    @staticmethod
+    def from_json(data: dict[str, Any]) -> StoredResult:
+        return StoredResult(
+            Status[data["status"]],
+            [timedelta(seconds=float(t)) for t in data["times"]],
+            None if data["memory"] is None else int(data["memory"]),
+        )
+
+
+class ResultStore:
+    """Thread safe"""
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.enabled = False
+        # results are stored but not reused with --fresh
+        self.reuse = True
+        # dict {key: result}, ordered from the least recently used
+        self.results: dict[str, StoredResult] = {}
+
+    def load(self, path: Path) -> None:
+        if not self.enabled or not path.exists():
+            return
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+            results = {k: StoredResult.from_json(v) for k, v in data["results"].items()}
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+            warning(f"Failed to load results from {path}: {e!r}")
+            return
+        with self.lock:
+            self.results = results
+
+    def save(self, path: Path) -> None:
+        if not self.enabled:
+            return
+        with self.lock:
+            items = list(self.results.items())[-MAX_ENTRIES:]
+            data = {"results": {k: v.to_json() for k, v in items}}
+            try:
+                with open(path, "w") as f:
+                    json.dump(data, f)
+            except OSError as e:
+                warning(f"Failed to save results to {path}: {e!r}")
+
+    def make_key(
+        self,
+        program_hash: Optional[str],
+        checker_hash: Optional[str],
+        ifile: Path,
+        ofile: Path,
+        timelimit: timedelta,
+        toolchain: str,
+    ) -> Optional[str]:
+        """None if the store is disabled or some part of the key is not known"""
+        if not self.enabled or program_hash is None or checker_hash is None:
+            return None
+        try:
+            files = [hash_file(ifile), hash_file(ofile)]
+        except OSError:
+            return None
+        limits = (timelimit.total_seconds(), Config.memorylimit, Config.rus_time)
+        # the times and e.g. the MLE detection differ between them
+        setup = (Config.backend, Config.pin_cpus)
+        return hash_bytes(
+            program_hash.encode(),
+            checker_hash.encode(),
+            *(f.encode() for f in files),
+            repr(limits).encode(),
+            repr(setup).encode(),
+            toolchain.encode(),
+        )
+
+    def get(self, key: Optional[str]) -> Optional[StoredResult]:
+        if key is None or not self.reuse:
+            return None
+        with self.lock:
+            result = self.results.pop(key, None)
+            if result is not None:
+                self.results[key] = result
+        return result
+
+    def put(
+        self,
+        key: Optional[str],
+        status: Status,
+        run_times: Optional[list[timedelta]],
+        peak_memory: Optional[int],
+    ) -> None:
+        # runs that were not measured, e.g. killed with a timed out sibling
+        if key is None or not run_times or status == Status.err:
+            return
+        with self.lock:
+            self.results.pop(key, None)
+            self.results[key] = StoredResult(status, run_times, peak_memory)
+
+
+RESULT_STORE = ResultStore()
@@ -0,0 +1,103 @@
+# © 2026 fezjo
+"""
+Running times of the programs on the inputs from previous runs.
+
+The tester uses them to start the tasks that are expected to take the longest
+first, so that the run doesn't end with a single slow test keeping one core
+busy. For inputs without history we guess from the input size. The times are
+specific to the machine, so they are kept in the user cache directory, not next
+to the inputs.
+"""
+
+import json
+import threading
+from typing import Optional
+
+from input_tool.common.messages import warning
+from input_tool.common.types import Path
+
+HISTORY_CACHE = "history"  # see `get_cache_file`
+
+
+class RuntimeHistory:
+    """
+    Keep the last running time of every program on every input.
+    Thread safe
+    """
+
+    # dict {program: {input name: (seconds, input size in bytes), ...}, ...}
+    times_t = dict[str, dict[str, tuple[float, int]]]
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.times: RuntimeHistory.times_t = {}
+        self._sizes: dict[Path, int] = {}
+        self._rates: dict[Optional[str], float] = {}
+
+    def load(self, path: Path) -> None:
+        if not path.exists():
+            return
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+            times = {
+                program: {name: (float(s), int(b)) for name, (s, b) in runs.items()}
+                for program, runs in data["times"].items()
+            }
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+            warning(f"Failed to load running times from {path}: {e!r}")
+            return
+        with self.lock:
+            self.times = times
+            self._rates.clear()
+
+    def save(self, path: Path) -> None:
+        with self.lock:
+            data = {"times": self.times}
+            try:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                with open(path, "w") as f:
+                    json.dump(data, f)
+            except OSError as e:
+                warning(f"Failed to save running times to {path}: {e!r}")
+
+    def get_size(self, ifile: Path) -> int:
+        if ifile not in self._sizes:
+            try:
+                self._sizes[ifile] = ifile.stat().st_size
+            except OSError:
+                self._sizes[ifile] = 0
+        return self._sizes[ifile]
+
+    def record(self, program: str, ifile: Path, seconds: float) -> None:
+        size = self.get_size(ifile)
+        with self.lock:
+            self.times.setdefault(program, {})[ifile.name] = (seconds, size)
+            self._rates.clear()
+
+    def get_rate(self, program: Optional[str]) -> float:
+        """Seconds per byte of input of the program, or of all programs if None"""
+        if program not in self._rates:
+            programs = self.times.values() if program is None else [self.times[program]]
+            runs = [run for runs in programs for run in runs.values()]
+            seconds = sum(s for s, _ in runs)
+            size = sum(b for _, b in runs)
+            if seconds and size:
+                self._rates[program] = seconds / size
+            elif program is not None:
+                self._rates[program] = self.get_rate(None)
+            else:
+                self._rates[program] = 1.0  # no history, sizes decide alone
+        return self._rates[program]
+
+    def predict(self, program: str, ifile: Path) -> float:
+        """Expected running time, in seconds if there is any history"""
+        with self.lock:
+            runs = self.times.get(program, {})
+            if ifile.name in runs:
+                return runs[ifile.name][0]
+            rate = self.get_rate(program if runs else None)
+        return rate * self.get_size(ifile)
+
+
+RUNTIME_HISTORY = RuntimeHistory()
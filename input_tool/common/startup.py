@@ -0,0 +1,104 @@
+# © 2026 fezjo
+"""
+Startup overhead of the languages, measured on empty programs.
+
+On tiny tests the measured time is mostly the startup of the interpreter, the
+JVM or the dynamic loader. An empty program of the same language is prepared
+and run the same way as the solutions, a few times, and the median is taken
+as the baseline, so the tester can show the net times next to the measured
+ones. The empty programs live in the cache, so their builds are reused.
+"""
+
+import io
+from datetime import timedelta
+from typing import Optional
+
+from input_tool.common.commands import Langs
+from input_tool.common.compile_cache import get_cache_dir
+from input_tool.common.messages import Logger, Status
+from input_tool.common.programs.solution import Solution
+from input_tool.common.types import Path, TempFile
+
+RUNS = 5
+# also the name of the Java class, so it has to be a valid identifier
+STEM = "startup_probe"
+EMPTY_PROGRAMS: dict[Langs.Lang, str] = {
+    Langs.Lang.c: "int main(void) { return 0; }\n",
+    Langs.Lang.cpp: "int main() {}\n",
+    Langs.Lang.haskell: "main :: IO ()\nmain = return ()\n",
+    Langs.Lang.java: f"public class {STEM} {{\n"
+    "    public static void main(String[] args) {}\n"
+    "}\n",
+    Langs.Lang.pascal: "begin\nend.\n",
+    Langs.Lang.rust: "fn main() {}\n",
+    Langs.Lang.python: "",
+    Langs.Lang.javascript: "",
+}
+
+
+def write_empty_program(lang: Langs.Lang, extension: str) -> Path:
+    directory = get_cache_dir("startup") / lang.name
+    directory.mkdir(parents=True, exist_ok=True)
+    source = directory / f"{STEM}.{extension}"
+    content = EMPTY_PROGRAMS[lang]
+    # the same content keeps the timestamp, so nothing is compiled again
+    if not source.is_file() or source.read_text() != content:
+        tmp = directory / f".{STEM}.{extension}.tmp"
+        tmp.write_text(content)
+        tmp.replace(source)
+    return source
+
+
+def measure_startup(
+    lang: Langs.Lang, extension: str, logger: Logger
+) -> Optional[timedelta]:
+    """Median wall time of an empty program, None if it can't be measured."""
+    if lang not in EMPTY_PROGRAMS:
+        return None
+    try:
+        source = write_empty_program(lang, extension)
+    except OSError as e:
+        logger.warning(f"Failed to measure the startup of {lang.name}: {e!r}")
+        return None
+    probe = Solution(str(source))
+    # it compiles if the solutions did, its messages are not interesting
+    probe.prepare(Logger(io.StringIO()))
+    ifile = source.with_suffix(".in")
+    ofile = TempFile(str(source.with_suffix(".out")))
+    times: list[timedelta] = []
+    try:
+        ifile.touch()
+        for _ in range(RUNS):
+            result = probe.execute(ifile, ofile, ofile, None, check=False)
+            if result is None or result.status is not Status.ok:
+                return None
+            assert result.run_times is not None
+            times.append(result.run_times[0])
+    finally:
+        ofile.unlink(missing_ok=True)
+        probe.clear_files()
+    return sorted(times)[len(times) // 2]
+
+
+class StartupOverheads:
+    """Measured once per language in a run of the tester"""
+
+    def __init__(self) -> None:
+        self.overheads: dict[Langs.Lang, Optional[timedelta]] = {}
+
+    def get(
+        self, lang: Langs.Lang, extension: Optional[str], logger: Logger
+    ) -> Optional[timedelta]:
+        if lang not in self.overheads and extension is not None:
+            overhead = measure_startup(lang, extension, logger)
+            self.overheads[lang] = overhead
+            if overhead is not None:
+                logger.infob(
+                    f"Startup of an empty {lang.name} program takes "
+                    f"{overhead.total_seconds() * 1000:.1f}ms "
+                    f"(median of {RUNS} runs)."
+                )
+        return self.overheads.get(lang)
+
+
+STARTUP_OVERHEADS = StartupOverheads()
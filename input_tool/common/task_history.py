@@ -2,7 +2,6 @@
 import threading
 import time
 from dataclasses import dataclass
-from subprocess import Popen
 from typing import Callable, Optional
 
 
@@ -16,27 +15,32 @@ class TaskHistory:
     class task_details_t:
         start_time: float
         end_time: Optional[float] = None
-        process: Optional[Popen] = None
+        # kills the program with everything it started, set once it runs
+        kill: Optional[Callable[[], None]] = None
         skipped: bool = False
         killed: bool = False
 
     # dict {program: {(batch, task): (start_time, end_time), ...}, ...}
     task_dict_t = dict[str, dict[tuple[str, str], task_details_t]]
-    callbacks_t = tuple[Callable[[Popen], None], Callable[[], bool], Callable[[], None]]
+    callbacks_t = tuple[
+        Callable[[Callable[[], None]], None], Callable[[], bool], Callable[[], None]
+    ]
 
     def __init__(self) -> None:
         self.lock = threading.Lock()
         self.tasks: TaskHistory.task_dict_t = {}
+        # index of unfinished tasks, {(program, batch): {task: details, ...}, ...}
+        self.running: dict[tuple[str, str], dict[str, TaskHistory.task_details_t]] = {}
 
     def start(
         self, program: str, batch: str, task: str, start_time: Optional[float] = None
     ) -> None:
         """call when as soon as the task execution starts so that it may be killed"""
         start_time = time.time() if start_time is None else start_time
+        detail = TaskHistory.task_details_t(start_time)
         with self.lock:
-            if program not in self.tasks:
-                self.tasks[program] = {}
-            self.tasks[program][(batch, task)] = TaskHistory.task_details_t(start_time)
+            self.tasks.setdefault(program, {})[(batch, task)] = detail
+            self.running.setdefault((program, batch), {})[task] = detail
 
     def end(
         self,
@@ -49,11 +53,23 @@ class TaskHistory:
         """call as soon as soon the task execution ends, so that it won't be killed"""
         end_time = time.time() if end_time is None else end_time
         key = (batch, task)
-        if program not in self.tasks or key not in self.tasks[program]:
-            return
         with self.lock:
-            self.tasks[program][key].end_time = end_time
-            self.tasks[program][key].skipped = skipped
+            if program not in self.tasks or key not in self.tasks[program]:
+                return
+            detail = self.tasks[program][key]
+            detail.end_time = end_time
+            detail.skipped = skipped
+            # finished tasks can't be killed anymore
+            detail.kill = None
+            running = self.running.get((program, batch), {})
+            if running.get(task) is detail:
+                del running[task]
+                if not running:
+                    del self.running[(program, batch)]
+
+    def is_running(self, program: str, batch: str) -> bool:
+        """O(1) check whether any task of the program's batch is unfinished"""
+        return (program, batch) in self.running
 
     def get(self, program: str, batch: str, task: str) -> Optional[task_details_t]:
         key = (batch, task)
@@ -92,7 +108,7 @@ class TaskHistory:
             raise ValueError(f"Task {program} {batch} {task} not found")
         detail = self.tasks[program][key]
         return (
-            lambda process: setattr(detail, "process", process),
+            lambda kill: setattr(detail, "kill", kill),
             lambda: detail.killed,
             lambda: self.kill_all(program, batch),
         )
@@ -103,13 +119,26 @@ class TaskHistory:
         batch: Optional[str] = None,
         task: Optional[str] = None,
     ) -> None:
-        for program, batch, task, detail in self.get_all(
-            program, batch, task, running=True
-        ):
-            if detail.process is not None:
+        with self.lock:
+            if program is not None and batch is not None:
+                groups = [self.running.get((program, batch), {})]
+            else:
+                groups = [
+                    tasks
+                    for (p, b), tasks in self.running.items()
+                    if program in (None, p) and batch in (None, b)
+                ]
+            details = [
+                detail
+                for tasks in groups
+                for t, detail in tasks.items()
+                if task is None or t == task
+            ]
+        for detail in details:
+            if detail.kill is not None:
                 # elapsed = time.time() - detail.start_time
                 # print("Killing", program, batch, task, round(elapsed, 4), "s")
-                detail.process.kill()
+                detail.kill()
                 detail.killed = True
 
 
@@ -1,11 +1,73 @@
 # © 2023 fezjo
+from __future__ import annotations
+
+import functools
+import heapq
 import threading
-from typing import Callable, Optional, Reversible
+from concurrent.futures import Executor, Future
+from typing import Any, Callable, Iterable, Optional
 
+from input_tool.common.affinity import CpuSlots
 from input_tool.common.commands import Config, Langs
 from input_tool.common.task_history import TaskHistory
 
 
+class Dependency:
+    """
+    Thread-safe one-shot event, like `threading.Event`. Tasks that depend on it
+    don't hold a worker while waiting, see `TaskItem.after` and `run_tasks`.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._event = threading.Event()
+        self._waiting: list[Callable[[], None]] = []
+
+    def is_set(self) -> bool:
+        return self._event.is_set()
+
+    def set(self) -> None:
+        with self._lock:
+            self._event.set()
+            waiting, self._waiting = self._waiting, []
+        for callback in waiting:
+            callback()
+
+    def clear(self) -> None:
+        self._event.clear()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._event.wait(timeout)
+
+    def then(self, callback: Callable[[], None]) -> None:
+        """Call `callback` once set, right away if it already is."""
+        with self._lock:
+            if not self._event.is_set():
+                self._waiting.append(callback)
+                return
+        callback()
+
+    @staticmethod
+    def all_of(*dependencies: Dependency) -> Dependency:
+        """Dependency that is set once all of `dependencies` are."""
+        combined = Dependency()
+        lock = threading.Lock()
+        remaining = [len(dependencies)]
+
+        def countdown() -> None:
+            with lock:
+                remaining[0] -= 1
+                done = remaining[0] == 0
+            if done:
+                combined.set()
+
+        if not dependencies:
+            combined.set()
+        for dependency in dependencies:
+            dependency.then(countdown)
+        return combined
+
+
 class TaskItem:
     def __init__(
         self,
@@ -14,54 +76,236 @@ class TaskItem:
         task: str,
         func: Callable,
         callbacks: Optional[list[Callable]] = None,
+        priority: float = 0,
+        urgent: bool = False,
+        after: Optional[Dependency] = None,
+        executor: Optional[Executor] = None,
+        timed: bool = False,
     ):
         self.program = program
         self.batch = batch
         self.task = task
         self.func = func
         self.callbacks: list[Callable] = callbacks if callbacks is not None else []
+        # tasks with higher priority are started first, e.g. the expected time
+        self.priority = priority
+        # urgent tasks are started before all the others, e.g. others wait for them
+        self.urgent = urgent
+        # the task is not started until this is set
+        self.after = after
+        # run in this executor instead, without taking one of the `num_threads`
+        self.executor = executor
+        # measures the time of a solution, so it needs a free core with pinning
+        self.timed = timed
 
     def __repr__(self) -> str:
         return (
             f"TaskItem({self.program!r}, {self.batch!r}, {self.task!r}, {self.func!r})"
         )
 
-    def should_skip(self, task_history: TaskHistory) -> bool:
-        lang = Langs.from_filename(self.program)
-        timelimit = Config.get_timelimit(Config.timelimits, None, lang)
-        if timelimit == 0:
-            return False
-        prev_tasks = task_history.get_all(self.program, self.batch, running=True)
-        return bool(prev_tasks)
-
 
 class TaskQueue:
     """
-    Thread-safe Usually-First-In-First-Out queue.
+    Thread-safe Usually-Highest-Priority-First queue, ties are First-In-First-Out.
     A task is a program running on an input. The same program can also already
     be running on a different input. If we deduce that the already running
     program might time out for some reason, running this task would be a waste
     of time. We can not know for sure if it will time out, so we need to keep it
     in the queue. We will find a task we think has a better chance of being
     relevant, or fall back on the first in queue if no such task exists.
+
+    Tasks are grouped by (program, batch), all tasks of a group are blocked or
+    unblocked together. Every group is a heap and another heap holds the first
+    task of every group, so a pop only looks at the groups that are currently
+    blocked, not at every task.
     """
 
-    def __init__(self, tasks: Reversible[TaskItem], task_history: TaskHistory):
+    group_t = tuple[str, str]
+    # (not urgent, -priority, order in which the task was added)
+    order_t = tuple[bool, float, int]
+
+    def __init__(self, tasks: Iterable[TaskItem], task_history: TaskHistory):
         self._lock = threading.Lock()
-        self._stack: list[TaskItem] = list(reversed(tasks))
         self._task_history = task_history
+        self._groups: dict[
+            TaskQueue.group_t, list[tuple[TaskQueue.order_t, TaskItem]]
+        ] = {}
+        self._added = 0
+        for task in tasks:
+            key = (task.program, task.batch)
+            self._groups.setdefault(key, []).append((self._get_order(task), task))
+        for group in self._groups.values():
+            heapq.heapify(group)
+        # heap of (order of the first task, group) for every nonempty group,
+        # entries of groups whose first task has changed since are skipped
+        self._heads = [(group[0][0], key) for key, group in self._groups.items()]
+        heapq.heapify(self._heads)
+        self._len = self._added
+        self._may_block: dict[str, bool] = {}
 
     def __len__(self) -> int:
-        return len(self._stack)
+        return self._len
+
+    def _get_order(self, task: TaskItem) -> order_t:
+        self._added += 1
+        return (not task.urgent, -task.priority, self._added)
+
+    def push(self, task: TaskItem) -> None:
+        with self._lock:
+            key = (task.program, task.batch)
+            group = self._groups.setdefault(key, [])
+            heapq.heappush(group, (self._get_order(task), task))
+            if group[0][1] is task:
+                heapq.heappush(self._heads, (group[0][0], key))
+            self._len += 1
+
+    def _is_blocked(self, key: group_t) -> bool:
+        program, batch = key
+        if program not in self._may_block:
+            lang = Langs.from_filename(program)
+            timelimit = Config.get_timelimit(Config.timelimits, None, lang)
+            self._may_block[program] = timelimit != 0
+        return self._may_block[program] and self._task_history.is_running(*key)
+
+    def _take(self, key: group_t) -> TaskItem:
+        group = self._groups[key]
+        _, task = heapq.heappop(group)
+        if group:
+            heapq.heappush(self._heads, (group[0][0], key))
+        else:
+            del self._groups[key]
+        self._len -= 1
+        return task
 
     def pop(self) -> Optional[TaskItem]:
         """Return a task that is not likely to be blocked by a previous task, or None if queue is empty."""
         with self._lock:
-            if not self._stack:
+            if not self._len:
                 return None
-            for i in range(-1, -len(self._stack) - 1, -1):
-                if self._stack[i].should_skip(self._task_history):
+            blocked = []
+            while self._heads:
+                head = heapq.heappop(self._heads)
+                group = self._groups.get(head[1])
+                if not group or group[0][0] != head[0]:
+                    continue  # outdated entry
+                if not self._is_blocked(head[1]):
+                    break
+                blocked.append(head)
+            else:
+                # there is no unblocked task, so we will just take the first one, even if it is blocked
+                head = blocked.pop(0)
+            for entry in blocked:
+                heapq.heappush(self._heads, entry)
+            return self._take(head[1])
+
+
+def run_tasks(
+    queue: TaskQueue,
+    executor: Executor,
+    num_threads: int,
+    wakeup: threading.Event,
+    on_wakeup: Callable[[], None],
+    on_done: Callable[[Any], Any] = lambda _: None,
+    abort: Optional[threading.Event] = None,
+    cpu_slots: Optional[CpuSlots] = None,
+) -> None:
+    """
+    Keep `num_threads` tasks running and start a new one as soon as a slot frees.
+    The calling thread does the dispatching. It sleeps on `wakeup`, which is set
+    after every finished task (and may be set by others, e.g. closed loggers),
+    and calls `on_wakeup` each time. If `abort` gets set, the tasks left in the
+    queue are dropped, only with their callbacks called.
+
+    A task whose `after` is not set yet is put aside and queued again once it is
+    set, so it doesn't hold a worker. A task may also return a follow-up
+    `TaskItem`, e.g. checking its output once the reference output exists. The
+    callbacks of the task are then called only after the follow-up finishes.
+    Tasks with their own `executor` (e.g. checkers) don't count towards
+    `num_threads`. Callbacks are called in the calling thread.
+
+    With enabled `cpu_slots` a timed task is started only with a free core,
+    which it gets handed. Until then it is held back and the workers run the
+    untimed tasks, instead of a worker waiting for the core.
+    """
+    running: dict[Future, TaskItem] = {}
+    waiting = [0]  # tasks put aside until their `after` is set
+    lock = threading.Lock()
+
+    def requeue(task: TaskItem) -> None:
+        with lock:
+            waiting[0] -= 1
+        queue.push(task)
+        wakeup.set()
+
+    def put_aside(task: TaskItem, after: Dependency) -> None:
+        with lock:
+            waiting[0] += 1
+        after.then(lambda: requeue(task))
+
+    def finish(future: Future, task: TaskItem) -> None:
+        follow_up = None
+        if not future.cancelled() and future.exception() is None:
+            follow_up = future.result()
+        if isinstance(follow_up, TaskItem):
+            follow_up.callbacks += task.callbacks
+            queue.push(follow_up)
+            return
+        for callback in (*task.callbacks, on_done):
+            callback(future)
+
+    def count_busy() -> int:
+        return sum(1 for task in running.values() if task.executor is None)
+
+    slots = cpu_slots if cpu_slots is not None and cpu_slots.enabled else None
+    held: list[TaskItem] = []  # the timed task waiting for a free core
+    if slots is not None:
+        slots.listeners.append(wakeup.set)
+    try:
+        while True:
+            waiting_for_core = False
+            while count_busy() < num_threads:
+                task = held.pop() if held and not waiting_for_core else queue.pop()
+                if task is None:
+                    break
+                if abort is not None and abort.is_set():
+                    for callback in (*task.callbacks, on_done):
+                        callback(None)
+                    continue
+                if task.after is not None and not task.after.is_set():
+                    put_aside(task, task.after)
                     continue
-                return self._stack.pop(i)
-            # there is no unblocked task, so we will just take the first one, even if it is blocked
-            return self._stack.pop()
+                func = task.func
+                slot = None
+                if slots is not None and task.timed:
+                    slot = slots.take()
+                    if slot is None:
+                        if held:  # one timed task waits already, keep the rest
+                            queue.push(task)
+                            break
+                        # the workers can run untimed tasks in the meantime
+                        held.append(task)
+                        waiting_for_core = True
+                        continue
+                    func = functools.partial(slots.run_with, slot, task.func)
+                try:
+                    future = (task.executor or executor).submit(func)
+                except RuntimeError:
+                    # executor is already shutting down, don't submit new tasks
+                    if slot is not None:
+                        slot.release()
+                    for callback in task.callbacks:
+                        callback(None)
+                    return
+                future.add_done_callback(lambda _: wakeup.set())
+                running[future] = task
+            with lock:
+                if not running and not waiting[0] and not held and not len(queue):
+                    return
+            wakeup.wait()
+            wakeup.clear()
+            on_wakeup()
+            for future in [future for future in running if future.done()]:
+                finish(future, running.pop(future))
+    finally:
+        if slots is not None:
+            slots.listeners.remove(wakeup.set)
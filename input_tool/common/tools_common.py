@@ -3,13 +3,15 @@ import atexit
 import os
 import signal
 import sys
-from concurrent.futures import Executor, ThreadPoolExecutor
-from typing import Iterable, Union
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from typing import Iterable, Sequence, Union
 
 from input_tool.common import os_config
+from input_tool.common.batch_compile import BATCH_COMPILERS
 from input_tool.common.commands import Config
 from input_tool.common.messages import (
     Color,
+    Logger,
     ParallelLoggerManager,
     default_logger,
     plain,
@@ -79,11 +81,56 @@ def cleanup(programs: Iterable[Program]) -> None:
     cleanup_progdir(True)
 
 
+def get_compile_batches(programs: Iterable[Program]) -> list[list[Program]]:
+    """Programs to compile by a single run of their toolchain, see `compile_batch`"""
+    batches: dict[str, list[Program]] = {}
+    for p in programs:
+        if p.compile_cmd is not None and p.batch_toolchain is not None:
+            batches.setdefault(p.batch_toolchain, []).append(p)
+    return [batch for batch in batches.values() if len(batch) > 1]
+
+
+def compile_batch(programs: Sequence[Program], logger: Logger) -> None:
+    """
+    Compile the programs at once, `Program.compile` then only reports the
+    result. If it fails, they are compiled one by one.
+    """
+    toolchain = programs[0].batch_toolchain
+    assert toolchain is not None
+    logger.infob(f"Compiling {len(programs)} programs by a single {toolchain}.")
+    jobs = []
+    for p in programs:
+        assert p.source_path is not None and p.batch_outdir is not None
+        jobs.append((p.source_path, p.batch_outdir))
+    results = BATCH_COMPILERS[toolchain](jobs)
+    if results is None:
+        logger.warning(
+            f"Compiling by a single {toolchain} failed, compiling one by one."
+        )
+        return
+    for p, result in zip(programs, results):
+        p.batch_result = result
+
+
 def prepare_programs(programs: Iterable[Program], threads: int) -> None:
+    programs = list(programs)
     parallel_logger_manager = ParallelLoggerManager()
     with ThreadPoolExecutor(max_workers=threads) as executor:
-        futures = [
-            executor.submit(p.prepare, parallel_logger_manager.get_sink())
+        futures: list[Future] = []
+        batched: dict[Program, Future] = {}
+        for batch in get_compile_batches(programs):
+            logger = parallel_logger_manager.get_sink()
+            futures.append(executor.submit(compile_batch, batch, logger))
+            batched.update((p, futures[-1]) for p in batch)
+
+        def prepare(program: Program, logger: Logger) -> None:
+            # the batches were submitted first, so they are already running
+            if program in batched:
+                batched[program].result()
+            program.prepare(logger)
+
+        futures += [
+            executor.submit(prepare, p, parallel_logger_manager.get_sink())
             for p in programs
         ]
         for future, logger in zip(futures, parallel_logger_manager.sinks):
@@ -0,0 +1,92 @@
+# © 2026 fezjo
+"""
+Verdicts of checkers for outputs they have already seen.
+
+Many solutions produce the same outputs and reruns produce them again, so the
+verdict is looked up by the hashes of the checker, the input, the reference
+output and the tested output before running the checker. The verdicts are kept
+in the user cache directory, so they don't add to the size of the test data.
+"""
+
+import json
+import threading
+from typing import Optional
+
+from input_tool.common.hashing import hash_bytes, hash_file
+from input_tool.common.messages import warning
+from input_tool.common.types import Path
+
+VERDICTS_CACHE = "verdicts"  # see `get_cache_file`
+MAX_ENTRIES = 100_000
+
+
+class VerdictCache:
+    """Thread safe"""
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.enabled = True
+        # dict {key: verdict}, only 0 (correct) and 1 (wrong) are kept,
+        # ordered from the least recently used
+        self.verdicts: dict[str, int] = {}
+        self.hits = 0
+
+    def load(self, path: Path) -> None:
+        if not self.enabled or not path.exists():
+            return
+        try:
+            with open(path, "r") as f:
+                verdicts = {k: int(v) for k, v in json.load(f)["verdicts"].items()}
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+            warning(f"Failed to load checker verdicts from {path}: {e!r}")
+            return
+        with self.lock:
+            self.verdicts = verdicts
+
+    def save(self, path: Path) -> None:
+        if not self.enabled:
+            return
+        with self.lock:
+            verdicts = dict(list(self.verdicts.items())[-MAX_ENTRIES:])
+            try:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                with open(path, "w") as f:
+                    json.dump({"verdicts": verdicts}, f)
+            except OSError as e:
+                warning(f"Failed to save checker verdicts to {path}: {e!r}")
+
+    def make_key(
+        self, checker_hash: str, ifile: Path, ofile: Path, tfile: Path
+    ) -> Optional[str]:
+        """None if caching is disabled or some file can't be read"""
+        if not self.enabled:
+            return None
+        try:
+            hashes = [
+                hash_file(ifile).encode(),
+                hash_file(ofile).encode(),
+                hash_file(tfile, remember=False).encode(),
+            ]
+        except OSError:
+            return None
+        return hash_bytes(checker_hash.encode(), *hashes)
+
+    def get(self, key: Optional[str], accept_wrong: bool = True) -> Optional[int]:
+        if key is None:
+            return None
+        with self.lock:
+            verdict = self.verdicts.get(key)
+            if verdict is None or (verdict and not accept_wrong):
+                return None
+            self.hits += 1
+            self.verdicts[key] = self.verdicts.pop(key)
+        return verdict
+
+    def put(self, key: Optional[str], verdict: int) -> None:
+        if key is None or verdict not in (0, 1):
+            return
+        with self.lock:
+            self.verdicts[key] = verdict
+
+
+VERDICT_CACHE = VerdictCache()
@@ -0,0 +1,117 @@
+# © 2026 fezjo
+"""
+Measure how much parallel runs slow each other down on this machine.
+
+A CPU-bound and a memory-bandwidth-bound probe are run with increasing
+concurrency. The highest thread count whose slowdown stays under the tolerance
+is saved to a profile, which the tester and findlimits use by default.
+"""
+
+import os
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from input_tool.common import execution
+from input_tool.common.calibration import CalibrationProfile, save_profile
+from input_tool.common.commands import Config
+from input_tool.common.messages import Color, fatal, info, infob, infog, warning
+from input_tool.common.parser.specifications import ArgsCalibrate
+from input_tool.common.types import Directory, Path
+
+# every probe times only its own work and prints the number of seconds
+PROBES = {
+    "cpu": """
+import time
+start = time.perf_counter()
+x = 0
+for i in range(3_000_000):
+    x = (x * 31 + i) & 0xFFFF
+print(time.perf_counter() - start)
+""",
+    "memory": """
+import time
+src = bytearray(16 << 20)
+start = time.perf_counter()
+for _ in range(32):
+    dst = bytes(src)
+print(time.perf_counter() - start)
+""",
+}
+PROBE_TIMEOUT = timedelta(seconds=60)
+
+
+def get_levels(max_threads: int) -> list[int]:
+    """1, 2, 4, 8, ... and `max_threads`"""
+    levels = []
+    level = 1
+    while level < max_threads:
+        levels.append(level)
+        level *= 2
+    levels.append(max_threads)
+    return levels
+
+
+def run_probe(code: str, workdir: Directory, i: int) -> float:
+    ifile = Path(os.devnull)
+    ofile = workdir / f"probe{i}.out"
+    result = execution.run_native(
+        [sys.executable, "-c", code], ifile, ofile, PROBE_TIMEOUT
+    )
+    if result.returncode != 0:
+        fatal(f"Calibration probe failed: {result.stderr.decode(errors='replace')}")
+    return float(ofile.read_text())
+
+
+def measure(code: str, threads: int, repeats: int, workdir: Directory) -> float:
+    """Median time of one probe when `threads` of them run at once"""
+    times: list[float] = []
+    with ThreadPoolExecutor(threads) as executor:
+        for _ in range(repeats):
+            times += executor.map(lambda i: run_probe(code, workdir, i), range(threads))
+    return statistics.median(times)
+
+
+def run(args: ArgsCalibrate) -> None:
+    Color.setup(args.colorful)
+    max_threads = args.threads or Config.get_cpu_corecount()
+    levels = get_levels(max_threads)
+
+    info(f"Calibrating with {', '.join(map(str, levels))} threads.")
+    slowdowns: dict[int, dict[str, float]] = {}
+    baseline: dict[str, float] = {}
+    start = time.monotonic()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for threads in levels:
+            slowdowns[threads] = {}
+            for name, code in PROBES.items():
+                t = measure(code, threads, args.repeats, Directory(tmpdir))
+                baseline.setdefault(name, t)
+                slowdowns[threads][name] = t / baseline[name]
+            row = ", ".join(f"{n} x{s:.2f}" for n, s in slowdowns[threads].items())
+            info(f"  {threads:3d} threads: {row}")
+
+    best = 1
+    for threads in levels:
+        if max(slowdowns[threads].values()) > 1 + args.tolerance:
+            break
+        best = threads
+    if best == 1 and len(levels) > 1:
+        warning("Even 2 parallel runs slow each other down, consider using -j 1.")
+
+    profile = CalibrationProfile(
+        cpu_count=os.cpu_count() or 1,
+        tolerance=args.tolerance,
+        threads=best,
+        slowdowns=slowdowns,
+        created=time.time(),
+    )
+    path = save_profile(profile)
+    infob(f"Calibration took {time.monotonic() - start:.1f}s.")
+    infog(
+        f"Slowdown stays under {args.tolerance:.0%} with up to {best} threads, "
+        f"saved to {path}."
+    )
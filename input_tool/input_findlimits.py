@@ -15,7 +15,14 @@ from dataclasses import dataclass
 from datetime import timedelta
 from typing import Optional, Sequence
 
+from input_tool.common.affinity import CPU_SLOTS
+from input_tool.common.calibration import (
+    describe_inflation,
+    get_default_threads,
+    load_profile,
+)
 from input_tool.common.commands import Config, Langs, natural_sort_key
+from input_tool.common.compile_cache import get_cache_file
 from input_tool.common.messages import (
     BufferedLogger,
     ParallelLoggerManager,
@@ -32,8 +39,9 @@ from input_tool.common.parser.specifications import ArgsFindlimits
 from input_tool.common.programs.checker import Checker
 from input_tool.common.programs.solution import Solution
 from input_tool.common.programs.validator import Validator
+from input_tool.common.runtime_history import HISTORY_CACHE, RUNTIME_HISTORY
 from input_tool.common.task_history import TASK_HISTORY
-from input_tool.common.task_queue import TaskItem, TaskQueue
+from input_tool.common.task_queue import TaskItem, TaskQueue, run_tasks
 from input_tool.common.tools_common import (
     check_data_folder_size,
     cleanup,
@@ -42,6 +50,7 @@ from input_tool.common.tools_common import (
     setup_config,
 )
 from input_tool.common.types import Directory, Path, RelativePath, TempFile
+from input_tool.common.verdict_cache import VERDICT_CACHE, VERDICTS_CACHE
 from input_tool.input_tester import (
     create_programs_from_files,
     deduplicate_solutions,
@@ -343,15 +352,17 @@ def run_solution_on_inputs(
 
                 TASK_HISTORY.start(sol.name, batch, str(input_file))
                 callbacks = TASK_HISTORY.get_callbacks(sol.name, batch, str(input_file))
-                run_times, status = sol._run(
-                    ifile, ofile, tfile, checker, False, logger, callbacks
-                )
+                with CPU_SLOTS.acquire() as slot:
+                    run_times, peak_memory, status = sol._run(
+                        ifile, ofile, tfile, checker, False, logger, callbacks, slot
+                    )
+                cpu = None if slot is None else slot.cpu
 
                 # Clear warn-TLE flag since findlimits doesn't use warntimelimits
                 if status == Status.ok and run_times is not None:
                     status = status.set_warntle(False)
 
-                sol.record(ifile, status, run_times)
+                sol.record(ifile, status, run_times, peak_memory, cpu)
                 sol.output_testcase_summary(ifile, status, run_times, logger)
                 results[batch].append((run_times, status))
 
@@ -379,7 +390,11 @@ def run_solution_on_inputs(
                 results[batch].append((None, Status.err))
 
         callbacks = [lambda _, logger=logger: logger_finalize(logger)]
-        task_item = TaskItem(sol.name, batch, str(input_file), run_task, callbacks)
+        # the longest tasks go first, so that a TLE aborts the run early
+        priority = RUNTIME_HISTORY.predict(sol.name, ifile)
+        task_item = TaskItem(
+            sol.name, batch, str(input_file), run_task, callbacks, priority, timed=True
+        )
         tasks.append(task_item)
 
     queue = TaskQueue(tasks, TASK_HISTORY)
@@ -388,42 +403,28 @@ def run_solution_on_inputs(
         with ThreadPoolExecutor(max_workers=num_threads) as executor:
             register_quit_with_executor(executor)
 
-            def get_new_task(_=None):
-                if abort_event.is_set():
-                    # Drain remaining tasks from the queue (update progress)
-                    while True:
-                        task = queue.pop()
-                        if task is None:
-                            break
-                        progress_bar.update()
-                        for callback in task.callbacks:
-                            callback(None)
-                    return
-                task = queue.pop()
-                if task is None:
-                    return
-                task.callbacks.append(lambda _, p=progress_bar: p.update())
-                try:
-                    future = executor.submit(task.func)
-                except RuntimeError:
-                    for callback in task.callbacks:
-                        callback(None)
-                else:
-                    for callback in task.callbacks:
-                        future.add_done_callback(callback)
-                    future.add_done_callback(get_new_task)
+            def print_closed_logs() -> None:
+                progress_bar.clear()
+                plain(parallel_logger_manager.read_closed())
+                progress_bar.display()
 
-            for _ in range(num_threads):
-                executor.submit(get_new_task)
+            run_tasks(
+                queue,
+                executor,
+                num_threads,
+                parallel_logger_manager.closed_event,
+                print_closed_logs,
+                lambda _: progress_bar.update(),
+                abort_event,
+                CPU_SLOTS,
+            )
 
             while parallel_logger_manager.last_open < len(
                 parallel_logger_manager.sinks
             ):
                 parallel_logger_manager.closed_event.wait()
                 parallel_logger_manager.closed_event.clear()
-                progress_bar.clear()
-                plain(parallel_logger_manager.read_closed())
-                progress_bar.display()
+                print_closed_logs()
 
     default_logger.statistics += parallel_logger_manager.statistics
     return dict(results)
@@ -460,6 +461,9 @@ def collect_timing_data(
         else:
             batch_max_times[batch] = None
 
+        if batch_status == Status.mle:
+            # timelimits can not fix memory, so it is handled like a crash
+            batch_status = Status.exc
         batch_statuses[batch] = str(batch_status.set_warntle(False))[0]
 
     return SolutionTimingData(
@@ -1513,11 +1517,30 @@ def print_warnings(
 def run(args: ArgsFindlimits) -> None:
     setup_config(
         args,
-        ("progdir", "pythoncmd", "memorylimit", "quiet", "compile", "execute"),
+        (
+            "progdir",
+            "pythoncmd",
+            "memorylimit",
+            "quiet",
+            "compile",
+            "compile_cache",
+            "execute",
+            "backend",
+            "pin_cpus",
+            "checker_timeout",
+            "checker_memorylimit",
+            "checker_persistent",
+            "checker_cache",
+        ),
     )
     Config.rus_time = False
     Config.fail_skip = True
-    Config.threads = args.threads if args.threads else Config.get_cpu_corecount(0.25)
+    calibration = load_profile()
+    Config.threads = args.threads if args.threads else get_default_threads(calibration)
+    if calibration is not None and Config.threads > 1 and not Config.pin_cpus:
+        infob(describe_inflation(calibration, Config.threads))
+    if Config.pin_cpus:
+        CPU_SLOTS.setup(Config.threads)
 
     os.system(f"{Config.os_config.cmd_python} --version")
 
@@ -1629,6 +1652,11 @@ def run(args: ArgsFindlimits) -> None:
     # Record new start time (will be saved to cache)
     current_start = time.time()
     save_cache(cache_path, cached_data, current_start)
+    history_path = get_cache_file(HISTORY_CACHE, Path(args.outdir))
+    RUNTIME_HISTORY.load(history_path)
+    verdicts_path = get_cache_file(VERDICTS_CACHE, Path(args.outdir))
+    VERDICT_CACHE.enabled = Config.checker_cache
+    VERDICT_CACHE.load(verdicts_path)
 
     # === Adaptive execution with integrated retry ===
     infob("\n===== Running Solutions =====")
@@ -1896,6 +1924,11 @@ def run(args: ArgsFindlimits) -> None:
             )
             tl_results[lang] = result
 
+    RUNTIME_HISTORY.save(history_path)
+    VERDICT_CACHE.save(verdicts_path)
+    if checker is not None:
+        checker.close()
+
     # === Output ===
     print_timing_table(timing_data, expectations, batches, tl_results)
     print_results(tl_results, batches)
@@ -148,7 +148,10 @@ def generate_all(
 
 
 def run(args: ArgsGenerator) -> None:
-    setup_config(args, ("progdir", "quiet", "compile", "execute"))
+    setup_config(
+        args,
+        ("progdir", "quiet", "compile", "compile_cache", "forkserver", "execute"),
+    )
     Config.threads = args.threads if args.threads else Config.get_cpu_corecount(0.75)
 
     recipe = get_recipe(args.description, args.idf_version)
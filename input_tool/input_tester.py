@@ -4,20 +4,28 @@
 # © 2022 fezjo
 # Complex script that can test solutions
 import atexit
+import copy
 import json
 import os
 import shutil
 import traceback
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import Executor, ThreadPoolExecutor
 from datetime import timedelta
 from typing import Callable, Iterable, Optional, Sequence, Union
 
+from input_tool.common.affinity import CPU_SLOTS
+from input_tool.common.calibration import (
+    describe_inflation,
+    get_default_threads,
+    load_profile,
+)
 from input_tool.common.commands import (
     Config,
     Langs,
     get_statistics_header,
     natural_sort_key,
 )
+from input_tool.common.compile_cache import get_cache_file
 from input_tool.common.messages import (
     BufferedLogger,
     Logger,
@@ -43,16 +51,21 @@ from input_tool.common.programs.checker import Checker
 from input_tool.common.programs.program import Program
 from input_tool.common.programs.solution import Solution
 from input_tool.common.programs.validator import Validator
+from input_tool.common.result_store import RESULT_STORE, RESULTS_FILENAME
+from input_tool.common.runtime_history import HISTORY_CACHE, RUNTIME_HISTORY
+from input_tool.common.startup import STARTUP_OVERHEADS
 from input_tool.common.task_history import TASK_HISTORY
-from input_tool.common.task_queue import TaskItem, TaskQueue
+from input_tool.common.task_queue import Dependency, TaskItem, TaskQueue, run_tasks
 from input_tool.common.tools_common import (
     check_data_folder_size,
     cleanup,
-    prepare_programs,
+    compile_batch,
+    get_compile_batches,
     register_quit_with_executor,
     setup_config,
 )
 from input_tool.common.types import Directory, Path, RelativePath, TempFile
+from input_tool.common.verdict_cache import VERDICT_CACHE, VERDICTS_CACHE
 
 # ----------------- configuration ----------------
 
@@ -131,6 +144,39 @@ def create_checker(
     return Checker(checker_files[0], show_diff_output)
 
 
+def find_copies(
+    solutions: Iterable[Union[Solution, Validator]],
+) -> dict[Program, Union[Solution, Validator]]:
+    """Map every copy of a solution to the first one, see `Program.get_copy_key`"""
+    first: dict[str, Union[Solution, Validator]] = {}
+    copies: dict[Program, Union[Solution, Validator]] = {}
+    for s in solutions:
+        key = s.get_copy_key()
+        if key is None:
+            continue
+        if key in first:
+            copies[s] = first[key]
+            infob(f"Solution {s.name} is a copy of {first[key].name}, testing it once.")
+        else:
+            first[key] = s
+    return copies
+
+
+def attribute_to_copies(
+    solutions: Iterable[Union[Solution, Validator]],
+    copies: dict[Program, Union[Solution, Validator]],
+) -> list[Union[Solution, Validator]]:
+    """The solutions with the results of the tested originals in place of copies"""
+    res: list[Union[Solution, Validator]] = []
+    for s in solutions:
+        if s in copies:
+            tested = copy.copy(copies[s])
+            tested.name = s.name
+            s = tested
+        res.append(s)
+    return res
+
+
 def deduplicate_solutions(
     solutions: Iterable[Union[Solution, Validator]],
 ) -> list[Union[Solution, Validator]]:
@@ -242,6 +288,30 @@ def get_output_creation_message(output_file: Path) -> str:
     return f"File {output_file} will be created now ({reason})."
 
 
+def keep_result(
+    sol: Union[Solution, Validator],
+    ofile: Path,
+    rfile: TempFile,
+    status: Optional[Status],
+    cleartemp: bool,
+    keepwa: bool,
+    outdir: Directory,
+) -> None:
+    if (
+        keepwa
+        and status == Status.wa
+        and ofile != rfile
+        and rfile.exists()
+        and not isinstance(sol, Validator)
+    ):
+        sol_name = sol.name.replace("/", "__")
+        wa_dir = outdir / "wa" / sol_name
+        wa_dir.mkdir(parents=True, exist_ok=True)
+        rfile.rename(wa_dir / ofile.name)
+    if cleartemp and ofile != rfile and rfile.exists():
+        rfile.unlink()
+
+
 def run_sol(
     sol: Union[Solution, Validator],
     ifile: Path,
@@ -252,26 +322,127 @@ def run_sol(
     keepwa: bool,
     outdir: Directory,
     is_output_generator: bool,
+    check_executor: Executor,
+    reuse: bool = False,
     logger: Optional[Logger] = None,
-) -> None:
+) -> Optional[TaskItem]:
+    """
+    Run the solution and return a task that checks its output in
+    `check_executor`, once the reference output exists, see `run_tasks`.
+    With `reuse` a result from a previous run is used if nothing changed.
+    """
+    logger = default_logger if logger is None else logger
     try:
-        status = sol.run(ifile, ofile, rfile, checker, is_output_generator, logger)
-        if (
-            keepwa
-            and status == Status.wa
-            and ofile != rfile
-            and rfile.exists()
-            and not isinstance(sol, Validator)
-        ):
-            sol_name = sol.name.replace("/", "__")
-            wa_dir = outdir / "wa" / sol_name
-            wa_dir.mkdir(parents=True, exist_ok=True)
-            rfile.rename(wa_dir / ofile.name)
-        if cleartemp and ofile != rfile and rfile.exists():
-            rfile.unlink()
+        if isinstance(sol, Validator) or checker.type.is_interactive():
+            status = sol.run(ifile, ofile, rfile, checker, is_output_generator, logger)
+            keep_result(sol, ofile, rfile, status, cleartemp, keepwa, outdir)
+            return None
+
+        def get_key() -> Optional[str]:
+            return RESULT_STORE.make_key(
+                sol.get_content_hash(),
+                checker.get_content_hash(),
+                ifile,
+                ofile,
+                sol.get_timelimit(Config.timelimits),
+                "\n".join(
+                    (sol.get_toolchain_identity(), checker.get_toolchain_identity())
+                ),
+            )
+
+        key = None
+        if reuse:
+            key = get_key()
+            stored = RESULT_STORE.get(key)
+            if stored is not None:
+                sol.reuse(ifile, stored, logger)
+                return None
+        result = sol.execute(
+            ifile, ofile, rfile, checker, is_output_generator, logger, check=False
+        )
     except Exception as e:
         traceback.print_exc()
         fatal(repr(e))
+        return None
+    if result is None:
+        return None
+
+    def check_and_finish() -> None:
+        try:
+            result.status = sol.check_output(
+                ifile, ofile, rfile, checker, result.status, logger
+            )
+            # the reference output is complete now even if it was being generated
+            store_key = get_key() if key is None else key
+            RESULT_STORE.put(
+                store_key, result.status, result.run_times, result.peak_memory
+            )
+            status = sol.finish(ifile, result, logger)
+            keep_result(sol, ofile, rfile, status, cleartemp, keepwa, outdir)
+        except Exception as e:
+            traceback.print_exc()
+            fatal(repr(e))
+
+    return TaskItem(
+        checker.name,
+        sol.parse_batch(ifile),
+        str(ifile),
+        check_and_finish,
+        urgent=True,
+        after=None if is_output_generator else checker.output_ready[ifile],
+        executor=check_executor,
+    )
+
+
+def prepare_program(program: Program, logger: Logger) -> None:
+    try:
+        program.prepare(logger)
+    except Exception as e:
+        traceback.print_exc()
+        fatal(repr(e))
+
+
+def build_prepare_tasks(
+    programs: Sequence[Program],
+    parallel_logger_manager: ParallelLoggerManager,
+    logger_finalize: Callable[[BufferedLogger], None],
+) -> list[TaskItem]:
+    """Compile the programs in the pool of the tests, before everything else."""
+    tasks: list[TaskItem] = []
+    batched: dict[Program, Dependency] = {}
+    for batch in get_compile_batches(programs):
+        logger = parallel_logger_manager.get_sink()
+        compiled = Dependency()
+        tasks.append(
+            TaskItem(
+                str(batch[0].batch_toolchain),
+                "",
+                "prepare",
+                lambda batch=batch, logger=logger: compile_batch(batch, logger),
+                [
+                    lambda _, logger=logger: logger_finalize(logger),
+                    lambda _, compiled=compiled: compiled.set(),
+                ],
+                priority=float("inf"),
+                urgent=True,
+            )
+        )
+        batched.update((p, compiled) for p in batch)
+    for program in programs:
+        logger = parallel_logger_manager.get_sink()
+        tasks.append(
+            TaskItem(
+                program.name,
+                "",
+                "prepare",
+                lambda program=program, logger=logger: prepare_program(program, logger),
+                [lambda _, logger=logger: logger_finalize(logger)],
+                priority=float("inf"),
+                urgent=True,
+                after=batched.get(program),
+            )
+        )
+    return tasks
 
 
 def build_test_tasks(
@@ -281,8 +452,11 @@ def build_test_tasks(
     args: ArgsTester,
     parallel_logger_manager: ParallelLoggerManager,
     logger_finalize: Callable[[BufferedLogger], None],
+    check_executor: Executor,
 ) -> list[TaskItem]:
     tasks: list[TaskItem] = []
+    # a solution is tested as soon as both it and the checker are prepared
+    ready = [Dependency.all_of(sol.ready, checker.ready) for sol in solutions]
     for input in inputs:
         input_file = args.indir / input
         prefix = str(args.outdir / input.with_suffix(""))
@@ -311,12 +485,16 @@ def build_test_tasks(
             logger = parallel_logger_manager.get_sink()
             batch = Solution.parse_batch(input)
             callbacks: list[Callable] = []
+            # the longest tasks go first, after the ones generating outputs
+            priority = RUNTIME_HISTORY.predict(sol.name, input_file)
             if is_generator:
                 testcase_logger.infob(get_output_creation_message(output_file))
                 generating_output = True
                 callbacks.append(lambda _, o=output_ready: o.set())
 
             callbacks.append(lambda _, logger=logger: logger_finalize(logger))
+            # the reference output must not change during the run
+            reuse = not generating_output and not isinstance(sol, Validator)
 
             def run_task(
                 sol=sol,
@@ -328,9 +506,11 @@ def build_test_tasks(
                 keepwa=args.keepwa,
                 outdir=args.outdir,
                 is_generator=is_generator,
+                check_executor=check_executor,
+                reuse=reuse,
                 logger=logger,
             ):
-                run_sol(
+                return run_sol(
                     sol,
                     ifile,
                     ofile,
@@ -340,10 +520,22 @@ def build_test_tasks(
                     keepwa,
                     outdir,
                     is_generator,
+                    check_executor,
+                    reuse,
                     logger,
                 )
 
-            task_item = TaskItem(sol.name, batch, str(input), run_task, callbacks)
+            task_item = TaskItem(
+                sol.name,
+                batch,
+                str(input),
+                run_task,
+                callbacks,
+                priority,
+                is_generator,
+                ready[si],
+                timed=not isinstance(sol, Validator),
+            )
             tasks.append(task_item)
 
         if not generating_output:
@@ -362,33 +554,27 @@ def run_task_queue(
         with ThreadPoolExecutor(max_workers=num_threads) as executor:
             register_quit_with_executor(executor)
 
-            def get_new_task(_=None):
-                task = queue.pop()
-                if task is None:
-                    return
-                task.callbacks.append(lambda _, p=progress_bar: p.update())
-                try:
-                    future = executor.submit(task.func)
-                except RuntimeError:
-                    for callback in task.callbacks:
-                        callback(None)
-                    # don't submit new tasks if executor is already shutting down
-                else:
-                    for callback in task.callbacks:
-                        future.add_done_callback(callback)
-                    future.add_done_callback(get_new_task)
-
-            for _ in range(num_threads):
-                executor.submit(get_new_task)
+            def print_closed_logs() -> None:
+                progress_bar.clear()
+                plain(parallel_logger_manager.read_closed())
+                progress_bar.display()
+
+            run_tasks(
+                queue,
+                executor,
+                num_threads,
+                parallel_logger_manager.closed_event,
+                print_closed_logs,
+                lambda _: progress_bar.update(),
+                cpu_slots=CPU_SLOTS,
+            )
 
             while parallel_logger_manager.last_open < len(
                 parallel_logger_manager.sinks
             ):
                 parallel_logger_manager.closed_event.wait()
                 parallel_logger_manager.closed_event.clear()
-                progress_bar.clear()
-                plain(parallel_logger_manager.read_closed())
-                progress_bar.display()
+                print_closed_logs()
 
 
 def test_all(
@@ -399,15 +585,24 @@ def test_all(
     args: ArgsTester,
 ) -> None:
     """
-    First solution generates output file if it doesn't exist. All the other
-    solutions can run in parallel however, they can't be checked via the Checker
-    unless the output file is generated. They wait for Event, which is triggered
-    when the generating solution thread finishes.
+    The programs that are not prepared yet are compiled first, in the same
+    pool of `num_threads` workers, so compilation and testing together don't
+    oversubscribe the machine. The tasks of a solution wait without holding a
+    worker until it and the checker are prepared, the others can already run.
+
+    First solution generates output file if it doesn't exist, these tasks are
+    started first. All the other solutions can run in parallel however, they
+    can't be checked via the Checker unless the output file is generated. The
+    check of every run is a separate task in its own pool of
+    `Config.checker_threads`, so checkers don't hold the workers of the timed
+    solutions. It waits for the Dependency triggered when the generating
+    solution finishes, without holding a worker.
 
     The logs from all the threads are stored separately. Whenever a thread
     finishes, the corresponding logger closes and triggers an Event.
     Subsequently, the main thread reads as many of the closed logs as possible
-    and prints them.
+    and prints them. It also starts a new task whenever one finishes, see
+    `run_tasks`.
     """
     parallel_logger_manager = ParallelLoggerManager()
 
@@ -415,16 +610,22 @@ def test_all(
         logger.close()
         parallel_logger_manager.closed_event.set()
 
-    tasks = build_test_tasks(
-        solutions,
-        checker,
-        inputs,
-        args,
-        parallel_logger_manager,
-        logger_finalize,
-    )
-    queue = TaskQueue(tasks, TASK_HISTORY)
-    run_task_queue(queue, num_threads, parallel_logger_manager)
+    with ThreadPoolExecutor(max_workers=Config.checker_threads) as check_executor:
+        unprepared = [p for p in (checker, *solutions) if not p.ready.is_set()]
+        tasks = build_prepare_tasks(
+            unprepared, parallel_logger_manager, logger_finalize
+        )
+        tasks += build_test_tasks(
+            solutions,
+            checker,
+            inputs,
+            args,
+            parallel_logger_manager,
+            logger_finalize,
+            check_executor,
+        )
+        queue = TaskQueue(tasks, TASK_HISTORY)
+        run_task_queue(queue, num_threads, parallel_logger_manager)
 
     register_quit_signal()
     default_logger.statistics += parallel_logger_manager.statistics
@@ -433,10 +634,35 @@ def test_all(
 def print_summary(
     solutions: Iterable[Union[Solution, Validator]], inputs: Iterable[RelativePath]
 ) -> None:
+    net = any(s.statistics.startup is not None for s in solutions)
     info("")
-    info(get_statistics_header(inputs))
+    info(get_statistics_header(inputs, net))
     for s in solutions:
-        info(s.get_statistics())
+        info(s.get_statistics(net))
+    checktimes = [
+        t for s in solutions for ts in s.statistics.checktimes.values() for t in ts
+    ]
+    if checktimes:
+        info(
+            f"Checker took {sum(checktimes, timedelta()).total_seconds():.2f}s "
+            f"in total, at most {round(max(checktimes).total_seconds() * 1000)}ms."
+        )
+    reused = sum(s.statistics.reused for s in solutions)
+    if reused:
+        infob(
+            f"Results of {reused} tests were reused from previous runs "
+            "and not executed, use --fresh to run them again."
+        )
+    if VERDICT_CACHE.hits:
+        info(f"Checker verdicts of {VERDICT_CACHE.hits} outputs reused from cache.")
+
+
+def measure_startup_overheads(solutions: Iterable[Union[Solution, Validator]]) -> None:
+    """Startup of the languages of the solutions, after the tests not to slow them"""
+    for s in solutions:
+        s.statistics.startup = STARTUP_OVERHEADS.get(
+            s.lang, s.extension, default_logger
+        )
 
 
 def check_too_long_tests(
@@ -467,15 +693,30 @@ def run(args: ArgsTester) -> None:
             "memorylimit",
             "quiet",
             "compile",
+            "compile_cache",
+            "forkserver",
             "execute",
+            "backend",
+            "pin_cpus",
+            "checker_timeout",
+            "checker_memorylimit",
+            "checker_persistent",
+            "checker_cache",
         ),
     )
-    Config.rus_time = args.rustime and bool(shutil.which(Config.os_config.cmd_time))
+    # the native and cgroup backends get user and system time without `time`
+    Config.rus_time = args.rustime and (
+        Config.backend != "shell" or bool(shutil.which(Config.os_config.cmd_time))
+    )
     Config.timelimits.update(parse_timelimit(args.timelimit))
     Config.warn_timelimits.update(
         parse_warntimelimit(args.warntimelimit, Config.timelimits)
     )
-    Config.threads = args.threads if args.threads else Config.get_cpu_corecount(0.25)
+    calibration = load_profile()
+    Config.threads = args.threads if args.threads else get_default_threads(calibration)
+    Config.checker_threads = args.checker_threads or max(1, Config.threads // 2)
+    if Config.pin_cpus:
+        CPU_SLOTS.setup(Config.threads)
 
     if 0 < Config.memorylimit < 100:
         warning(
@@ -498,6 +739,13 @@ def run(args: ArgsTester) -> None:
         solutions = [s for s in solutions if isinstance(s, Validator)] + [
             s for s in solutions if not isinstance(s, Validator)
         ][:1]
+    # copies of a solution under other names are tested only once
+    copies = {} if args.dupprog else find_copies(solutions)
+    all_solutions = solutions
+    solutions = [s for s in solutions if s not in copies]
+    # multiple solutions can have same run command, e.g. a source and its binary
+    if not args.dupprog:
+        solutions = deduplicate_solutions(solutions)
     programs = [checker] + solutions
 
     def cleanup_programs() -> None:
@@ -506,17 +754,23 @@ def run(args: ArgsTester) -> None:
     if args.clearbin:
         atexit.register(cleanup_programs)
 
-    prepare_programs(programs, max(4, Config.threads))
-    # multiple solutions can have same run command after compilation
-    if not args.dupprog:
-        solutions = deduplicate_solutions(solutions)
-
-    for s in solutions:
+    # the programs are compiled by `test_all`, while the first ones are tested
+    for s in all_solutions:
         Config.cmd_maxlen = max(Config.cmd_maxlen, len(s.name))
     Config.inside_oneline = len(solutions) <= 1
     print_solutions_run_commands(solutions)
 
     shutil.rmtree(args.outdir / "wa", ignore_errors=True)
+    # keyed by the real outdir, it may move to ioram
+    history_path = get_cache_file(HISTORY_CACHE, args.outdir)
+    RUNTIME_HISTORY.load(history_path)
+    verdicts_path = get_cache_file(VERDICTS_CACHE, args.outdir)
+    VERDICT_CACHE.enabled = Config.checker_cache
+    VERDICT_CACHE.load(verdicts_path)
+    results_path = args.outdir / RESULTS_FILENAME
+    RESULT_STORE.enabled = args.incremental or args.fresh
+    RESULT_STORE.reuse = not args.fresh
+    RESULT_STORE.load(results_path)
     inputs = get_inputs(args)
     _outputs = get_outputs(inputs, args)
     if args.ioram:
@@ -524,8 +778,21 @@ def run(args: ArgsTester) -> None:
 
     temp_clear(args)
     Config.inside_inputmaxlen = max(len(str(p)) for p in inputs) if inputs else 0
+    if inputs:
+        smallest = min(inputs, key=lambda i: RUNTIME_HISTORY.get_size(args.indir / i))
+        for s in solutions:
+            s.training_input = args.indir / smallest
 
     test_all(solutions, checker, inputs, Config.threads, args)
+    checker.close()
+    if args.nettimes:
+        measure_startup_overheads(solutions)
+    RUNTIME_HISTORY.save(history_path)
+    VERDICT_CACHE.save(verdicts_path)
+    RESULT_STORE.save(results_path)
+    solutions = attribute_to_copies(
+        [s for s in all_solutions if s in copies or s in solutions], copies
+    )
     if args.stats:
         print_summary(solutions, inputs)
 
@@ -542,11 +809,15 @@ def run(args: ArgsTester) -> None:
             json.dump(output, f, default=serialize_for_json)
 
     # TODO check if parallel testing slows down the testing
-    if Config.threads > 1:
-        infob(
-            "Make sure to verify whether parallel testing significantly "
-            "impacts the program's execution speed."
-        )
+    if Config.threads > 1 and not Config.pin_cpus:
+        if calibration is not None:
+            infob(describe_inflation(calibration, Config.threads))
+        else:
+            infob(
+                "Make sure to verify whether parallel testing significantly "
+                "impacts the program's execution speed "
+                "(see `itool calibrate` and --pin-cpus)."
+            )
 
 
 def main():
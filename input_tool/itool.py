@@ -29,14 +29,13 @@ def run_tester(args: itool_parser.specs.ArgsTester):
 def run_compile(args: itool_parser.specs.ArgsCompile):
     from input_tool.common.commands import Config
     from input_tool.common.programs.checker import Checker
-    from input_tool.common.tools_common import setup_config
+    from input_tool.common.tools_common import prepare_programs, setup_config
     from input_tool.input_tester import (
         create_programs_from_files,
         get_relevant_prog_files_deeper,
-        prepare_programs,
     )
 
-    setup_config(args, ("progdir", "quiet", "colorful"))
+    setup_config(args, ("progdir", "quiet", "colorful", "compile_cache"))
     Config.compile = True
     Config.execute = False
     Config.threads = args.threads if args.threads else Config.get_cpu_corecount(0.99)
@@ -65,6 +64,7 @@ def run_autogenerate(args: itool_parser.specs.ArgsAutogenerate):
         bestonly=True,
         reset=True,
         rustime=False,
+        nettimes=False,
         timelimit="0",
         warntimelimit="0",
         memorylimit=0,
@@ -73,6 +73,15 @@ def run_autogenerate(args: itool_parser.specs.ArgsAutogenerate):
         keepwa=False,
         fail_skip=False,
         ioram=False,
+        backend="native",
+        pin_cpus=False,
+        checker_threads=0,
+        checker_timeout=60,
+        checker_memorylimit=0,
+        checker_persistent=False,
+        checker_cache=True,
+        incremental=False,
+        fresh=False,
     )
     run_generator(args_generator)
     run_tester(args_tester)
@@ -84,6 +93,12 @@ def run_findlimits(args: itool_parser.specs.ArgsFindlimits):
     run(args)
 
 
+def run_calibrate(args: itool_parser.specs.ArgsCalibrate):
+    from input_tool.input_calibrate import run
+
+    run(args)
+
+
 def run_colortest(args: itool_parser.specs.ArgsGeneric):
     from input_tool.common.messages import color_test
 
@@ -110,6 +125,7 @@ def main():
         "compile": run_compile,
         "autogenerate": run_autogenerate,
         "findlimits": run_findlimits,
+        "calibrate": run_calibrate,
         "colortest": run_colortest,
         "checkupdates": run_checkupdates,
     }
@@ -1,2 +1,3 @@
+# the same as sol-a.py, but not a copy of it
 x = int(input())
 print(x * 3)
@@ -0,0 +1,178 @@
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+from test_utils import copy_fixture_tree, run_itool_json
+
+from input_tool.common import affinity, execution
+from input_tool.common.task_history import TaskHistory
+from input_tool.common.task_queue import TaskItem, TaskQueue, run_tasks
+
+pytestmark = pytest.mark.skipif(
+    not hasattr(os, "sched_setaffinity"), reason="CPU pinning needs Linux"
+)
+
+
+def _fake_topology(tmp_path: Path, siblings: dict[int, str]) -> Path:
+    for cpu, sibling_list in siblings.items():
+        topology = tmp_path / f"cpu{cpu}" / "topology"
+        topology.mkdir(parents=True)
+        (topology / "thread_siblings_list").write_text(sibling_list + "\n")
+    return tmp_path
+
+
+@pytest.mark.parametrize(
+    "text,cpus",
+    [
+        ("0", {0}),
+        ("0-3", {0, 1, 2, 3}),
+        ("0,4", {0, 4}),
+        ("0-1,8,10-11\n", {0, 1, 8, 10, 11}),
+    ],
+)
+def test_parse_cpu_list(text, cpus):
+    assert affinity.parse_cpu_list(text) == cpus
+
+
+def test_read_physical_cores_groups_smt_siblings(tmp_path, monkeypatch):
+    siblings = {0: "0,4", 1: "1,5", 2: "2-3", 3: "2-3", 4: "0,4", 5: "1,5"}
+    monkeypatch.setattr(affinity, "CPU_SYSFS", _fake_topology(tmp_path, siblings))
+
+    cores = affinity.read_physical_cores({0, 1, 2, 3, 4, 5})
+
+    assert sorted(cores) == [[0, 4], [1, 5], [2, 3]]
+
+
+def test_cpu_slots_use_one_cpu_per_core(tmp_path, monkeypatch):
+    siblings = {0: "0,2", 1: "1,3", 2: "0,2", 3: "1,3"}
+    monkeypatch.setattr(affinity, "CPU_SYSFS", _fake_topology(tmp_path, siblings))
+    monkeypatch.setattr(os, "sched_getaffinity", lambda _pid: {0, 1, 2, 3})
+    slots = affinity.CpuSlots()
+
+    slots.setup(threads=2)
+    with slots.acquire() as first, slots.acquire() as second:
+        held = {first.cpu, second.cpu}
+
+    assert slots.cpus == [1, 0]  # the core with CPU 0 is used last
+    assert held == {0, 1}
+
+
+def test_cpu_slots_leave_spare_cores_for_checkers(tmp_path, monkeypatch):
+    siblings = {0: "0,3", 1: "1,4", 2: "2,5", 3: "0,3", 4: "1,4", 5: "2,5"}
+    monkeypatch.setattr(affinity, "CPU_SYSFS", _fake_topology(tmp_path, siblings))
+    monkeypatch.setattr(os, "sched_getaffinity", lambda _pid: set(range(6)))
+    slots = affinity.CpuSlots()
+    assert slots.make_spare_isolate() is None
+
+    slots.setup(threads=2)
+
+    assert slots.cpus == [1, 2]
+    assert slots.spare == {0, 3}  # the core with CPU 0 is left for checkers
+    assert slots.make_spare_isolate() is not None
+
+
+def test_cpu_slots_wait_for_a_free_core():
+    slots = affinity.CpuSlots()
+    slots.enabled, slots.free = True, [7]
+    order = []
+
+    def worker() -> None:
+        with slots.acquire() as slot:
+            order.append(("second", slot.cpu))
+
+    with slots.acquire() as slot:
+        thread = threading.Thread(target=worker)
+        thread.start()
+        thread.join(0.2)
+        assert thread.is_alive()
+        order.append(("first", slot.cpu))
+    thread.join()
+
+    assert order == [("first", 7), ("second", 7)]
+
+
+def test_disabled_cpu_slots_yield_none():
+    with affinity.CpuSlots().acquire() as slot:
+        assert slot is None
+
+
+def test_cpu_slot_is_free_once_released():
+    slots = affinity.CpuSlots()
+    slots.enabled, slots.free = True, [7]
+    released = []
+    slots.listeners.append(lambda: released.append(1))
+
+    with slots.acquire() as slot:
+        slot.release()  # the process exited, the check doesn't need the core
+        assert slots.take() is not None
+        slots.free.append(7)
+    slot.release()
+
+    assert slots.free == [7]
+    assert released == [1]
+
+
+def test_run_tasks_starts_timed_tasks_only_with_a_free_core():
+    slots = affinity.CpuSlots()
+    slots.enabled, slots.free = True, [7]
+    lock = threading.Lock()
+    events, running, max_running = [], [0], [0]
+
+    def timed(name: str) -> None:
+        with slots.acquire() as slot:
+            with lock:
+                running[0] += 1
+                max_running[0] = max(max_running[0], running[0])
+                events.append((name, slot.cpu))
+            threading.Event().wait(0.3)
+            with lock:
+                running[0] -= 1
+
+    tasks = [
+        TaskItem("sol", "1", "a", lambda: timed("a"), timed=True),
+        TaskItem("sol", "2", "b", lambda: timed("b"), timed=True),
+        TaskItem("val", "1", "c", lambda: events.append(("c", None))),
+    ]
+    with ThreadPoolExecutor(2) as executor:
+        run_tasks(
+            TaskQueue(tasks, TaskHistory()),
+            executor,
+            2,
+            threading.Event(),
+            lambda: None,
+            cpu_slots=slots,
+        )
+
+    assert max_running[0] == 1
+    # the untimed task got the second worker instead of a timed one waiting
+    assert events == [("a", 7), ("c", None), ("b", 7)]
+    assert slots.free == [7] and not slots.listeners
+
+
+def test_run_native_pins_to_cpu(tmp_path):
+    cpu = min(os.sched_getaffinity(0))
+    slots = affinity.CpuSlots()
+    ifile, tfile = tmp_path / "1.a.in", tmp_path / "1.a.temp"
+    ifile.write_text("")
+    argv = [sys.executable, "-c", "import os; print(*os.sched_getaffinity(0))"]
+
+    result = execution.run_native(argv, ifile, tfile, isolate=slots.make_isolate(cpu))
+
+    assert result.returncode == 0
+    assert tfile.read_text().split() == [str(cpu)]
+
+
+def test_tester_pin_cpus_records_affinity_in_json(case_dir):
+    workdir = copy_fixture_tree("tester_execute", case_dir)
+
+    _result, data = run_itool_json(
+        ["t", "--execute", "cat", "-t", "0", "--pin-cpus"], cwd=workdir
+    )
+
+    assert data[0]["result"] == "OK"
+    cpus = [cpu for batch in data[0]["cpus"].values() for cpu in batch]
+    assert cpus
+    assert all(cpu in os.sched_getaffinity(0) for cpu in cpus)
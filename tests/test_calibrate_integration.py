@@ -0,0 +1,79 @@
+import json
+import os
+
+import pytest
+from test_utils import copy_fixture_tree, run_itool
+
+from input_tool.common import calibration
+from input_tool.input_calibrate import get_levels
+
+
+@pytest.fixture
+def config_home(tmp_path, monkeypatch):
+    config_home = tmp_path / "config"
+    monkeypatch.setenv("XDG_CONFIG_HOME", str(config_home))
+    return config_home
+
+
+def _profile(threads: int = 2) -> calibration.CalibrationProfile:
+    return calibration.CalibrationProfile(
+        cpu_count=os.cpu_count() or 1,
+        tolerance=0.1,
+        threads=threads,
+        slowdowns={1: {"cpu": 1.0, "memory": 1.0}, 2: {"cpu": 1.05, "memory": 1.2}},
+        created=0,
+    )
+
+
+@pytest.mark.parametrize(
+    "max_threads,levels",
+    [(1, [1]), (2, [1, 2]), (6, [1, 2, 4, 6]), (8, [1, 2, 4, 8])],
+)
+def test_get_levels(max_threads, levels):
+    assert get_levels(max_threads) == levels
+
+
+def test_profile_roundtrip(config_home):
+    path = calibration.save_profile(_profile())
+
+    profile = calibration.load_profile()
+
+    assert path == config_home / "input-tool" / calibration.PROFILE_FILENAME
+    assert profile == _profile()
+    assert profile.slowdown(1) == 1.0
+    assert profile.slowdown(2) == 1.2
+    assert profile.slowdown(5) == 1.2  # beyond the measured levels
+    assert calibration.get_default_threads(profile) == 2
+    assert "20%" in calibration.describe_inflation(profile, 2)
+
+
+def test_profile_from_other_machine_is_ignored(config_home):
+    path = calibration.save_profile(_profile())
+    data = json.loads(path.read_text())
+    data["cpu_count"] += 1
+    path.write_text(json.dumps(data))
+
+    assert calibration.load_profile() is None
+
+
+def test_calibrate_writes_profile(case_dir, config_home):
+    result = run_itool(
+        ["calibrate", "-j", "2", "--repeats", "1", "--tolerance", "100"], cwd=case_dir
+    )
+
+    data = json.loads((config_home / "input-tool" / "calibration.json").read_text())
+    assert data["threads"] == 2
+    assert set(data["slowdowns"]) == {"1", "2"}
+    assert set(data["slowdowns"]["1"]) == {"cpu", "memory"}
+    assert "saved to" in result.stdout
+
+
+def test_tester_uses_calibrated_threads(case_dir, config_home):
+    calibration.save_profile(_profile(threads=2))
+    workdir = copy_fixture_tree("tester_execute", case_dir)
+
+    result = run_itool(["t", "--execute", "cat", "-t", "0"], cwd=workdir, threads=None)
+
+    assert "running with 2 threads is expected to inflate the times by about 20%" in (
+        result.stdout
+    )
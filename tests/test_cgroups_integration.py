@@ -0,0 +1,124 @@
+import errno
+import os
+import sys
+from datetime import timedelta
+from pathlib import Path
+
+import pytest
+from test_utils import copy_fixture_tree, run_itool_json
+
+from input_tool.common import cgroups, execution
+
+
+@pytest.fixture
+def fake_cgroupfs(monkeypatch):
+    """Make plain directories behave like cgroupfs, which creates control files"""
+    original_mkdir = Path.mkdir
+
+    def mkdir(self, *args, **kwargs):
+        original_mkdir(self, *args, **kwargs)
+        if self.name.startswith("itool-"):
+            (self / "cgroup.procs").touch()
+
+    monkeypatch.setattr(Path, "mkdir", mkdir)
+
+
+def _fake_cgroup_root(tmp_path: Path, controllers: str = "cpu memory pids") -> Path:
+    root = tmp_path / "cgroup"
+    root.mkdir()
+    (root / "cgroup.controllers").write_text(controllers + "\n")
+    (root / "cgroup.subtree_control").write_text("")
+    return root
+
+
+def test_manager_setup_enables_controllers(tmp_path):
+    root = _fake_cgroup_root(tmp_path)
+
+    cgroups.CgroupManager(root).setup()
+
+    assert (root / "cgroup.subtree_control").read_text() == "+memory +pids"
+
+
+def test_manager_setup_reuses_one_supervisor_cgroup(tmp_path, monkeypatch):
+    root = _fake_cgroup_root(tmp_path)
+    original_write_text = Path.write_text
+    busy = []
+
+    def write_text(self, data, *args, **kwargs):
+        # the root still has processes the first time we enable the controllers
+        if self.name == "cgroup.subtree_control" and not busy:
+            busy.append(self)
+            raise OSError(errno.EBUSY, "busy")
+        return original_write_text(self, data, *args, **kwargs)
+
+    monkeypatch.setattr(Path, "write_text", write_text)
+    cgroups.CgroupManager(root).setup()
+    busy.clear()
+    cgroups.CgroupManager(root).setup()
+
+    supervisors = [p.name for p in root.iterdir() if p.is_dir()]
+    assert supervisors == [cgroups.SUPERVISOR_NAME]
+    procs = (root / cgroups.SUPERVISOR_NAME / "cgroup.procs").read_text()
+    assert procs == str(os.getpid())
+    assert (root / "cgroup.subtree_control").read_text() == "+memory +pids"
+
+
+def test_manager_setup_requires_delegated_controllers(tmp_path):
+    root = _fake_cgroup_root(tmp_path, "cpu")
+
+    with pytest.raises(OSError):
+        cgroups.CgroupManager(root).setup()
+
+
+def test_run_cgroup_sets_limits_and_reads_usage(tmp_path, fake_cgroupfs):
+    root = _fake_cgroup_root(tmp_path)
+    manager = cgroups.CgroupManager(root)
+
+    cgroup = manager.create(memorylimit=64)
+    (cgroup.path / "cpu.stat").write_text(
+        "usage_usec 3500\nuser_usec 2000\nsystem_usec 1500\n"
+    )
+    (cgroup.path / "memory.peak").write_text("1048576\n")
+    (cgroup.path / "memory.events").write_text("oom 1\noom_kill 1\n")
+    usage = cgroup.usage()
+
+    assert (cgroup.path / "memory.max").read_text() == str(64 * 1024 * 1024)
+    assert (cgroup.path / "pids.max").read_text() == str(cgroups.PIDS_MAX)
+    assert usage.user_time == timedelta(microseconds=2000)
+    assert usage.system_time == timedelta(microseconds=1500)
+    assert usage.peak_memory == 1048576
+    assert usage.oom_killed
+    assert manager.create(0).path != cgroup.path
+
+
+def test_run_native_in_cgroup_joins_and_reports_usage(tmp_path, fake_cgroupfs):
+    root = _fake_cgroup_root(tmp_path)
+    cgroup = cgroups.CgroupManager(root).create(memorylimit=0)
+    (cgroup.path / "cpu.stat").write_text("user_usec 7000\nsystem_usec 0\n")
+    (cgroup.path / "memory.peak").write_text("4096\n")
+    ifile = tmp_path / "1.a.in"
+    ifile.write_text("")
+    tfile = tmp_path / "1.a.temp"
+
+    result = execution.run_native(
+        [sys.executable, "-c", "print('hi')"], ifile, tfile, cgroup=cgroup
+    )
+
+    assert result.returncode == 0
+    assert tfile.read_text() == "hi\n"
+    assert (cgroup.path / "cgroup.procs").read_text() == "0"
+    assert result.user_time == timedelta(microseconds=7000)
+    assert result.peak_memory == 4096
+    assert not result.oom_killed
+
+
+def test_tester_cgroup_backend_falls_back_when_unavailable(case_dir):
+    workdir = copy_fixture_tree("tester_execute", case_dir)
+
+    result, data = run_itool_json(
+        ["t", "--execute", "cat", "-t", "0", "--backend", "cgroup"], cwd=workdir
+    )
+
+    assert data[0]["result"] == "OK"
+    if cgroups.get_manager() is None:
+        assert "using the native backend instead" in result.stdout
@@ -1,5 +1,10 @@
+import time
+
+import pytest
 from test_utils import copy_fixture_tree, run_itool, run_itool_json
 
+from input_tool.common import compare
+
 
 def test_explicit_diff_checker_matches_expected_wa(case_dir):
     workdir = copy_fixture_tree("sidebyside", case_dir)
@@ -14,6 +19,96 @@ def test_explicit_diff_checker_matches_expected_wa(case_dir):
     assert by_name == {"sol-a.py": "OK", "sol-b.py": "WA"}
 
 
+@pytest.mark.parametrize(
+    "ours,theirs,equal",
+    [
+        (b"1 2\n3\n", b"1 2\n3\n", {"exact", "cr", "ws"}),
+        (b"1 2\n3\n", b"1 2\n4\n", set()),
+        (b"1 2\n3\n", b"1 2\r\n3\r\n", {"cr", "ws"}),
+        (b"1 2\n3\n", b"1  2 \n\n3", {"ws"}),
+        (b"1 2\n3\n", b"1 2 3\n", set()),
+        (b"1 2\n3\n", b"1 2\n3\n4\n", set()),
+    ],
+)
+def test_compare_modes(tmp_path, monkeypatch, ours, theirs, equal):
+    monkeypatch.setattr(compare, "CHUNK_SIZE", 2)
+    ofile, tfile = tmp_path / "a.out", tmp_path / "a.temp"
+    ofile.write_bytes(ours)
+    tfile.write_bytes(theirs)
+
+    for mode in compare.COMPARE_MODES:
+        assert compare.files_equal(ofile, tfile, mode) == (mode in equal), mode
+
+
+@pytest.mark.parametrize(
+    "spec,ours,theirs,mismatch",
+    [
+        ("", b"1 abc\n2.5\n", b"1\nabc   2.5", None),
+        ("", b"1 abc 2.5", b"1 ABC 2.5", "Token 2: expected abc, got ABC"),
+        ("icase", b"1 abc 2.5", b"1 ABC 2.5", None),
+        ("", b"0.5 1", b"0.5000001 1", "Token 1: expected 0.5, got 0.5000001"),
+        ("eps=1e-6", b"0.5 1", b"0.5000001 1", None),
+        ("abs=1e-3", b"1000 x", b"1000.5 x", "Token 1: expected 1000, got 1000.5"),
+        ("rel=1e-3", b"1000 x", b"1000.5 x", None),
+        ("eps=1", b"1 x", b"1 y", "Token 2: expected x, got y"),
+        ("", b"1 2 3", b"1 2", "Output ended at token 3"),
+        ("", b"1 2", b"1 2 3", "Output has extra tokens from token 3"),
+    ],
+)
+def test_token_checker(tmp_path, monkeypatch, spec, ours, theirs, mismatch):
+    monkeypatch.setattr(compare, "CHUNK_SIZE", 3)
+    ofile, tfile = tmp_path / "a.out", tmp_path / "a.temp"
+    ofile.write_bytes(ours)
+    tfile.write_bytes(theirs)
+
+    options = compare.TokenOptions.parse(spec)
+    assert compare.find_token_mismatch(ofile, tfile, options) == mismatch
+
+
+def test_token_checker_rejects_unknown_option():
+    with pytest.raises(ValueError):
+        compare.TokenOptions.parse("eps=1e-6,fuzzy")
+
+
+def test_tokens_checker_allows_approximate_float_comparisons(case_dir):
+    workdir = copy_fixture_tree("checker_approx", case_dir)
+    (workdir / "check.py").unlink()
+
+    _result, data = run_itool_json(
+        ["t", "sol-ref.py", "sol-close.py", "sol-far.py"]
+        + ["-d", "tokens:eps=1e-6", "-F", "-t", "0"],
+        cwd=workdir,
+    )
+    by_name = {row["name"]: row["result"] for row in data}
+
+    assert by_name == {"sol-ref.py": "OK", "sol-close.py": "OK", "sol-far.py": "WA"}
+
+
+def test_diff_ws_checker_ignores_whitespace(case_dir):
+    workdir = copy_fixture_tree("sidebyside", case_dir)
+    run_itool(["g", ".", "-g", "cat"], cwd=workdir)
+    (workdir / "sol-c.py").write_text(
+        "h, w = map(int, input().split())\n"
+        "for y in range(h):\n"
+        "    print(' '.join(str(y * w + x + 1) for x in range(w)), ' ')\n"
+        "    print()\n"
+    )
+
+    _result, data = run_itool_json(
+        ["t", "sol-a.py", "sol-c.py", "-d", "diff:ws", "-F", "--no-sort"],
+        cwd=workdir,
+    )
+    by_name = {row["name"]: row["result"] for row in data}
+    assert by_name == {"sol-a.py": "OK", "sol-c.py": "OK"}
+
+    _result, data = run_itool_json(
+        ["t", "sol-a.py", "sol-c.py", "-d", "diff", "-F", "--no-sort"],
+        cwd=workdir,
+    )
+    by_name = {row["name"]: row["result"] for row in data}
+    assert by_name == {"sol-a.py": "OK", "sol-c.py": "WA"}
+
+
 def test_check_checker_allows_approximate_float_comparisons(case_dir):
     workdir = copy_fixture_tree("checker_approx", case_dir)
 
@@ -40,3 +135,144 @@ def test_check_checker_nonstandard_exit_code_reports_warning_and_marks_wa(case_d
     by_name = {row["name"]: row["result"] for row in data}
     assert by_name == {"sol-ref.py": "WA", "sol-alt.py": "WA"}
     assert "Checker exited with status" in result.stdout
+
+
+def test_checker_timeout_kills_hung_checker_and_marks_wa(case_dir):
+    workdir = copy_fixture_tree("checker_badexit", case_dir)
+    (workdir / "check.py").write_text("import time\ntime.sleep(60)\n")
+
+    start = time.monotonic()
+    result, data = run_itool_json(
+        ["t", "sol-ref.py", "sol-alt.py", "-d", "check.py", "-F", "-t", "0"]
+        + ["--checker-timeout", "1", "--checker-threads", "2"],
+        cwd=workdir,
+    )
+
+    assert time.monotonic() - start < 30
+    assert {row["name"]: row["result"] for row in data} == {
+        "sol-ref.py": "WA",
+        "sol-alt.py": "WA",
+    }
+    assert "Checker timed out after 1.0s" in result.stdout
+
+
+def test_checker_time_is_reported_separately(case_dir):
+    workdir = copy_fixture_tree("checker_approx", case_dir)
+
+    result, data = run_itool_json(
+        ["t", "sol-ref.py", "sol-close.py", "-d", "check.py", "-F", "-t", "0"],
+        cwd=workdir,
+    )
+
+    for row in data:
+        assert set(row["checktimes"]) == set(row["times"])
+        assert all(
+            len(row["checktimes"][b]) == len(row["times"][b]) for b in row["times"]
+        )
+    assert "Checker took" in result.stdout
+
+
+PERSISTENT_CHECKER = """
+import math
+import os
+import sys
+
+with open("starts.txt", "a") as f:
+    f.write(f"{os.getpid()}\\n")
+for line in sys.stdin:
+    inp, out_file, test_file = line.split()
+    if "CRASH" in inp:
+        raise SystemExit(3)
+    with open(out_file) as f:
+        expected = float(f.read())
+    with open(test_file) as f:
+        actual = float(f.read())
+    ok = math.isclose(expected, actual, rel_tol=0.0, abs_tol=1e-6)
+    print(0 if ok else 1, "checked", test_file, flush=True)
+"""
+
+
+def test_persistent_checker_is_started_once(case_dir):
+    workdir = copy_fixture_tree("checker_approx", case_dir)
+    (workdir / "check.py").write_text(PERSISTENT_CHECKER.replace("CRASH", "-"))
+
+    _result, data = run_itool_json(
+        ["t", "sol-ref.py", "sol-close.py", "sol-far.py", "-d", "check.py"]
+        + ["-F", "-t", "0", "--persistent-checker", "--checker-threads", "1"],
+        cwd=workdir,
+    )
+    by_name = {row["name"]: row["result"] for row in data}
+
+    assert by_name == {"sol-ref.py": "OK", "sol-close.py": "OK", "sol-far.py": "WA"}
+    assert len((workdir / "starts.txt").read_text().split()) == 1
+
+
+def test_persistent_checker_is_restarted_after_crash(case_dir):
+    workdir = copy_fixture_tree("checker_approx", case_dir)
+    (workdir / "check.py").write_text(PERSISTENT_CHECKER.replace("CRASH", "2.a"))
+
+    result, data = run_itool_json(
+        ["t", "sol-ref.py", "sol-close.py", "-d", "check.py"]
+        + ["-F", "-t", "0", "--persistent-checker", "--checker-threads", "1"],
+        cwd=workdir,
+    )
+
+    assert {row["name"]: row["result"] for row in data} == {
+        "sol-ref.py": "WA",
+        "sol-close.py": "WA",
+    }
+    assert all(row["batchresults"]["1"] == "OK" for row in data)
+    assert "Persistent checker exited with status" in result.stdout
+    assert len((workdir / "starts.txt").read_text().split()) >= 2
+
+
+def test_checker_verdicts_are_cached(case_dir):
+    workdir = copy_fixture_tree("checker_approx", case_dir)
+    # a different program with the same outputs, exact copies are tested once
+    reference = (workdir / "sol-ref.py").read_text()
+    (workdir / "sol-copy.py").write_text("# copy\n" + reference)
+    checker = (workdir / "check.py").read_text()
+    (workdir / "check.py").write_text(
+        'open("calls.txt", "a").write("x\\n")\n' + checker
+    )
+    args = ["t", "sol-ref.py", "sol-copy.py", "sol-close.py", "-d", "check.py"]
+    args += ["-F", "-t", "0", "--checker-threads", "1"]
+
+    def count_calls():
+        calls = workdir / "calls.txt"
+        count = len(calls.read_text().split()) if calls.exists() else 0
+        calls.unlink(missing_ok=True)
+        return count
+
+    _result, data = run_itool_json(args, cwd=workdir)
+    assert {row["name"]: row["result"] for row in data} == {
+        "sol-ref.py": "OK",
+        "sol-copy.py": "OK",
+        "sol-close.py": "OK",
+    }
+    assert count_calls() == 4  # sol-copy.py has the same outputs as sol-ref.py
+
+    result, data = run_itool_json(args, cwd=workdir)
+    assert all(row["result"] == "OK" for row in data)
+    assert count_calls() == 0
+    assert "Checker verdicts of 6 outputs reused from cache." in result.stdout
+    # kept in the user cache, not in the test data
+    assert not (workdir / "test" / ".checker_cache.json").exists()
+    assert list((case_dir / ".cache" / "input-tool" / "verdicts").glob("*.json"))
+
+    run_itool_json(args + ["--no-checker-cache"], cwd=workdir)
+    assert count_calls() == 6
+
+
+def test_forkserver_runs_python_checker_from_warm_interpreter(case_dir):
+    workdir = copy_fixture_tree("checker_approx", case_dir)
+
+    result, data = run_itool_json(
+        ["t", "sol-ref.py", "sol-close.py", "sol-far.py", "-d", "check.py"]
+        + ["-F", "-t", "0", "--no-checker-cache", "--forkserver"],
+        cwd=workdir,
+    )
+    by_name = {row["name"]: row["result"] for row in data}
+
+    assert "Forking the runs of check.py" in result.stdout
+    assert by_name == {"sol-ref.py": "OK", "sol-close.py": "OK", "sol-far.py": "WA"}
@@ -19,6 +19,7 @@ from test_utils import run_itool
         ["autogenerate", "--help-all"],
         ["colortest", "--help"],
         ["checkupdates", "--help"],
+        ["calibrate", "--help"],
     ],
 )
 def test_cli_flags_exit_zero(case_dir, args):
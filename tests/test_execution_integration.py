@@ -0,0 +1,561 @@
+import io
+import resource
+import signal
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock
+
+import pytest
+from test_utils import copy_fixture_tree, run_itool, run_itool_json
+
+from input_tool.common import execution
+from input_tool.common.commands import Config
+from input_tool.common.messages import Logger, Status
+from input_tool.common.os_config import find_os_config
+from input_tool.common.programs.solution import Solution
+from input_tool.common.runtime_history import RuntimeHistory
+from input_tool.common.task_history import TaskHistory
+from input_tool.common.task_queue import Dependency, TaskItem, TaskQueue, run_tasks
+
+
+def _python_argv(code: str) -> list[str]:
+    return [sys.executable, "-c", code]
+
+
+def _configure(monkeypatch, backend: str = "native") -> None:
+    monkeypatch.setattr(Config, "os_config", find_os_config(), raising=False)
+    for key, value in (
+        ("quiet", True),
+        ("compile", True),
+        ("execute", True),
+        ("memorylimit", 0),
+        ("rus_time", False),
+        ("backend", backend),
+    ):
+        monkeypatch.setattr(Config, key, value, raising=False)
+
+
+def _io_files(tmp_path: Path, content: str = "") -> tuple[Path, Path]:
+    ifile = tmp_path / "1.a.in"
+    ifile.write_text(content)
+    return ifile, tmp_path / "1.a.temp"
+
+
+@pytest.mark.parametrize(
+    "cmd,argv",
+    [
+        ("./sol", ["./sol"]),
+        ("python3 sol.py", ["python3", "sol.py"]),
+        ("java -Xss256m -cp dir sol", ["java", "-Xss256m", "-cp", "dir", "sol"]),
+        ("./val 00 sample a in ", ["./val", "00", "sample", "a", "in"]),
+        ("'./my sol' arg", ["./my sol", "arg"]),
+    ],
+)
+def test_split_command_plain_commands(cmd, argv):
+    assert execution.split_command(cmd) == argv
+
+
+@pytest.mark.parametrize(
+    "cmd",
+    [
+        "./sol | tee out",
+        "./sol > out",
+        "echo $HOME",
+        "./a; ./b",
+        "./a && ./b",
+        "echo `date`",
+        "X=1 ./sol",
+        "'unterminated",
+        "",
+    ],
+)
+def test_split_command_needs_shell(cmd):
+    assert execution.split_command(cmd) is None
+
+
+def test_run_native_redirects_stdin_and_stdout(tmp_path):
+    ifile, tfile = _io_files(tmp_path, "21\n")
+    argv = _python_argv("print(int(input()) * 2)")
+
+    result = execution.run_native(argv, ifile, tfile)
+
+    assert result.returncode == 0
+    assert not result.timed_out
+    assert tfile.read_text() == "42\n"
+    assert result.wall_time > timedelta(0)
+    assert len(result.get_times(False)) == 1
+    assert len(result.get_times(True)) == 4
+
+
+def test_run_native_timeout_reports_124(tmp_path):
+    ifile, tfile = _io_files(tmp_path)
+    argv = _python_argv("import time; time.sleep(10)")
+
+    result = execution.run_native(argv, ifile, tfile, timedelta(seconds=0.3))
+
+    assert result.returncode == execution.EXIT_TIMEOUT
+    assert result.timed_out
+    assert result.wall_time < timedelta(seconds=5)
+
+
+def test_run_native_missing_binary_reports_127(tmp_path):
+    ifile, tfile = _io_files(tmp_path)
+
+    result = execution.run_native(["./definitely_missing_binary"], ifile, tfile)
+
+    assert result.returncode == execution.EXIT_NOT_FOUND
+    assert b"definitely_missing_binary" in result.stderr
+
+
+def test_run_native_signal_reports_128_plus_signal(tmp_path):
+    ifile, tfile = _io_files(tmp_path)
+    argv = _python_argv("import os, signal; os.kill(os.getpid(), signal.SIGSEGV)")
+
+    result = execution.run_native(argv, ifile, tfile)
+
+    assert result.returncode == 128 + signal.SIGSEGV
+    assert not result.timed_out
+
+
+def test_run_native_applies_memory_limit(tmp_path):
+    ifile, tfile = _io_files(tmp_path)
+    argv = _python_argv(
+        "import resource; print(*resource.getrlimit(resource.RLIMIT_AS))"
+    )
+
+    result = execution.run_native(argv, ifile, tfile, memorylimit=256)
+
+    assert result.returncode == 0
+    limit = 256 * 1024 * 1024
+    assert tfile.read_text().split() == [str(limit), str(limit)]
+
+
+def test_supervisor_watches_parallel_runs(tmp_path):
+    if execution.get_supervisor() is None:
+        pytest.skip("pidfd and epoll are not available")
+    ifile, _tfile = _io_files(tmp_path)
+    sleeps = [0.0, 60.0] * 8
+
+    def run(i: int) -> execution.ExecutionResult:
+        argv = _python_argv(f"import time; time.sleep({sleeps[i]}); print({i})")
+        tfile = tmp_path / f"{i}.temp"
+        return execution.run_native(argv, ifile, tfile, timedelta(seconds=3))
+
+    with ThreadPoolExecutor(len(sleeps)) as executor:
+        results = list(executor.map(run, range(len(sleeps))))
+
+    assert [r.timed_out for r in results] == [bool(s) for s in sleeps]
+    assert all(r.wall_time < timedelta(seconds=30) for r in results)
+    assert (tmp_path / "0.temp").read_text() == "0\n"
+
+
+def test_run_tasks_keeps_slots_busy_and_calls_callbacks():
+    num_threads = 3
+    lock = threading.Lock()
+    running, max_running, done = [0], [0], []
+
+    def func() -> None:
+        with lock:
+            running[0] += 1
+            max_running[0] = max(max_running[0], running[0])
+        threading.Event().wait(0.05)
+        with lock:
+            running[0] -= 1
+
+    tasks = [
+        TaskItem("sol", "1", str(i), func, [lambda _, i=i: done.append(i)])
+        for i in range(10)
+    ]
+    wakeups = []
+    with ThreadPoolExecutor(num_threads) as executor:
+        run_tasks(
+            TaskQueue(tasks, TaskHistory()),
+            executor,
+            num_threads,
+            threading.Event(),
+            lambda: wakeups.append(1),
+        )
+
+    assert sorted(done) == list(range(10))
+    assert max_running[0] == num_threads
+    assert wakeups
+
+
+def test_run_tasks_abort_drops_queued_tasks():
+    abort = threading.Event()
+    ran, callbacks = [], []
+    tasks = [
+        TaskItem("sol", "1", str(i), lambda i=i: (ran.append(i), abort.set()))
+        for i in range(5)
+    ]
+    for i, task in enumerate(tasks):
+        task.callbacks.append(lambda _, i=i: callbacks.append(i))
+
+    with ThreadPoolExecutor(1) as executor:
+        run_tasks(
+            TaskQueue(tasks, TaskHistory()),
+            executor,
+            1,
+            threading.Event(),
+            lambda: None,
+            abort=abort,
+        )
+
+    assert ran == [0]
+    assert sorted(callbacks) == list(range(5))
+
+
+def test_task_queue_prefers_batches_that_are_not_running():
+    history = TaskHistory()
+    history.start("sol", "1", "running")
+    tasks = [
+        TaskItem("sol", batch, task, lambda: None)
+        for batch, task in [("1", "a"), ("1", "b"), ("2", "c"), ("3", "d")]
+    ]
+    queue = TaskQueue(tasks, history)
+
+    popped = [queue.pop().task for _ in range(2)]
+    history.end("sol", "1", "running")
+    popped += [queue.pop().task for _ in range(2)]
+
+    assert popped == ["c", "d", "a", "b"]
+    assert queue.pop() is None and len(queue) == 0
+
+
+def test_task_queue_falls_back_on_first_blocked_task():
+    history = TaskHistory()
+    history.start("sol", "2", "running")
+    history.start("sol", "1", "running")
+    tasks = [TaskItem("sol", batch, batch, lambda: None) for batch in ("2", "1", "2")]
+    queue = TaskQueue(tasks, history)
+
+    assert [queue.pop().task for _ in range(3)] == ["2", "1", "2"]
+
+
+def test_task_queue_pop_scales_with_many_tasks():
+    history = TaskHistory()
+    for batch in range(4):
+        history.start("sol", str(batch), "running")
+    # every pop has to skip the tasks of the running batches at the front
+    tasks = [
+        TaskItem("sol", str(i // 10_000), str(i), lambda: None) for i in range(100_000)
+    ]
+    queue = TaskQueue(tasks, history)
+    checks = []
+    is_running = history.is_running
+    history.is_running = lambda *key: checks.append(key) or is_running(*key)
+
+    while queue.pop() is not None:
+        pass
+
+    # only the heads of the blocked batches are checked, not all their tasks
+    assert len(checks) <= 5 * len(tasks)
+
+
+def test_task_queue_pops_highest_priority_first():
+    history = TaskHistory()
+    history.start("sol", "2", "running")
+    tasks = [
+        TaskItem("sol", batch, task, lambda: None, priority=priority)
+        for batch, task, priority in [
+            ("1", "a", 1),
+            ("1", "b", 5),
+            ("2", "c", 9),
+            ("3", "d", 5),
+            ("3", "e", 0),
+        ]
+    ]
+    queue = TaskQueue(tasks, history)
+
+    assert [queue.pop().task for _ in range(5)] == ["b", "d", "a", "e", "c"]
+
+
+def test_task_queue_push_keeps_urgent_tasks_first():
+    tasks = [TaskItem("sol", "1", task, lambda: None, priority=5) for task in "ab"]
+    queue = TaskQueue(tasks, TaskHistory())
+
+    queue.push(TaskItem("gen", "1", "c", lambda: None, urgent=True))
+    queue.push(TaskItem("sol", "1", "d", lambda: None, priority=9))
+    queue.push(TaskItem("sol", "1", "e", lambda: None))
+
+    assert len(queue) == 5
+    assert [queue.pop().task for _ in range(5)] == ["c", "d", "a", "b", "e"]
+    assert queue.pop() is None
+
+
+def test_dependency_calls_waiting_callbacks_once_set():
+    dependency, calls = Dependency(), []
+
+    dependency.then(lambda: calls.append("early"))
+    assert calls == [] and not dependency.wait(0)
+    dependency.set()
+    dependency.then(lambda: calls.append("late"))
+
+    assert calls == ["early", "late"] and dependency.is_set()
+
+
+def test_dependency_all_of_is_set_once_all_are_set():
+    first, second = Dependency(), Dependency()
+    combined = Dependency.all_of(first, second)
+
+    first.set()
+    assert not combined.is_set()
+    second.set()
+
+    assert combined.is_set() and Dependency.all_of().is_set()
+
+
+def test_run_tasks_tests_prepared_programs_while_others_compile():
+    ready_a, ready_b, tested_a = Dependency(), Dependency(), threading.Event()
+    log = []
+
+    def prepare_b() -> None:
+        # finishes only after the tests of the other program have run
+        log.append(f"b waited {tested_a.wait(5)}")
+        ready_b.set()
+
+    tasks = [
+        TaskItem("a", "", "prepare", ready_a.set, urgent=True),
+        TaskItem("b", "", "prepare", prepare_b, urgent=True),
+        TaskItem(
+            "a", "1", "x", lambda: log.append("a") or tested_a.set(), after=ready_a
+        ),
+        TaskItem("b", "1", "x", lambda: log.append("b"), after=ready_b),
+    ]
+    with ThreadPoolExecutor(2) as executor:
+        run_tasks(
+            TaskQueue(tasks, TaskHistory()),
+            executor,
+            2,
+            threading.Event(),
+            lambda: None,
+        )
+
+    assert log == ["a", "b waited True", "b"]
+
+
+def test_run_tasks_follow_up_waits_without_holding_a_worker():
+    output_ready, log = Dependency(), []
+
+    def check() -> None:
+        log.append("check")
+
+    def solution() -> TaskItem:
+        log.append("solution")
+        return TaskItem("diff", "1", "a", check, urgent=True, after=output_ready)
+
+    tasks = [
+        TaskItem("sol", "1", "a", solution, [lambda _: log.append("finalize")]),
+        TaskItem("gen", "1", "a", lambda: log.append("generator")),
+    ]
+    tasks[1].callbacks.append(lambda _: output_ready.set())
+    done = []
+    with ThreadPoolExecutor(1) as executor:
+        run_tasks(
+            TaskQueue(tasks, TaskHistory()),
+            executor,
+            1,
+            threading.Event(),
+            lambda: None,
+            done.append,
+        )
+
+    # with a single worker, waiting for the output inside a task would deadlock
+    assert log == ["solution", "generator", "check", "finalize"]
+    assert len(done) == 2
+
+
+def test_runtime_history_predicts_from_times_and_sizes(tmp_path):
+    small, big, new = (tmp_path / f"{n}.a.in" for n in ("1", "2", "3"))
+    small.write_text("x" * 10)
+    big.write_text("x" * 1000)
+    new.write_text("x" * 100)
+    history = RuntimeHistory()
+    assert history.predict("sol", big) > history.predict("sol", small)
+
+    history.record("sol", small, 0.5)
+    history.record("sol", big, 2.0)
+    history.record("brute", small, 10.0)
+    path = tmp_path / "history.json"
+    history.save(path)
+    loaded = RuntimeHistory()
+    loaded.load(path)
+
+    assert loaded.times == history.times
+    assert loaded.predict("sol", small) == 0.5
+    assert loaded.predict("sol", new) == pytest.approx(2.5 / 1010 * 100)
+    assert loaded.predict("other", new) == pytest.approx(12.5 / 1020 * 100)
+
+
+def test_task_history_tracks_running_batches():
+    history = TaskHistory()
+    history.start("sol", "1", "a")
+    history.start("sol", "1", "b")
+    history.start("sol", "2", "c")
+    set_kill, was_killed, kill_batch = history.get_callbacks("sol", "1", "a")
+    kill = mock.Mock()
+    set_kill(kill)
+    other = mock.Mock()
+    history.get_callbacks("sol", "2", "c")[0](other)
+
+    history.end("sol", "1", "b")
+    kill_batch()
+
+    assert history.is_running("sol", "1") and history.is_running("sol", "2")
+    assert was_killed() and kill.called and not other.called
+    history.end("sol", "1", "a")
+    assert not history.is_running("sol", "1")
+    assert history.get("sol", "1", "a").kill is None
+
+
+def test_task_history_kill_reaches_children_of_native_run(tmp_path):
+    ifile, tfile = _io_files(tmp_path)
+    pidfile = tmp_path / "child.pid"
+    argv = ["sh", "-c", f"sleep 30 & echo $! > {pidfile}; wait"]
+    history = TaskHistory()
+    history.start("sol", "1", "a")
+    set_kill, _was_killed, kill_batch = history.get_callbacks("sol", "1", "a")
+
+    with ThreadPoolExecutor(1) as executor:
+        future = executor.submit(
+            execution.run_native, argv, ifile, tfile, cb_set_kill=set_kill
+        )
+        for _ in range(500):
+            if pidfile.exists() and pidfile.read_text().strip():
+                break
+            time.sleep(0.01)
+        kill_batch()
+        result = future.result(timeout=5)
+
+    assert result.returncode == 128 + signal.SIGKILL
+    child = int(pidfile.read_text())
+    for _ in range(100):
+        status = Path(f"/proc/{child}/status")
+        if not status.exists() or "State:\tZ" in status.read_text():
+            break
+        time.sleep(0.01)
+    else:
+        pytest.fail("the child of the killed program is still running")
+
+
+def test_run_native_reports_peak_memory(tmp_path):
+    ifile, tfile = _io_files(tmp_path)
+    # above the memory of this process, which the child inherits at the fork
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * execution.MAXRSS_UNIT
+    size = own + 64 * 1024 * 1024
+    argv = _python_argv(
+        f"data = bytearray({size}); data[::4096] = b'x' * len(data[::4096])"
+    )
+
+    result = execution.run_native(argv, ifile, tfile)
+
+    assert result.returncode == 0
+    assert result.peak_memory is not None
+    assert size <= result.peak_memory <= size + 64 * 1024 * 1024
+
+
+def test_run_native_does_not_report_memory_of_tester(tmp_path):
+    ifile, tfile = _io_files(tmp_path)
+    # the tester's own memory must not show up as the peak of a tiny program
+    ballast = bytearray(64 * 1024 * 1024)
+    ballast[::4096] = b"x" * len(ballast[::4096])
+
+    result = execution.run_native(["true"], ifile, tfile)
+
+    assert result.returncode == 0
+    assert result.peak_memory is None or result.peak_memory < 32 * 1024 * 1024
+    del ballast
+
+
+@pytest.mark.parametrize(
+    "stderr,peak_memory,oom_killed,expected",
+    [
+        (b"", None, True, True),
+        (b"", 95 * 1024 * 1024, False, True),
+        (b"", 10 * 1024 * 1024, False, False),
+        (b"MemoryError\n", 10 * 1024 * 1024, False, True),
+        (b"terminate called after throwing 'std::bad_alloc'", None, False, True),
+        (b"IndexError\n", None, False, False),
+    ],
+)
+def test_is_memory_exceeded(monkeypatch, stderr, peak_memory, oom_killed, expected):
+    monkeypatch.setattr(Config, "memorylimit", 100, raising=False)
+
+    assert Solution.is_memory_exceeded(stderr, peak_memory, oom_killed) == expected
+
+
+def test_get_times_parses_peak_memory_from_timefile(tmp_path, monkeypatch):
+    _configure(monkeypatch)
+    timefile = tmp_path / "timefile"
+    timefile.write_text("1000000000\n0.50 0.40 0.05 2048\n1500000000\n")
+
+    run_times, peak_memory = Solution("cat").get_times(timefile)
+
+    assert run_times is not None
+    assert [t.total_seconds() for t in run_times] == [0.5, 0.5, 0.4, 0.05]
+    assert peak_memory == 2048 * 1024
+
+
+def test_run_native_large_stderr_does_not_block(tmp_path):
+    ifile, tfile = _io_files(tmp_path)
+    argv = _python_argv("import sys; sys.stderr.write('x' * 200_000)")
+
+    result = execution.run_native(argv, ifile, tfile, timedelta(seconds=2))
+
+    assert result.returncode == 0
+    assert not result.timed_out
+    assert len(result.stderr) == 200_000
+
+
+@pytest.mark.parametrize("backend,uses_shell", [("shell", True), ("native", False)])
+def test_backend_selects_execution_path(tmp_path, monkeypatch, backend, uses_shell):
+    _configure(monkeypatch, backend)
+    ifile, tfile = _io_files(tmp_path, "5\n")
+    sol = Solution("cat")
+    sol.ready.set()
+
+    shell_calls = []
+    original_get_exec_cmd = sol.get_exec_cmd
+
+    def get_exec_cmd(*args, **kwargs):
+        shell_calls.append(args)
+        return original_get_exec_cmd(*args, **kwargs)
+
+    monkeypatch.setattr(sol, "get_exec_cmd", get_exec_cmd)
+    callbacks = (lambda _: None, lambda: False, lambda: None)
+    logger = Logger(io.StringIO())
+
+    run_times, _peak_memory, status = sol._run(
+        ifile, tfile, tfile, None, True, logger, callbacks
+    )
+
+    assert status == Status.ok
+    assert run_times
+    assert tfile.read_text() == "5\n"
+    assert bool(shell_calls) == uses_shell
+
+
+def test_tester_shell_backend_matches_native(case_dir):
+    workdir = copy_fixture_tree("tester_execute", case_dir)
+
+    _result, native = run_itool_json(["t", "--execute", "cat", "-t", "0"], cwd=workdir)
+    _result, shell = run_itool_json(
+        ["t", "--execute", "cat", "-t", "0", "--backend", "shell"],
+        cwd=workdir,
+        json_path="shell.json",
+    )
+
+    assert native[0]["result"] == shell[0]["result"] == "OK"
+
+
+def test_tester_rejects_unknown_backend(case_dir):
+    workdir = copy_fixture_tree("tester_execute", case_dir)
+
+    result = run_itool(["t", "cat", "--backend", "magic"], cwd=workdir, check=False)
+
+    assert result.returncode != 0
+    assert "invalid choice" in result.stdout
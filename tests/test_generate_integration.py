@@ -165,3 +165,20 @@ def test_generate_recompiles_when_source_changes_without_explicit_extension(case
 
     run_itool(["g", "."], cwd=workdir)
     assert (workdir / "test" / "1.in").read_text() == "6\n"
+
+
+def test_generate_forkserver_matches_fresh_runs(case_dir):
+    workdir = copy_fixture_tree("generate_py", case_dir)
+
+    run_itool(["g", ".", "-g", "gen.py"], cwd=workdir)
+    fresh = {
+        n: (workdir / "test" / n).read_text() for n in get_input_files(workdir / "test")
+    }
+    result = run_itool(["g", ".", "-g", "gen.py", "--forkserver"], cwd=workdir)
+    forked = {
+        n: (workdir / "test" / n).read_text() for n in get_input_files(workdir / "test")
+    }
+
+    assert "Forking the runs of gen.py" in result.stdout
+    assert forked == fresh
+    assert fresh["1.in"] == "4\n"
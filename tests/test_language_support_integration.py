@@ -1,9 +1,13 @@
+import os
 import shutil
 import warnings
 
 import pytest
 from test_utils import copy_fixture_tree, run_itool, run_itool_json
 
+from input_tool.common.java_cds import RUNS, get_archive
+from input_tool.common.types import Directory, Path, ShellCommand
+
 
 def _language_programs_and_missing() -> tuple[list[str], list[str]]:
     has_make = shutil.which("make") is not None
@@ -143,3 +147,107 @@ def test_supported_languages_in_dir_can_be_tested(case_dir):
     assert {row["name"] for row in data} == set(programs)
     print(data)
     assert all(row["result"] == "OK" for row in data)
+
+
+@pytest.mark.skipif(
+    not (shutil.which("javac") and shutil.which("java")),
+    reason="requires javac + java",
+)
+def test_java_solutions_are_compiled_by_single_javac(case_dir):
+    workdir = copy_fixture_tree("lang_matrix", case_dir)
+    source = (workdir / "sol_java.java").read_text()
+    # the same helper class in both must not clash, every one has its own outdir
+    for name in ("sol_java", "sol_java2"):
+        code = source.replace("class sol_java", f"class {name}")
+        (workdir / f"{name}.java").write_text(code + "\nclass Helper {}\n")
+
+    result, data = run_itool_json(
+        ["t", "sol_java.java", "sol_java2.java", "--no-statistics", "-t", "0"],
+        cwd=workdir,
+    )
+
+    assert "Compiling 2 programs by a single javac." in result.stdout
+    assert [row["result"] for row in data] == ["OK", "OK"]
+
+
+@pytest.mark.skipif(
+    not (shutil.which("javac") and shutil.which("java")),
+    reason="requires javac + java",
+)
+def test_java_solution_tries_class_data_sharing(case_dir):
+    workdir = copy_fixture_tree("lang_matrix", case_dir)
+
+    result, data = run_itool_json(
+        ["t", "sol_java.java", "--no-statistics", "-t", "0"], cwd=workdir
+    )
+
+    # the archive is used only if it makes the startup faster
+    assert "class data sharing" in result.stdout.lower()
+    assert data[0]["result"] == "OK"
+    assert list((case_dir / ".cache" / "input-tool" / "cds").glob("*/result.json"))
+
+    result, data = run_itool_json(
+        ["t", "sol_java.java", "--no-statistics", "-t", "0"], cwd=workdir
+    )
+    assert "class data sharing" in result.stdout.lower()
+    assert data[0]["result"] == "OK"
+
+
+FAKE_JAVA = """#!/bin/sh
+echo "$*" >> "$JAVA_LOG"
+case "$*" in
+    *-XX:ArchiveClassesAtExit=*)
+        archive="${*#*-XX:ArchiveClassesAtExit=}"
+        touch "${archive%% *}" ;;
+    *-XX:SharedArchiveFile=*) ;;
+    *) sleep 0.2 ;;
+esac
+echo ok
+"""
+
+
+def test_class_data_sharing_archive_is_trained_once_per_build(case_dir, monkeypatch):
+    bindir = case_dir / "bin"
+    bindir.mkdir()
+    (bindir / "java").write_text(FAKE_JAVA)
+    (bindir / "java").chmod(0o755)
+    log = case_dir / "java.log"
+    monkeypatch.setenv("PATH", f"{bindir}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.setenv("JAVA_LOG", str(log))
+    classes = Directory(case_dir / "classes")
+    classes.mkdir()
+    (classes / "sol.class").write_bytes(b"build 1")
+    run_cmd = ShellCommand(f"java -Xss256m -cp {classes} sol")
+
+    archive = get_archive(run_cmd, classes, None)
+    assert archive is not None
+    assert archive.startup_after < archive.startup_before
+    assert "-XX:SharedArchiveFile=" in archive.run_cmd
+    assert str(classes) not in archive.run_cmd
+    # the runs before, the training run and the runs after
+    assert len(log.read_text().splitlines()) == 2 * RUNS + 1
+
+    # the same classes in another directory reuse the archive
+    other = Directory(case_dir / "other")
+    shutil.copytree(classes, other)
+    again = get_archive(ShellCommand(f"java -Xss256m -cp {other} sol"), other, None)
+    assert again == archive
+    assert len(log.read_text().splitlines()) == 2 * RUNS + 1
+
+    (classes / "sol.class").write_bytes(b"build 2")
+    assert get_archive(run_cmd, classes, Path(os.devnull)) is not None
+    assert len(log.read_text().splitlines()) == 2 * (2 * RUNS + 1)
+
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="requires node")
+def test_javascript_solution_runs_with_code_cache(case_dir):
+    workdir = copy_fixture_tree("lang_matrix", case_dir)
+
+    result, data = run_itool_json(["t", "sol_js.js", "-t", "0"], cwd=workdir)
+
+    assert "Running sol_js.js with its V8 code cache" in result.stdout
+    assert len(list((workdir / "prog" / ".node-cache").rglob("code.cache"))) == 1
+    assert data[0]["result"] == "OK"
+
+    result = run_itool(["t", "sol_js.js", "--no-compile-cache"], cwd=workdir)
+    assert "code cache" not in result.stdout
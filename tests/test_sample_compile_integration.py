@@ -1,3 +1,5 @@
+import os
+
 from test_utils import (
     copy_fixture_tree,
     filter_out_ansi_escape_codes,
@@ -79,6 +81,64 @@ def test_compile_fails_for_invalid_cpp_source(case_dir):
     assert "Compilation failed." in result.stdout
 
 
+def test_compile_cache_restores_unchanged_builds(case_dir):
+    workdir = copy_fixture_tree("progdir", case_dir)
+    (workdir / "sol.h").write_text("const int ANSWER = 1;\n")
+    source = workdir / "sol-a.cpp"
+    source.write_text('#include "sol.h"\n' + source.read_text())
+
+    result = run_itool(["c", "sol-a.cpp"], cwd=workdir)
+    assert "Compiling:" in result.stdout
+
+    # a different progdir and a newer source only restore the executable
+    source.touch()
+    result = run_itool(["c", "sol-a.cpp", "--progdir", "build"], cwd=workdir)
+    assert "Compiling:" not in result.stdout
+    assert "from compile cache" in result.stdout
+    assert os.access(workdir / "build" / "sol-a", os.X_OK)
+
+    (workdir / "sol.h").write_text("const int ANSWER = 2;\n")
+    source.touch()
+    result = run_itool(["c", "sol-a.cpp", "--progdir", "build"], cwd=workdir)
+    assert "Compiling:" in result.stdout
+
+    source.touch()
+    result = run_itool(
+        ["c", "sol-a.cpp", "--progdir", "build", "--no-compile-cache"], cwd=workdir
+    )
+    assert "Compiling:" in result.stdout
+
+
+def test_compile_cache_remembers_failures(case_dir):
+    workdir = copy_fixture_tree("compile_bad_cpp", case_dir)
+
+    run_itool(["c", "sol-bad.cpp"], cwd=workdir, check=False)
+    result = run_itool(["c", "sol-bad.cpp"], cwd=workdir, check=False)
+
+    assert result.returncode != 0
+    assert "Compiling:" not in result.stdout
+    assert "failed before" in result.stdout
+    assert "Compilation failed." in result.stdout
+
+
+def test_precompiled_header_is_built_once(case_dir):
+    workdir = copy_fixture_tree("progdir", case_dir)
+
+    result = run_itool(["c", "sol-a.cpp", "sol-b.cpp"], cwd=workdir)
+    assert result.stdout.count("Precompiling <bits/stdc++.h>") == 1
+    headers = list((case_dir / ".cache").rglob("stdc++.h.gch"))
+    assert len(headers) == 1
+    assert f"-I{headers[0].parent.parent}" in result.stdout
+
+    # a changed source is compiled again, but with the same header
+    with open(workdir / "sol-a.cpp", "a") as f:
+        f.write("// changed\n")
+    result = run_itool(["c", "sol-a.cpp", "--progdir", "build"], cwd=workdir)
+    assert "Compiling:" in result.stdout
+    assert "Precompiling" not in result.stdout
+    assert os.access(workdir / "build" / "sol-a", os.X_OK)
+
+
 def test_sample_directory_task_autodetects_zadanie_md(case_dir):
     workdir = copy_fixture_tree("sample_dir_task", case_dir)
 
@@ -94,3 +94,78 @@ def test_tester_clear_bin_removes_compiled_artifacts(case_dir):
     )
 
     assert not (workdir / "build").exists()
+
+
+def test_incremental_reuses_unchanged_results(case_dir):
+    workdir = copy_fixture_tree("checker_approx", case_dir)
+    (workdir / "check.py").unlink()
+    for name in ("sol-ref.py", "sol-close.py"):
+        code = (workdir / name).read_text()
+        (workdir / name).write_text('open("runs.txt", "a").write("x\\n")\n' + code)
+    args = ["t", "sol-ref.py", "sol-close.py", "-F", "-t", "0", "--incremental"]
+
+    def count_runs():
+        runs = workdir / "runs.txt"
+        count = len(runs.read_text().split()) if runs.exists() else 0
+        runs.unlink(missing_ok=True)
+        return count
+
+    _result, first = run_itool_json(args, cwd=workdir)
+    assert count_runs() == 4
+
+    result, data = run_itool_json(args, cwd=workdir)
+    assert count_runs() == 0
+    keys = ("name", "result", "batchresults", "times", "memory")
+    assert [{k: row[k] for k in keys} for row in data] == [
+        {k: row[k] for k in keys} for row in first
+    ]
+    assert "Results of 4 tests were reused" in result.stdout
+    assert "(reused)" in result.stdout
+
+    with open(workdir / "sol-close.py", "a") as f:
+        f.write("# changed\n")
+    run_itool_json(args, cwd=workdir)
+    assert count_runs() == 2
+
+    run_itool_json(args + ["--fresh"], cwd=workdir)
+    assert count_runs() == 4
+
+    # results measured in a different setup are not reused
+    run_itool_json(args + ["--backend", "shell"], cwd=workdir)
+    assert count_runs() == 4
+    run_itool_json(args + ["--pin-cpus"], cwd=workdir)
+    assert count_runs() == 4
+
+    run_itool_json(args[:-1], cwd=workdir)
+    assert count_runs() == 4
+
+
+def test_python_solutions_run_from_cached_bytecode(case_dir):
+    workdir = copy_fixture_tree("recompute", case_dir)
+
+    result, data = run_itool_json(["t", "sol-a.py", "-t", "0"], cwd=workdir)
+
+    assert "Running sol-a.py from bytecode" in result.stdout
+    assert len(list((case_dir / ".cache").rglob("main.pyc"))) == 1
+    assert data[0]["result"] == "OK"
+
+    result = run_itool(["t", "sol-a.py", "--no-compile-cache"], cwd=workdir)
+    assert "from bytecode" not in result.stdout
+
+
+def test_net_times_subtract_startup_of_empty_program(case_dir):
+    workdir = copy_fixture_tree("recompute", case_dir)
+
+    result, data = run_itool_json(["t", "sol-a.py", "-t", "0"], cwd=workdir)
+    assert "Net max" not in result.stdout
+    assert data[0]["startup"] is None
+
+    result, data = run_itool_json(
+        ["t", "sol-a.py", "-t", "0", "--net-times"], cwd=workdir
+    )
+    assert "Startup of an empty python program takes" in result.stdout
+    assert "Net max" in result.stdout
+    assert data[0]["startup"] is not None
+    assert data[0]["netsumtime"] is not None
+    # the empty program is measured in the cache, not next to the solutions
+    assert (case_dir / ".cache" / "input-tool" / "startup" / "python").is_dir()
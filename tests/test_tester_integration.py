@@ -328,3 +328,16 @@ def test_interactive_kspjudge_uses_special_protocol_from_cwd(case_dir):
         "sol-stop.py": "WA",
         "sol-wa.py": "WA",
     }
+
+
+def test_forkserver_runs_python_validator_from_warm_interpreter(case_dir):
+    workdir = copy_fixture_tree("validator_fail", case_dir)
+
+    result, data = run_itool_json(
+        ["t", "val-positive.py", "sol-copy.py", "-t", "0", "--forkserver"],
+        cwd=workdir,
+    )
+    by_name = {row["name"]: row["result"] for row in data}
+
+    assert "Forking the runs of val-positive.py" in result.stdout
+    assert by_name == {"val-positive.py": "EXC", "sol-copy.py": "OK"}
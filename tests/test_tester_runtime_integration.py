@@ -1,3 +1,4 @@
+import json
 import time
 from pathlib import Path
 
@@ -57,11 +58,56 @@ def test_tester_memorylimit_triggers_failure(case_dir):
         "".join(row["batchresults"][str(i)][0] for row in data) for i in range(1, 6)
     ]
     print(batch_results)
+    failed = set("EM")  # a crash can be recognized as MLE
     assert batch_results[0] == "OO"  # first test is very easy
     assert "O" in batch_results[1]  # python has some issues, but C++ should be fine
-    assert "E" in batch_results[2]  # at least one should fail the stack limit
-    assert "E" in batch_results[3]  # at least one should fail the heap limit
-    assert batch_results[4] == "EE"  # test allocates a lot of memory, both should fail
+    assert failed & set(batch_results[2])  # at least one should fail the stack limit
+    assert failed & set(batch_results[3])  # at least one should fail the heap limit
+    assert set(batch_results[4]) <= failed  # allocates a lot, both should fail
+    assert "M" in batch_results[4]
+
+
+def test_tester_reports_peak_memory(case_dir):
+    workdir = copy_fixture_tree("tester_memory", case_dir)
+
+    result, data = run_itool_json(
+        ["t", "sol-mem.py", "-m", "100", "-t", "0"], cwd=workdir
+    )
+
+    row = data[0]
+    assert row["maxmemory"] == max(m for ms in row["memory"].values() for m in ms if m)
+    assert row["maxmemory"] > 1024 * 1024
+    assert all(len(row["memory"][b]) == len(row["times"][b]) for b in row["times"])
+    stats = parse_statistics(result.stdout)
+    assert int(stats[0][3]) == round(row["maxmemory"] / 1024 / 1024)
+
+
+def test_tester_starts_longest_tests_first(case_dir):
+    workdir = copy_fixture_tree("tester_execute", case_dir)
+    (workdir / "test" / "1.a.in").write_text("small\n")
+    (workdir / "test" / "1.b.in").write_text("mid\n" * 30)
+    (workdir / "test" / "2.a.in").write_text("big\n" * 1000)
+    sol = "sh -c 'head -n1 >> order.log'"
+    order_log = workdir / "order.log"
+
+    # without history the biggest inputs go first
+    run_itool(["t", "--execute", sol, "-t", "0"], cwd=workdir)
+    assert order_log.read_text().split() == ["big", "mid", "small"]
+
+    # then the running times from the previous runs decide
+    # kept in the user cache, not next to the tests
+    assert not list((workdir / "test").glob(".*.json"))
+    (cache,) = (case_dir / ".cache" / "input-tool" / "history").glob("*.json")
+    assert set(json.loads(cache.read_text())["times"][sol]) == {
+        "1.a.in",
+        "1.b.in",
+        "2.a.in",
+    }
+    times = {"1.a.in": [3, 6], "1.b.in": [1, 120], "2.a.in": [2, 4000]}
+    cache.write_text(json.dumps({"times": {sol: times}}))
+    order_log.unlink()
+    run_itool(["t", "--execute", sol, "-t", "0"], cwd=workdir)
+    assert order_log.read_text().split() == ["small", "big", "mid"]
 
 
 def test_tester_no_compile_requires_prebuilt_binary(case_dir):
@@ -158,16 +204,25 @@ def test_statistics_table_header_contract(case_dir):
         line for line in text.splitlines() if line.startswith("|-----------")
     )
 
-    expected_cols = ["Solution", "Max time", "Times sum", "Pt", "Status", "Batches"]
+    expected_cols = [
+        "Solution",
+        "Max time",
+        "Times sum",
+        "Max mem",
+        "Pt",
+        "Status",
+        "Batches",
+    ]
     for token in expected_cols:
         assert token in header_line
     pieces = [p.strip() for p in header_line.split("|")[1:-1]]
-    assert len(pieces) == 6
+    assert len(pieces) == 7
     assert pieces[0] == "Solution"
     assert pieces[1] == "Max time"
     assert pieces[2] == "Times sum"
-    assert pieces[4] == "Status"
-    assert pieces[5] == "Batches"
+    assert pieces[3] == "Max mem"
+    assert pieces[5] == "Status"
+    assert pieces[6] == "Batches"
     assert separator_line.count("|") == header_line.count("|")
 
 
@@ -182,7 +237,7 @@ def test_statistics_table_row_alignment_contract(case_dir):
     assert row_lines
     for line in row_lines:
         assert line.endswith("|")
-        assert len([x for x in line.split("|")[1:-1]]) == 6
+        assert len([x for x in line.split("|")[1:-1]]) == 7
 
 
 def test_statistics_table_batch_letters_contract(case_dir):
@@ -196,7 +251,7 @@ def test_statistics_table_batch_letters_contract(case_dir):
     assert "| oO" in text
     assert len(rows) == 1
     assert rows[0][0] == "sol.py"
-    assert rows[0][5] == "oO"
+    assert rows[0][6] == "oO"
 
 
 def test_tester_rustime_prints_rus_columns(case_dir):
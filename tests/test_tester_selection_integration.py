@@ -60,3 +60,17 @@ def test_best_only_keeps_validator_and_best_solution(case_dir):
     assert len(data) == 2
     assert [row["name"] for row in data] == ["val-positive.py", "sol-100.py"]
     assert [row["result"] for row in data] == ["VALID", "OK"]
+
+
+def test_copies_of_solution_are_tested_once(case_dir):
+    workdir = copy_fixture_tree("selection_cases", case_dir)
+
+    result, data = run_itool_json(
+        ["t", "--no-sort", "sol-1.py", "sol-100.py", "-t", "0"], cwd=workdir
+    )
+
+    assert "sol-100.py is a copy of sol-1.py" in result.stdout
+    run_commands = [line for line in result.stdout.splitlines() if "is ran as" in line]
+    assert len(run_commands) == 1 and "sol-1.py" in run_commands[0]
+    assert [row["name"] for row in data] == ["sol-1.py", "sol-100.py"]
+    assert data[0]["times"] == data[1]["times"]
@@ -14,38 +14,49 @@ def filter_out_ansi_escape_codes(text: str) -> str:
     return re.sub(r"\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])", "", text)
 
 
-def line_to_stat(line: str) -> tuple[str, int, int, str, str, str]:
+Stat = tuple[str, int, int, str, str, str, str]
+
+
+def line_to_stat(line: str) -> Stat:
     """
-    | sol-a.cpp |        5 |        32 |      3 | OK     | OOO     |
+    | sol-a.cpp |        5 |        32 |       3 |      3 | OK     | OOO     |
     """
     items = [item.strip() for item in line.split("|")[1:-1]]
-    return (items[0], int(items[1]), int(items[2]), items[3], items[4], items[5])
+    return (
+        items[0],
+        int(items[1]),
+        int(items[2]),
+        items[3],
+        items[4],
+        items[5],
+        items[6],
+    )
 
 
-def parse_statistics(output: str) -> list[tuple[str, int, int, str, str, str]]:
+def parse_statistics(output: str) -> list[Stat]:
     """
     <start of file>
     ...
 
-    | Solution  | Max time | Times sum | Pt   3 | Status | Batches |
-    |-----------|----------|-----------|--------|--------|---------|
-    | sol-a.cpp |        5 |        32 |      3 | OK     | OOO     |
-    | sol-b.cpp |        6 |        33 |      3 | OK     | OOO     |
-    | val.cpp   |        6 |        16 |  VALID | OK     | VVV     |
+    | Solution  | Max time | Times sum | Max mem | Pt   3 | Status | Batches |
+    |-----------|----------|-----------|---------|--------|--------|---------|
+    | sol-a.cpp |        5 |        32 |       3 |      3 | OK     | OOO     |
+    | sol-b.cpp |        6 |        33 |       3 |      3 | OK     | OOO     |
+    | val.cpp   |        6 |        16 |       9 |  VALID | OK     | VVV     |
     <end of file>
 
     parse out the table and return it
 
     [
-        ("sol-a.cpp", 5, 32,    "3",  "OK", "OOO"),
-        ("sol-b.cpp", 6, 33,    "3",  "OK", "OOO"),
-        ("val.cpp",   6, 16, "VALID", "OK", "VVV"),
+        ("sol-a.cpp", 5, 32, "3",    "3",  "OK", "OOO"),
+        ("sol-b.cpp", 6, 33, "3",    "3",  "OK", "OOO"),
+        ("val.cpp",   6, 16, "9", "VALID", "OK", "VVV"),
     ]
     """
 
     output = filter_out_ansi_escape_codes(output)
     table = re.search(
-        r"^(\|\s*Solution[^\|]*\|[^\|]*\|[^\|]*\|[^\|]*\|[^\|]*\|[^\|]*\|.*)",
+        r"^(\|\s*Solution(?:[^\|]*\|){7}.*)",
         output,
         re.MULTILINE | re.DOTALL,
     )
@@ -84,7 +95,9 @@ def fixture_path(name: str) -> Path:
 
 
 @pytest.fixture
-def case_dir(tmp_path: Path) -> Iterator[Path]:
+def case_dir(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Iterator[Path]:
+    # keep the compile cache of every test separate
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / ".cache"))
     cwd = Path.cwd()
     os.chdir(tmp_path)
     try:
@@ -168,6 +181,13 @@ def normalize_results_for_assertions(
         r = dict(row)
         r.pop("maxtime", None)
         r.pop("sumtime", None)
+        r.pop("startup", None)
+        r.pop("netmaxtime", None)
+        r.pop("netsumtime", None)
         r.pop("times", None)
+        r.pop("maxmemory", None)
+        r.pop("memory", None)
+        r.pop("cpus", None)
+        r.pop("checktimes", None)
         normalized.append(_normalize_json_value(r))
     return sorted(normalized, key=lambda r: r["name"])